@@ -0,0 +1,78 @@
+# Target assignment for several quadcopters
+# Incremental k-means: each quadcopter owns one cluster of targets. A report
+# moves only the reporting target, and only when another cluster's centroid
+# is nearer than its own by more than the hysteresis, so groups do not
+# thrash. Cluster sums are kept, so a report costs O(clusters), not O(targets).
+
+# Import libraries
+import numpy as nm
+
+
+class TargetClusterer:
+    """
+    Class: TargetClusterer
+    Arguments:
+        nClusters: number of clusters (quadcopters)
+        nTargets: number of targets, addressed by index
+        hysteresis: meters another centroid must be nearer by before a target moves
+    Purpose:
+        Keeps every reported target assigned to one cluster.
+        assignment[i] is target i's cluster, -1 until it reports.
+    """
+
+    def __init__(self, nClusters, nTargets, hysteresis = 5.0):
+        self.hysteresis = hysteresis
+        self.assignment = nm.full(nTargets, -1)
+        self.positions = nm.full((nTargets, 2), nm.nan)
+        self.sums = nm.zeros((nClusters, 2))
+        self.counts = nm.zeros(nClusters, dtype = int)
+        # Number of times a target changed cluster
+        self.moves = 0
+
+    def centroids(self):
+        # (k, 2) cluster centroids, NaN for empty clusters
+        with nm.errstate(invalid = 'ignore', divide = 'ignore'):
+            return self.sums / self.counts[:, None]
+
+    def members(self, cluster):
+        return nm.flatnonzero(self.assignment == cluster)
+
+    def update(self, index, position):
+        """
+        Function: update
+        Arguments:
+            index: target index
+            position: its new (x, y)
+        Purpose:
+            Moves the target and reassigns it if needed.
+            Returns (old, new) cluster; old is -1 on the first report.
+        """
+        old = self.assignment[index]
+        position = nm.asarray(position, dtype = float)
+        if old >= 0:
+            self.sums[old] -= self.positions[index]
+            self.counts[old] -= 1
+        self.positions[index] = position
+
+        empty = nm.flatnonzero(self.counts == 0)
+        if old < 0 and len(empty) > 0:
+            # Seed an empty cluster with a new target
+            new = empty[0]
+        else:
+            centroids = self.centroids()
+            distances = nm.sqrt(nm.sum((centroids - position) ** 2, axis = 1))
+            distances = nm.where(self.counts > 0, distances, nm.inf)
+            best = int(nm.argmin(distances))
+            new = best
+            if old >= 0:
+                # Own centroid, counting this target at its new position
+                own = (self.sums[old] + position) / (self.counts[old] + 1)
+                if nm.sqrt(nm.sum((own - position) ** 2)) <= distances[best] + self.hysteresis:
+                    new = old
+
+        self.assignment[index] = new
+        self.sums[new] += position
+        self.counts[new] += 1
+        if old >= 0 and new != old:
+            self.moves += 1
+        return (old, new)
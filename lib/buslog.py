@@ -0,0 +1,158 @@
+# Append-only log of Redis bus traffic, for record and replay
+# A log is two files:
+#   <path>      one record per message: RECORD header, then the channel and data bytes
+#   <path>.idx  time index: one (time, offset) pair per record
+# Both are only ever appended to, and are read back by memory map,
+# so opening a long mission costs nothing until records are touched.
+
+# Import libraries
+import mmap
+import os
+import struct
+import time
+import numpy as nm
+from messaging import TARGET_PREFIX, QUAD_PREFIX, GCS_CHANNEL
+
+# Time (s), channel length, data length
+RECORD = struct.Struct('<dHI')
+INDEX = nm.dtype([('time', '<f8'), ('offset', '<u8')])
+
+# Everything a follow-targets mission says
+PATTERNS = (TARGET_PREFIX + '*', QUAD_PREFIX + '*', GCS_CHANNEL + '*')
+
+
+class LogWriter:
+    """
+    Class: LogWriter
+    Arguments:
+        path: log file, appended to if it exists
+    Purpose:
+        Appends timestamped messages. Times must not go backwards.
+    """
+
+    def __init__(self, path):
+        self.log = open(path, 'ab')
+        self.index = open(path + '.idx', 'ab')
+        self.offset = self.log.tell()
+        self.count = 0
+
+    def write(self, t, channel, data):
+        if isinstance(channel, str):
+            channel = channel.encode()
+        if isinstance(data, str):
+            data = data.encode()
+        self.log.write(RECORD.pack(t, len(channel), len(data)))
+        self.log.write(channel)
+        self.log.write(data)
+        # The index entry goes last, so it never points past the log
+        self.index.write(nm.array([(t, self.offset)], dtype = INDEX).tobytes())
+        self.offset += RECORD.size + len(channel) + len(data)
+        self.count += 1
+
+    def flush(self):
+        self.log.flush()
+        self.index.flush()
+
+    def close(self):
+        self.log.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LogReader:
+    """
+    Class: LogReader
+    Arguments:
+        path: log file written by LogWriter
+    Purpose:
+        Random and time-range access to a log by memory map.
+        Index entries of a record cut short by a crash are ignored.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ) if size > 0 else b''
+        if os.path.getsize(path + '.idx') >= INDEX.itemsize:
+            index = nm.memmap(path + '.idx', dtype = INDEX, mode = 'r')
+            index = index[:os.path.getsize(path + '.idx') // INDEX.itemsize]
+        else:
+            index = nm.zeros(0, dtype = INDEX)
+        # Drop a trailing record that was not completely written
+        while len(index) > 0 and not self.complete(int(index['offset'][-1]), size):
+            index = index[:-1]
+        self.index = index
+        self.times = index['time']
+
+    def complete(self, offset, size):
+        if offset + RECORD.size > size:
+            return False
+        (_, channelLength, dataLength) = RECORD.unpack_from(self.data, offset)
+        return offset + RECORD.size + channelLength + dataLength <= size
+
+    def __len__(self):
+        return len(self.index)
+
+    def record(self, i):
+        # Returns (time, channel, data) of record i
+        offset = int(self.index['offset'][i])
+        (t, channelLength, dataLength) = RECORD.unpack_from(self.data, offset)
+        start = offset + RECORD.size
+        channel = bytes(self.data[start:start + channelLength]).decode()
+        data = bytes(self.data[start + channelLength:start + channelLength + dataLength])
+        return (t, channel, data)
+
+    def seek(self, t):
+        # Index of the first record at or after time t
+        return int(nm.searchsorted(self.times, t, side = 'left'))
+
+    def records(self, start = None, end = None):
+        # Records with start <= time < end
+        first = 0 if start is None else self.seek(start)
+        last = len(self) if end is None else self.seek(end)
+        for i in range(first, last):
+            yield self.record(i)
+
+    def close(self):
+        self.index = self.times = None
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def replay(records, publish, speed = 1.0, sleep = time.sleep):
+    """
+    Function: replay
+    Arguments:
+        records: iterable of (time, channel, data), e.g. LogReader.records ()
+        publish: called as publish (channel, data) for every record
+        speed: 1 replays in real time, 10 ten times faster, 0 as fast as possible
+        sleep: sleep function for pacing
+    Purpose:
+        Re-publishes recorded traffic with its original spacing, scaled by speed.
+        Returns the number of records published.
+    """
+    count = 0
+    first = None
+    wallStart = time.monotonic()
+    for (t, channel, data) in records:
+        if first is None:
+            first = t
+        if speed > 0:
+            delay = (t - first) / speed - (time.monotonic() - wallStart)
+            if delay > 0:
+                sleep(delay)
+        publish(channel, data)
+        count += 1
+    return count
@@ -0,0 +1,117 @@
+# Camera field-of-view calibration
+# Fits the field of view, and optionally a gimbal offset, of the footprint
+# model in footprint.py to measured footprints: for each observation, the
+# camera altitude, the gimbal angles and any of the measured distances from
+# the camera to the footprint's front, behind, left and right edges.
+# One Levenberg-Marquardt solve over every observation at once; the result
+# is saved as a camera profile (see footprint.loadCameraProfile).
+
+# Import libraries
+import json
+import math
+import numpy as nm
+from footprint import FOV_DEG, halfAngles
+
+# Measured edges: distance along the heading (front, behind) or across it (left, right)
+EDGES = ('front', 'behind', 'left', 'right')
+OBSERVATION = nm.dtype([('altitude', 'f8'), ('xGimbal_deg', 'f8'), ('yGimbal_deg', 'f8')] +
+                       [(edge, 'f8') for edge in EDGES])
+
+
+def readObservations(path):
+    """
+    Function: readObservations
+    Arguments:
+        path: CSV file with a header naming the OBSERVATION fields, in any order.
+            Missing columns and empty cells are edges that were not measured.
+    Purpose:
+        Returns the observations as an OBSERVATION array
+    """
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    columns = [c.strip() for c in lines[0].split(',')]
+    observations = nm.full(len(lines) - 1, nm.nan, dtype = OBSERVATION)
+    observations['yGimbal_deg'] = 0
+    for (i, line) in enumerate(lines[1:]):
+        for (column, value) in zip(columns, line.split(',')):
+            if column in OBSERVATION.names and value.strip():
+                observations[column][i] = float(value)
+    return observations
+
+
+def residuals(params, observations):
+    # Model minus measured edges, and the Jacobian, over every measured edge
+    (xHalf, yHalf, xOffset, yOffset) = params
+    h = observations['altitude']
+    x = nm.radians(observations['xGimbal_deg']) + xOffset
+    y = nm.radians(observations['yGimbal_deg']) + yOffset
+    # angle, measured, d(angle)/d(params) for each edge
+    edges = ((x + xHalf, observations['front'], (1, 0, 1, 0)),
+             (x - xHalf, observations['behind'], (-1, 0, 1, 0)),
+             (y - yHalf, observations['left'], (0, -1, 0, 1)),
+             (y + yHalf, observations['right'], (0, 1, 0, 1)))
+    r = []
+    J = []
+    for (angle, measured, d) in edges:
+        keep = ~nm.isnan(measured)
+        r.append(h[keep] * nm.tan(angle[keep]) - measured[keep])
+        slope = h[keep] / nm.cos(angle[keep]) ** 2
+        J.append(slope[:, None] * nm.array(d, dtype = float)[None, :])
+    return (nm.concatenate(r), nm.concatenate(J))
+
+
+def fitCamera(observations, fitOffset = False, fov = FOV_DEG, iterations = 100, tolerance = 1e-12):
+    """
+    Function: fitCamera
+    Arguments:
+        observations: OBSERVATION array (see readObservations)
+        fitOffset: also fit a constant gimbal offset on each measured axis
+        fov: (x, y) starting field of view in degrees
+        iterations: most Levenberg-Marquardt steps
+        tolerance: stop when the squared error improves by less than this
+    Purpose:
+        Least-squares fit of the footprint model to the observations.
+        The y axis is only fitted if left or right edges were measured;
+        otherwise it takes the x field of view and no offset.
+        Returns a camera profile: {'fov_deg', 'gimbalOffset_deg', 'rms', 'observations'}
+    """
+    observations = nm.asarray(observations, dtype = OBSERVATION)
+    lateral = bool(nm.any(~nm.isnan(observations['left'])) or nm.any(~nm.isnan(observations['right'])))
+    free = nm.array([True, lateral, fitOffset, fitOffset and lateral])
+
+    params = nm.array(list(halfAngles(fov)) + [0.0, 0.0])
+    (r, J) = residuals(params, observations)
+    if len(r) < free.sum():
+        raise ValueError("{0} measured edges cannot fit {1} parameters".format(len(r), free.sum()))
+    error = r @ r
+    damping = 1e-3
+    for _ in range(iterations):
+        A = J[:, free].T @ J[:, free]
+        g = J[:, free].T @ r
+        step = nm.zeros(4)
+        step[free] = -nm.linalg.solve(A + damping * nm.diag(nm.diag(A) + 1e-12), g)
+        trial = params + step
+        (rTrial, JTrial) = residuals(trial, observations)
+        errorTrial = rTrial @ rTrial
+        if nm.isfinite(errorTrial) and errorTrial < error:
+            improvement = error - errorTrial
+            (params, r, J, error) = (trial, rTrial, JTrial, errorTrial)
+            damping = max(damping / 10, 1e-12)
+            if improvement < tolerance:
+                break
+        else:
+            damping *= 10
+            if damping > 1e12:
+                break
+
+    if not lateral:
+        params[1] = params[0]
+    return {'fov_deg':[math.degrees(2 * params[0]), math.degrees(2 * params[1])],
+            'gimbalOffset_deg':[math.degrees(params[2]), math.degrees(params[3])],
+            'rms':float(math.sqrt(error / len(r))), 'observations':int(len(observations))}
+
+
+def saveCameraProfile(profile, path):
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent = 2)
+        f.write('\n')
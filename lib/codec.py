@@ -0,0 +1,175 @@
+# Wire codecs for the messages robots and behaviors publish through Redis
+# Two encodings are available:
+#   json:   the original text messages, e.g. {"tag":3,"x":1.0,...,"seq":7,"timestamp":...}
+#   binary: fixed-layout little-endian records (tag, seq, float64 timestamp, fields)
+# Either way every message carries its publisher's sequence number and send time.
+# Each publisher picks its codec; decode tells them apart by the first byte,
+# so a consumer reads any mix of channels without configuration.
+# Commands may be addressed: a short prefix naming the quadcopter or group
+# they are for, which a receiver reads with addressOf before decoding.
+
+# Import libraries
+import json
+import math
+import struct
+import time
+
+
+# Message tags, in addition to the command tags (-1 .. 4) defined by the copter
+TAG_CAMERA = 5    # Copter telemetry: position and camera state
+TAG_STATUS = 6    # Rover telemetry: position and destination
+TAG_COMMAND = 7   # GCS command: waypoint and camera target in one frame (see commands.py)
+
+# First byte of every binary record. JSON messages always start with '{'
+MAGIC = 0xA5
+HEADER = struct.Struct('<BbId')
+
+# First byte of an addressed message: '@', addressee length, addressee, message
+ADDRESS = 0x40
+
+# Field order of each binary record, by tag
+LAYOUTS = {
+    -1 : (),
+    0 : (),
+    1 : (),
+    2 : (),
+    3 : ('x', 'y', 'heading_x', 'heading_y', 'z', 'origin'),
+    4 : ('x', 'y', 'origin'),
+    TAG_CAMERA : ('pos_x', 'pos_y', 'pos_z', 'xGimbal_deg', 'yGimbal_deg',
+                  'xSensor_mm', 'ySensor_mm', 'focallen_mm'),
+    TAG_STATUS : ('pos_x', 'pos_y', 'pos_z', 'dest_x', 'dest_y', 'vel_x', 'vel_y'),
+    TAG_COMMAND : ('x', 'y', 'heading_x', 'heading_y', 'z', 'target_x', 'target_y', 'origin'),
+}
+BODIES = { tag:struct.Struct('<' + 'd' * len(fields)) for tag, fields in LAYOUTS.items() }
+
+CODECS = ('json', 'binary')
+
+
+class Encoder:
+    """
+    Class: Encoder
+    Arguments:
+        codec: 'json' or 'binary'
+        clock: object with a time () method, e.g. simclock.Clock (default: time)
+    Purpose:
+        Encodes the messages of one publisher. Messages are numbered with
+        the encoder's own sequence counter ('seq') and stamped with clock
+        time ('timestamp'), unless the message has its own timestamp.
+        encode (msg, to = name) addresses the message to a quadcopter or group.
+    """
+
+    def __init__(self, codec = 'json', clock = None):
+        if codec not in CODECS:
+            raise ValueError("Unknown codec '{0}'".format(codec))
+        self.codec = codec
+        self.clock = clock if clock is not None else time
+        self.seq = 0
+
+    def encode(self, msg, to = None):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        timestamp = msg.get('timestamp', self.clock.time())
+        if self.codec == 'json':
+            data = json.dumps(dict(msg, seq = self.seq, timestamp = timestamp), separators = (',', ':')).encode("utf-8")
+        else:
+            tag = msg.get('tag', TAG_STATUS)
+            values = [math.nan if msg.get(f) is None else float(msg[f]) for f in LAYOUTS[tag]]
+            data = HEADER.pack(MAGIC, tag, self.seq, timestamp) + BODIES[tag].pack(*values)
+        if to is None:
+            return data
+        to = to.encode("utf-8")
+        return bytes((ADDRESS, len(to))) + to + data
+
+
+def addressOf(data):
+    """
+    Function: addressOf
+    Arguments:
+        data: message payload (bytes) as received from Redis, or a
+            memoryview of it (see shmbus.py)
+    Purpose:
+        Returns the quadcopter or group an addressed message is for,
+        or None if it is not addressed, without decoding the message.
+    """
+    if len(data) < 2 or data[0] != ADDRESS:
+        return None
+    return bytes(data[2:2 + data[1]]).decode("utf-8")
+
+
+def decode(data):
+    """
+    Function: decode
+    Arguments:
+        data: message payload (bytes) as received from Redis, or a
+            memoryview of it (see shmbus.py)
+    Purpose:
+        Returns the message as a dict, whichever codec produced it,
+        with the publisher's 'seq' and 'timestamp'. Binary rover status
+        has no 'time' string. An address prefix is skipped.
+        Raises ValueError for anything that is not a message: text such
+        as 'Boot', or a binary record with an unknown tag or cut short.
+    """
+    if len(data) > 0 and data[0] == ADDRESS:
+        data = data[2 + data[1]:]
+    if len(data) == 0 or data[0] != MAGIC:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        msg = json.loads(data)
+        if not isinstance(msg, dict):
+            raise ValueError("Not a message: {0!r}".format(msg))
+        return msg
+
+    try:
+        (_, tag, seq, timestamp) = HEADER.unpack_from(data)
+        values = BODIES[tag].unpack_from(data, HEADER.size)
+    except (struct.error, KeyError) as e:
+        raise ValueError("Malformed binary record ({0!r})".format(e)) from e
+    msg = { f:(None if math.isnan(v) else v) for f, v in zip(LAYOUTS[tag], values) }
+    msg['tag'] = tag
+    msg['seq'] = seq
+    msg['timestamp'] = timestamp
+    return msg
+
+
+def decodeMessage(msg):
+    # The decoded form of a received message: readers that decode in place
+    # (shmbus.ShmSubscriber) hand it over as 'decoded', others as 'data'
+    decoded = msg.get('decoded')
+    return decoded if decoded is not None else decode(msg['data'])
+
+
+def benchmark(n = 100000):
+    """
+    Function: benchmark
+    Arguments:
+        n: number of messages to encode and decode per case
+    Purpose:
+        Prints bytes per message and encode/decode cost for each codec
+        on representative rover status and copter telemetry messages.
+    """
+    messages = {
+        'status' : {'time':'12:00:00', 'pos_x':-48.25, 'pos_y':52.5, 'pos_z':0.08,
+                    'dest_x':-32.0, 'dest_y':13.0},
+        'camera' : {'xSensor_mm':256.0, 'ySensor_mm':256.0, 'focallen_mm':35.0,
+                    'xGimbal_deg':31.2, 'yGimbal_deg':0.0, 'tag':TAG_CAMERA,
+                    'pos_x':-12.3, 'pos_y':40.1, 'pos_z':29.9},
+    }
+    print ("{0:8} {1:8} {2:>6} {3:>12} {4:>12}".format("message", "codec", "bytes", "encode (us)", "decode (us)"))
+    for name, msg in messages.items():
+        for codec in CODECS:
+            encoder = Encoder(codec)
+            start = time.perf_counter()
+            for i in range(n):
+                data = encoder.encode(msg)
+            encodeTime = (time.perf_counter() - start) / n
+            start = time.perf_counter()
+            for i in range(n):
+                decode(data)
+            decodeTime = (time.perf_counter() - start) / n
+            print ("{0:8} {1:8} {2:6d} {3:12.2f} {4:12.2f}".format(name, codec, len(data),
+                encodeTime * 1e6, decodeTime * 1e6))
+
+
+if __name__ == "__main__":
+    benchmark()
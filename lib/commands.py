@@ -0,0 +1,79 @@
+# Quadcopter commands from the GCS
+# The GCS sends each plan as one command frame (codec.TAG_COMMAND) holding
+# both the waypoint and the camera target. monitor_position.py still sends
+# them as separate waypoint (tag 3) and camera target (tag 4) messages.
+# Only the newest waypoint and camera target are worth actuating, so the
+# copter drains every command waiting and coalesces them first.
+
+# Import libraries
+from codec import TAG_COMMAND
+
+TAG_WAYPOINT = 3
+TAG_TARGET = 4
+
+# Fields of a command frame that belong to the waypoint
+WAYPOINT_FIELDS = ('x', 'y', 'heading_x', 'heading_y', 'z')
+
+
+def commandFrame(waypoint, target, origin = None):
+    """
+    Function: commandFrame
+    Arguments:
+        waypoint: {'x', 'y', 'heading_x', 'heading_y'} and optionally 'z'
+        target: {'x', 'y'} ground point the camera aims at
+        origin: send time of the oldest target report behind the plan
+    Purpose:
+        Returns the command frame carrying both
+    """
+    frame = { f:waypoint.get(f) for f in WAYPOINT_FIELDS }
+    frame['target_x'] = target['x']
+    frame['target_y'] = target['y']
+    frame['origin'] = origin
+    frame['tag'] = TAG_COMMAND
+    return frame
+
+
+def splitFrame(msg):
+    # (waypoint, camera target) of a decoded command, either one None
+    tag = msg.get('tag')
+    if tag == TAG_WAYPOINT:
+        return (msg, None)
+    if tag == TAG_TARGET:
+        return (None, msg)
+    if tag == TAG_COMMAND:
+        stamps = { k:msg.get(k) for k in ('origin', 'seq', 'timestamp') }
+        waypoint = dict({ f:msg.get(f) for f in WAYPOINT_FIELDS }, tag = TAG_WAYPOINT, **stamps)
+        target = dict({ 'x':msg['target_x'], 'y':msg['target_y'] }, tag = TAG_TARGET, **stamps)
+        return (waypoint, target)
+    return (None, None)
+
+
+def coalesce(messages):
+    """
+    Function: coalesce
+    Arguments:
+        messages: decoded commands, oldest first
+    Purpose:
+        Keeps only the newest waypoint and the newest camera target.
+        Returns (waypoint, target, others, dropped): the two as tag 3 and
+        tag 4 messages (None if none arrived), every other command in
+        order, and how many waypoints and camera targets were superseded.
+    """
+    waypoint = None
+    target = None
+    others = []
+    dropped = {'waypoint':0, 'target':0}
+    for msg in messages:
+        (w, t) = splitFrame(msg)
+        if w is None and t is None:
+            others.append(msg)
+            continue
+        if w is not None:
+            if waypoint is not None:
+                dropped['waypoint'] += 1
+            waypoint = w
+        if t is not None:
+            if target is not None:
+                dropped['target'] += 1
+            target = t
+    return (waypoint, target, others, dropped)
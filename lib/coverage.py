@@ -0,0 +1,198 @@
+# Coverage metrics for whole missions
+# Scores a timeline of camera footprints against target tracks in a few
+# NumPy passes: how long each target (and the whole group) was in view,
+# how long it took to find them again when lost, and how well centered
+# they were. Timelines come from a mission run (mission.py) or a bus log.
+
+# Import libraries
+import numpy as nm
+from codec import decode, TAG_CAMERA
+from commands import splitFrame
+from messaging import TARGET_PREFIX, QUAD_PREFIX, GCS_CHANNEL, commandChannel
+from footprint import FOV_DEG, tiltFromNadir, calcHeadings, calcGroundFootprints, calcFootprintDistances
+
+
+def calcFootprintTimeline(positions, headingPoints, xGimbal_deg, yGimbal_deg, altitudes, fov = FOV_DEG):
+    """
+    Function: calcFootprintTimeline
+    Arguments:
+        positions: (T, 2) camera ground positions
+        headingPoints: (T, 2) points the camera faces
+        xGimbal_deg, yGimbal_deg: (T,) gimbal angles in degrees
+        altitudes: (T,) camera altitudes in meters
+        fov: (x, y) field of view in degrees
+    Purpose:
+        Returns the (T, 4, 2) footprints of a whole mission
+    """
+    headings = calcHeadings(nm.asarray(positions, dtype = float), nm.asarray(headingPoints, dtype = float))
+    return calcGroundFootprints(positions, headings, xGimbal_deg, yGimbal_deg, altitudes, fov)
+
+
+def resampleTrack(trackTimes, trackPositions, times):
+    """
+    Function: resampleTrack
+    Arguments:
+        trackTimes: (K,) report times of one target, increasing
+        trackPositions: (K, 2) reported positions
+        times: (T,) timeline
+    Purpose:
+        Returns the (T, 2) positions on the timeline, interpolated between
+        reports and held after the last one. NaN before the first report.
+    """
+    positions = nm.full((len(times), 2), nm.nan)
+    if len(trackTimes) == 0:
+        return positions
+    trackPositions = nm.asarray(trackPositions, dtype = float)
+    positions[:, 0] = nm.interp(times, trackTimes, trackPositions[:, 0])
+    positions[:, 1] = nm.interp(times, trackTimes, trackPositions[:, 1])
+    positions[nm.asarray(times) < trackTimes[0]] = nm.nan
+    return positions
+
+
+def calcGaps(inView, times):
+    """
+    Function: calcGaps
+    Arguments:
+        inView: (T, M) booleans, one column per target
+        times: (T,) sample times
+    Purpose:
+        Finds every out-of-view run of every column at once.
+        Each sample lasts until the next one; the last lasts 0 s.
+        Returns per-column (M,) arrays:
+            acquire:        time until first in view (NaN if never)
+            reacquisitions: number of times the view was lost and regained
+            meanReacquire:  mean time to regain the view (0 if never lost)
+            maxReacquire:   longest time to regain the view
+            longestGap:     longest time out of view after first acquired,
+                            including a gap still open at the end
+    """
+    inView = nm.asarray(inView, dtype = bool)
+    (T, M) = inView.shape
+    edges = nm.append(nm.asarray(times, dtype = float), times[-1])
+
+    # Pad with in-view on both ends so every run has a start and an end
+    padded = nm.pad(inView.T.astype(nm.int8), ((0, 0), (1, 1)), constant_values = 1)
+    step = nm.diff(padded, axis = 1)
+    (column, start) = nm.nonzero(step == -1)
+    (_, end) = nm.nonzero(step == 1)
+    duration = edges[end] - edges[start]
+
+    initial = start == 0
+    closed = end < T
+    acquire = nm.zeros(M)
+    acquire[column[initial]] = nm.where(closed[initial], duration[initial], nm.nan)
+
+    reacquired = ~initial & closed
+    reacquisitions = nm.bincount(column[reacquired], minlength = M)
+    total = nm.bincount(column[reacquired], weights = duration[reacquired], minlength = M)
+    meanReacquire = nm.divide(total, reacquisitions, out = nm.zeros(M), where = reacquisitions > 0)
+    maxReacquire = nm.zeros(M)
+    nm.maximum.at(maxReacquire, column[reacquired], duration[reacquired])
+    longestGap = nm.zeros(M)
+    nm.maximum.at(longestGap, column[~initial], duration[~initial])
+
+    return {'acquire':acquire, 'reacquisitions':reacquisitions, 'meanReacquire':meanReacquire,
+            'maxReacquire':maxReacquire, 'longestGap':longestGap}
+
+
+def evaluate(times, footprints, targets):
+    """
+    Function: evaluate
+    Arguments:
+        times: (T,) sample times, increasing
+        footprints: (T, 4, 2) camera footprint at each sample,
+            or (T, Q, 4, 2) for Q cameras
+        targets: (T, M, 2) target positions at each sample, NaN where unknown
+    Purpose:
+        Scores the whole mission. Column M of every (M + 1,) result is the
+        group: all targets in view, centered on the targets' centroid.
+        With several cameras a target is in view when any camera sees it,
+        and distances are to the nearest footprint center.
+        Returns a dict of:
+            inView:        (T, M + 1) booleans
+            fromCenter:    (T, M + 1) distances from the footprint center
+            timeInView:    (M + 1,) seconds in view
+            fractionInView:(M + 1,) share of the mission in view
+            centering:     (M + 1,) mean distance from the footprint center while in view
+            and the fields of calcGaps
+    """
+    times = nm.asarray(times, dtype = float)
+    targets = nm.asarray(targets, dtype = float)
+    footprints = nm.asarray(footprints, dtype = float)
+    if footprints.ndim == 3:
+        footprints = footprints[:, None]
+    # (T, Q, M) against every camera, then the best camera
+    distances = calcFootprintDistances(footprints, targets[:, None])
+    centroid = nm.mean(targets, axis = 1, keepdims = True)
+    groupCenter = calcFootprintDistances(footprints, centroid[:, None])['fromCenter'].min(axis = 1)
+
+    inView = (distances['fromFootprintRel'] < 0).any(axis = 1)
+    inView = nm.concatenate((inView, inView.all(axis = 1, keepdims = True)), axis = 1)
+    fromCenter = nm.concatenate((distances['fromCenter'].min(axis = 1), groupCenter), axis = 1)
+
+    dt = nm.diff(nm.append(times, times[-1]))
+    timeInView = nm.sum(inView * dt[:, None], axis = 0)
+    span = times[-1] - times[0]
+    centered = nm.where(inView, fromCenter, 0.0).sum(axis = 0)
+    samples = inView.sum(axis = 0)
+
+    metrics = {'inView':inView, 'fromCenter':fromCenter, 'timeInView':timeInView,
+               'fractionInView':timeInView / span if span > 0 else nm.zeros(len(timeInView)),
+               'centering':nm.divide(centered, samples, out = nm.full(len(samples), nm.nan), where = samples > 0)}
+    metrics.update(calcGaps(inView, times))
+    return metrics
+
+
+def loadTimeline(records, quadName, targetNames, fov = FOV_DEG, gimbalOffset = (0.0, 0.0)):
+    """
+    Function: loadTimeline
+    Arguments:
+        records: iterable of (time, channel, data), e.g. buslog.LogReader.records ()
+        quadName: name of the quadcopter
+        targetNames: names of the targets
+        fov, gimbalOffset: camera field of view and gimbal offset in degrees
+    Purpose:
+        Builds the inputs of evaluate from recorded traffic. The timeline is
+        the quadcopter's telemetry; the camera faces the last commanded
+        heading point, and targets are interpolated between their reports.
+        Gimbal angles and altitudes follow the GCS's convention (see follow.updateQuad).
+        Returns (times, footprints, targets).
+    """
+    quadChannel = QUAD_PREFIX + quadName
+    # Commands on its own channel, or on the shared one in older logs
+    commandedOn = (commandChannel(quadName), GCS_CHANNEL)
+    telemetry = []
+    commands = []
+    tracks = {name:[] for name in targetNames}
+    for (t, channel, data) in records:
+        try:
+            msg_data = decode(data)
+        except ValueError:
+            continue
+        if channel == quadChannel and msg_data.get('tag') == TAG_CAMERA:
+            telemetry.append((t, msg_data['pos_x'], msg_data['pos_y'], msg_data['pos_z'],
+                tiltFromNadir(msg_data['xGimbal_deg']) + gimbalOffset[0]))
+        elif channel in commandedOn and splitFrame(msg_data)[0] is not None:
+            commands.append((t, msg_data['heading_x'], msg_data['heading_y']))
+        elif channel.startswith(TARGET_PREFIX) and channel[len(TARGET_PREFIX):] in tracks:
+            tracks[channel[len(TARGET_PREFIX):]].append((t, msg_data['pos_x'], msg_data['pos_y']))
+
+    telemetry = nm.array(telemetry, dtype = float).reshape(-1, 5)
+    times = telemetry[:, 0]
+    positions = telemetry[:, 1:3]
+
+    # Hold the last commanded heading point; face north before the first
+    headingPoints = positions + nm.array([0.0, 1.0])
+    if len(commands) > 0:
+        commands = nm.array(commands, dtype = float)
+        last = nm.searchsorted(commands[:, 0], times, side = 'right') - 1
+        commanded = last >= 0
+        headingPoints[commanded] = commands[last[commanded], 1:3]
+
+    footprints = calcFootprintTimeline(positions, headingPoints, telemetry[:, 4], gimbalOffset[1],
+        nm.maximum(telemetry[:, 3], 0.1), fov)
+    targets = nm.empty((len(times), len(targetNames), 2))
+    for (i, name) in enumerate(targetNames):
+        track = nm.array(tracks[name], dtype = float).reshape(-1, 3)
+        targets[:, i] = resampleTrack(track[:, 0], track[:, 1:3], times)
+    return (times, footprints, targets)
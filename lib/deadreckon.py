@@ -0,0 +1,60 @@
+# Dead reckoning for adaptive rover broadcasts
+# A rover in adaptive broadcast mode runs the same filter the GCS runs on its
+# messages (estimator.TargetEstimator, fed the position and velocity of every
+# report, at its send time), and only publishes when the filter's prediction
+# has drifted too far from its true position. The error the gate bounds is
+# the error of the GCS's own prediction (see follow.predictTargets).
+
+# Import libraries
+from estimator import TargetEstimator
+
+
+class BroadcastGate:
+    """
+    Class: BroadcastGate
+    Arguments:
+        maxError: publish when the prediction is off by more than this, in meters
+        heartbeat: publish at least this often, in seconds
+        estimator: options of the GCS's TargetEstimator (default: its defaults)
+    Purpose:
+        Decides when an adaptive rover publishes. Call check with the time
+        and true position at every control step; when it returns True,
+        publish the status with the velocity from self.velocity, stamped
+        with the same time.
+    """
+
+    def __init__(self, maxError = 1.0, heartbeat = 5.0, **estimator):
+        self.maxError = maxError
+        self.heartbeat = heartbeat
+        # Velocity estimate from consecutive samples
+        self.sample = None
+        self.velocity = (0.0, 0.0)
+        # What the GCS was last told, and its estimate of this rover since
+        self.report = None
+        self.estimator = TargetEstimator(1, **estimator)
+        # Counters
+        self.samples = 0
+        self.publishes = 0
+
+    def predicted(self, t):
+        # The GCS's prediction of this rover at time t, (NaN, NaN) before the first report
+        return tuple(float(v) for v in self.estimator.predict(t)[0])
+
+    def check(self, t, x, y):
+        if self.sample is not None and t > self.sample[0]:
+            dt = t - self.sample[0]
+            self.velocity = ((x - self.sample[1]) / dt, (y - self.sample[2]) / dt)
+        self.sample = (t, x, y)
+        self.samples += 1
+
+        publish = self.report is None or t - self.report['time'] >= self.heartbeat
+        if not publish:
+            predicted = self.predicted(t)
+            error = ((predicted[0] - x) ** 2 + (predicted[1] - y) ** 2) ** 0.5
+            publish = error > self.maxError
+
+        if publish:
+            self.report = {'time':t, 'position':(x, y), 'velocity':self.velocity}
+            self.estimator.update([0], [t], [(x, y)], [self.velocity])
+            self.publishes += 1
+        return publish
@@ -0,0 +1,156 @@
+# Multi-target state estimation for the GCS
+# A bank of constant-velocity Kalman filters, one per target, held as NumPy
+# arrays so that every target is predicted or updated in one vectorized step.
+# State per target: [x, y, vx, vy]
+
+# Import libraries
+import numpy as nm
+
+
+def transition(dt):
+    """
+    Function: transition
+    Arguments:
+        dt: (N,) array of time steps in seconds
+    Purpose:
+        Returns the (N, 4, 4) constant-velocity state transition matrices
+    """
+    F = nm.tile(nm.eye(4), (len(dt), 1, 1))
+    F[:, 0, 2] = dt
+    F[:, 1, 3] = dt
+    return F
+
+
+def processNoise(dt, q):
+    """
+    Function: processNoise
+    Arguments:
+        dt: (N,) array of time steps in seconds
+        q: acceleration noise spectral density, in (m/s^2)^2 / Hz
+    Purpose:
+        Returns the (N, 4, 4) process noise of a white-acceleration model
+    """
+    Q = nm.zeros((len(dt), 4, 4))
+    Q[:, 0, 0] = Q[:, 1, 1] = q * dt ** 3 / 3
+    Q[:, 0, 2] = Q[:, 2, 0] = Q[:, 1, 3] = Q[:, 3, 1] = q * dt ** 2 / 2
+    Q[:, 2, 2] = Q[:, 3, 3] = q * dt
+    return Q
+
+
+class TargetEstimator:
+    """
+    Class: TargetEstimator
+    Arguments:
+        nTargets: number of targets in the bank
+        q: acceleration noise spectral density, in (m/s^2)^2 / Hz
+        posNoise: standard deviation of reported positions, in m
+        velNoise: standard deviation of reported velocities, in m/s
+        maxSpeed: standard deviation of the initial velocity guess, in m/s
+    Purpose:
+        Filters the sparse position (and optional velocity) reports of every
+        target, and predicts all target positions at any time in between.
+        Targets are addressed by index, in the order given to the GCS.
+    """
+
+    def __init__(self, nTargets, q = 0.5, posNoise = 0.1, velNoise = 0.2, maxSpeed = 3.0):
+        self.q = q
+        self.posNoise = posNoise
+        self.velNoise = velNoise
+        self.maxSpeed = maxSpeed
+        self.x = nm.zeros((nTargets, 4))
+        self.P = nm.tile(nm.eye(4), (nTargets, 1, 1))
+        self.time = nm.zeros(nTargets)
+        self.initialized = nm.zeros(nTargets, dtype = bool)
+
+    def predict(self, t, indices = None):
+        """
+        Function: predict
+        Arguments:
+            t: time to predict to (scalar, or one time per index)
+            indices: targets to predict (default: all)
+        Purpose:
+            Returns an (N, 2) array of predicted positions. The filter state
+            is not changed. Targets that never reported are NaN.
+        """
+        if indices is None:
+            indices = nm.arange(len(self.x))
+        dt = nm.broadcast_to(nm.asarray(t, dtype = float), nm.shape(indices)) - self.time[indices]
+        positions = self.x[indices, 0:2] + self.x[indices, 2:4] * dt[:, None]
+        positions[~self.initialized[indices]] = nm.nan
+        return positions
+
+    def velocities(self, indices = None):
+        if indices is None:
+            indices = nm.arange(len(self.x))
+        return self.x[indices, 2:4]
+
+    def update(self, indices, times, positions, velocities = None):
+        """
+        Function: update
+        Arguments:
+            indices: (N,) target indices
+            times: (N,) report times
+            positions: (N, 2) reported positions
+            velocities: (N, 2) reported velocities, NaN rows where not reported (optional)
+        Purpose:
+            Fold a batch of reports into the filter bank. Repeated indices are
+            applied in order, each round vectorized over distinct targets.
+        """
+        indices = nm.asarray(indices, dtype = int).reshape(-1)
+        times = nm.broadcast_to(nm.asarray(times, dtype = float), indices.shape)
+        positions = nm.asarray(positions, dtype = float).reshape(-1, 2)
+        if velocities is None:
+            velocities = nm.full((len(indices), 2), nm.nan)
+        velocities = nm.asarray(velocities, dtype = float).reshape(-1, 2)
+
+        pending = nm.ones(len(indices), dtype = bool)
+        while pending.any():
+            # First pending report of each target
+            rows = nm.flatnonzero(pending)
+            _, first = nm.unique(indices[rows], return_index = True)
+            rows = rows[first]
+            self.updateDistinct(indices[rows], times[rows], positions[rows], velocities[rows])
+            pending[rows] = False
+
+    def updateDistinct(self, indices, times, positions, velocities):
+        hasVel = ~nm.isnan(velocities).any(axis = 1)
+
+        # Start new targets at their first report
+        new = ~self.initialized[indices]
+        if new.any():
+            n = indices[new]
+            self.x[n, 0:2] = positions[new]
+            self.x[n, 2:4] = nm.where(hasVel[new, None], velocities[new], 0.0)
+            self.P[n] = nm.zeros((4, 4))
+            self.P[n, 0, 0] = self.P[n, 1, 1] = self.posNoise ** 2
+            speedVar = nm.where(hasVel[new], self.velNoise ** 2, self.maxSpeed ** 2)
+            self.P[n, 2, 2] = self.P[n, 3, 3] = speedVar
+            self.time[n] = times[new]
+            self.initialized[n] = True
+
+        old = ~new
+        if not old.any():
+            return
+        i = indices[old]
+        z = nm.concatenate((positions[old], nm.where(hasVel[old, None], velocities[old], 0.0)), axis = 1)
+        hasVel = hasVel[old]
+
+        # Predict to the report time
+        dt = nm.maximum(times[old] - self.time[i], 0.0)
+        F = transition(dt)
+        x = nm.einsum('nij,nj->ni', F, self.x[i])
+        P = nm.einsum('nij,njk,nlk->nil', F, self.P[i], F) + processNoise(dt, self.q)
+
+        # Measure position always, velocity when reported. Unreported velocity
+        # gets an infinite-variance measurement, i.e. no weight.
+        R = nm.zeros((len(i), 4, 4))
+        R[:, 0, 0] = R[:, 1, 1] = self.posNoise ** 2
+        R[:, 2, 2] = R[:, 3, 3] = nm.where(hasVel, self.velNoise ** 2, 1e12)
+        S = P + R
+        K = nm.einsum('nij,njk->nik', P, nm.linalg.inv(S))
+        x = x + nm.einsum('nij,nj->ni', K, z - x)
+        P = nm.einsum('nij,njk->nik', nm.eye(4) - K, P)
+
+        self.x[i] = x
+        self.P[i] = P
+        self.time[i] = nm.maximum(times[old], self.time[i])
@@ -0,0 +1,199 @@
+# Extent of a group of targets: convex hull and minimum enclosing circle
+# The farthest target from any point, and the smallest circle around all
+# targets, both depend only on the targets on the convex hull. The hull is
+# kept as targets report: a target that stays inside it changes nothing and
+# costs O(hull) to check; only a hull target moving, or a target leaving
+# the hull, marks it for rebuilding on the next query.
+
+# Import libraries
+import random
+import numpy as nm
+
+
+def cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convexHull(points, indices):
+    """
+    Function: convexHull
+    Arguments:
+        points: (N, 2) array of positions
+        indices: which rows of points to use
+    Purpose:
+        Andrew's monotone chain. Returns the indices of the hull vertices in
+        counter-clockwise order, without repeating the first.
+    """
+    order = sorted(indices, key = lambda i: (points[i, 0], points[i, 1]))
+    if len(order) <= 2:
+        return list(order)
+    lower = []
+    for i in order:
+        while len(lower) >= 2 and cross(points[lower[-2]], points[lower[-1]], points[i]) <= 0:
+            lower.pop()
+        lower.append(i)
+    upper = []
+    for i in reversed(order):
+        while len(upper) >= 2 and cross(points[upper[-2]], points[upper[-1]], points[i]) <= 0:
+            upper.pop()
+        upper.append(i)
+    return lower[:-1] + upper[:-1]
+
+
+def circleFrom(points):
+    # Smallest circle through 1, 2 or 3 boundary points: (x, y, r)
+    if len(points) == 1:
+        return (points[0][0], points[0][1], 0.0)
+    if len(points) == 2:
+        (a, b) = points
+        return ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2, nm.hypot(a[0] - b[0], a[1] - b[1]) / 2)
+    (a, b, c) = points
+    d = 2 * (a[0] * (b[1] - c[1]) + b[0] * (c[1] - a[1]) + c[0] * (a[1] - b[1]))
+    if abs(d) < 1e-12:
+        # Collinear: the circle on the two farthest apart
+        pairs = [(a, b), (a, c), (b, c)]
+        return max((circleFrom(p) for p in pairs), key = lambda circle: circle[2])
+    a2 = a[0] ** 2 + a[1] ** 2
+    b2 = b[0] ** 2 + b[1] ** 2
+    c2 = c[0] ** 2 + c[1] ** 2
+    x = (a2 * (b[1] - c[1]) + b2 * (c[1] - a[1]) + c2 * (a[1] - b[1])) / d
+    y = (a2 * (c[0] - b[0]) + b2 * (a[0] - c[0]) + c2 * (b[0] - a[0])) / d
+    return (x, y, nm.hypot(a[0] - x, a[1] - y))
+
+
+def enclosingCircle(points):
+    """
+    Function: enclosingCircle
+    Arguments:
+        points: list of (x, y)
+    Purpose:
+        Minimum enclosing circle, (x, y, radius), by Welzl's algorithm
+        (iterative form, expected linear time on shuffled points)
+    """
+    points = list(points)
+    random.shuffle(points)
+
+    def contains(circle, p):
+        return nm.hypot(p[0] - circle[0], p[1] - circle[1]) <= circle[2] * (1 + 1e-9) + 1e-9
+
+    circle = (points[0][0], points[0][1], 0.0)
+    for i in range(1, len(points)):
+        if contains(circle, points[i]):
+            continue
+        circle = circleFrom([points[i]])
+        for j in range(i):
+            if contains(circle, points[j]):
+                continue
+            circle = circleFrom([points[i], points[j]])
+            for k in range(j):
+                if not contains(circle, points[k]):
+                    circle = circleFrom([points[i], points[j], points[k]])
+    return circle
+
+
+class GroupExtent:
+    """
+    Class: GroupExtent
+    Arguments:
+        nTargets: number of targets, addressed by index
+    Purpose:
+        Convex hull and minimum enclosing circle of the targets that have
+        reported, kept up to date as they move (update, updateMany) or leave
+        the group (remove).
+    """
+
+    def __init__(self, nTargets):
+        self.positions = nm.full((nTargets, 2), nm.nan)
+        self.active = nm.zeros(nTargets, dtype = bool)
+        self.onHull = nm.zeros(nTargets, dtype = bool)
+        self.hullIndices = []
+        self.circleCache = None
+        self.dirty = False
+        # Number of hull rebuilds
+        self.rebuilds = 0
+
+    def outside(self, points):
+        # True for each point not inside or on the current hull
+        points = nm.asarray(points, dtype = float).reshape(-1, 2)
+        if len(self.hullIndices) < 3:
+            return nm.ones(len(points), dtype = bool)
+        hull = self.positions[self.hullIndices]
+        edges = nm.roll(hull, -1, axis = 0) - hull
+        rel = points[:, None, :] - hull[None, :, :]
+        side = edges[None, :, 0] * rel[..., 1] - edges[None, :, 1] * rel[..., 0]
+        return nm.any(side < 0, axis = 1)
+
+    def update(self, index, position):
+        self.updateMany([index], [position])
+
+    def updateMany(self, indices, positions):
+        """
+        Function: updateMany
+        Arguments:
+            indices: (N,) target indices
+            positions: (N, 2) their new positions
+        Purpose:
+            Moves targets, vectorized. The hull only needs rebuilding if one
+            of them was on it or has left it.
+        """
+        indices = nm.asarray(indices, dtype = int).reshape(-1)
+        positions = nm.asarray(positions, dtype = float).reshape(-1, 2)
+        # Only targets that moved or are new can change the hull
+        moved = ~self.active[indices] | nm.any(positions != self.positions[indices], axis = 1)
+        indices = indices[moved]
+        positions = positions[moved]
+        if len(indices) == 0:
+            return
+        if not self.dirty:
+            if self.onHull[indices].any() or (~self.active[indices]).any() or self.outside(positions).any():
+                self.dirty = True
+        self.positions[indices] = positions
+        self.active[indices] = True
+
+    def remove(self, index):
+        if self.active[index]:
+            self.active[index] = False
+            if self.onHull[index]:
+                self.dirty = True
+
+    def rebuild(self):
+        if not self.dirty:
+            return
+        self.hullIndices = convexHull(self.positions, nm.flatnonzero(self.active))
+        self.onHull[:] = False
+        self.onHull[self.hullIndices] = True
+        self.circleCache = None
+        self.dirty = False
+        self.rebuilds += 1
+
+    def hull(self):
+        # Indices of the hull vertices, counter-clockwise
+        self.rebuild()
+        return list(self.hullIndices)
+
+    def farthest(self, point):
+        """
+        Function: farthest
+        Arguments:
+            point: (x, y)
+        Purpose:
+            Returns (index, distance) of the target farthest from point,
+            checking only the hull. (None, 0) if no target has reported.
+        """
+        self.rebuild()
+        if len(self.hullIndices) == 0:
+            return (None, 0.0)
+        hull = self.positions[self.hullIndices]
+        distances = nm.hypot(hull[:, 0] - point[0], hull[:, 1] - point[1])
+        i = int(nm.argmax(distances))
+        return (int(self.hullIndices[i]), float(distances[i]))
+
+    def circle(self):
+        # Minimum enclosing circle (x, y, radius) of the group, None if empty
+        self.rebuild()
+        if len(self.hullIndices) == 0:
+            return None
+        if self.circleCache is None:
+            self.circleCache = tuple(float(v) for v in enclosingCircle(
+                [tuple(p) for p in self.positions[self.hullIndices]]))
+        return self.circleCache
@@ -0,0 +1,479 @@
+# Follow-targets behavior for a quadcopter and a group of UGVs
+# The ground control station (GCS) state is a dictionary of info, updated
+# by the functions below as messages arrive. The scripts that run the GCS
+# only move messages between Redis and these functions.
+
+# Import libraries
+import numpy as nm
+import math
+from footprint import FOV_DEG, tiltFromNadir, getGroundFootprint, calcFootprintDistances, rotatePoint
+from estimator import TargetEstimator
+from assign import TargetClusterer
+from extent import GroupExtent
+from viewplan import planView
+from commands import commandFrame
+from codec import decodeMessage
+from messaging import TARGET_PREFIX, QUAD_PREFIX, drain, channelName
+from profiling import Profiler
+
+# Candidate standoff distances evaluated per plan (see planCommands)
+STANDOFF_CANDIDATES = 16
+
+# Stands in for a Profiler when the caller has none
+QUIET = Profiler ('gcs')
+
+
+def newTargets (targetNames):
+    targets = []
+    for index, name in enumerate (targetNames):
+        target = {'name':name, 'connStr':'Morse-Marisa-' + name, 'comm':False, 'index':index}
+        target["distance"] = None
+        targets.append (target)
+    return targets
+
+
+def newGCS (quadName, targetNames, standoff = 2, viewMargin = 4, groupExtent = 'circle',
+            frameMargin = 8, minAltitude = 10, maxAltitude = 120, fov = FOV_DEG,
+            gimbalOffset = (0.0, 0.0), verbose = True):
+    """
+    Function: newGCS
+    Arguments:
+        quadName: name of the quadcopter
+        targetNames: list of target names
+        standoff: meters beyond the farthest target to hold the quadcopter
+        groupExtent: how to measure the group (see updateExtent):
+            'circle': from the center of its minimum enclosing circle
+            'centroid': from its centroid, to the farthest target
+        viewMargin: reposition when a target is within this many meters of leaving the view
+        frameMargin: meters between the group and the edge of the planned view
+        minAltitude, maxAltitude: altitude limits of the planned view (see viewplan.py)
+        fov, gimbalOffset: camera field of view and gimbal offset in degrees,
+            e.g. from footprint.loadCameraProfile
+        verbose: print each target's in-view check
+    Purpose:
+        Returns the initial GCS state for one quadcopter following the targets
+    """
+    quad = { 'name':quadName, 'connStr':'Morse-QCOORD-' + quadName, 'waypoint':{}, 'x':0, 'y':0}
+    targets = newTargets (targetNames)
+
+    # Setup camera
+    # Altitude follows the quadcopter's telemetry
+    camera = { 'xSensor_mm': 255,
+               'ySensor_mm': 255,
+               'focallen_mm': 93.0909,
+               'xGimbal_deg': 0,
+               'yGimbal_deg': 0,
+    }
+
+    return { 'quad':quad, 'targets':targets,
+             'targetsByName':{ t['name']:t for t in targets },
+             'camera':camera, 'altitude':30, 'fov':tuple (fov),
+             'gimbalOffset':tuple (gimbalOffset),
+             # World model
+             'estimator':TargetEstimator (len (targets)), 'centroidVelocity':None,
+             'extent':GroupExtent (len (targets)), 'groupExtent':groupExtent,
+             # Control logic
+             'standoff':standoff, 'viewMargin':viewMargin, 'verbose':verbose,
+             'frameMargin':frameMargin, 'minAltitude':minAltitude, 'maxAltitude':maxAltitude, 'view':None,
+             'haveWaypoint':False, 'firstWaypoint':True, 'reposition':False,
+             'position':None, 'centroid':None, 'groupCenter':None, 'groupRadius':None, 'origin':None,
+             'footprint':None }
+
+
+def newFleet (quadNames, targetNames, hysteresis = 5.0, **options):
+    """
+    Function: newFleet
+    Arguments:
+        quadNames: names of the quadcopters
+        targetNames: list of target names
+        hysteresis: meters a target must be nearer another group before it moves
+        options: passed to newGCS for every quadcopter
+    Purpose:
+        Returns the GCS state for several quadcopters sharing the targets.
+        The fleet holds the targets and their estimator, so updateTarget and
+        predictTargets work on it as on a single GCS. Each quadcopter's GCS
+        (fleet['quads'][name]) sees only the targets assigned to it.
+    """
+    targets = newTargets (targetNames)
+    estimator = TargetEstimator (len (targets))
+    quads = {}
+    for name in quadNames:
+        gcs = newGCS (name, [], **options)
+        gcs['estimator'] = estimator
+        gcs['extent'] = GroupExtent (len (targets))
+        quads[name] = gcs
+    return { 'targets':targets, 'targetsByName':{ t['name']:t for t in targets },
+             'estimator':estimator, 'quads':quads, 'order':list (quadNames),
+             'clusterer':TargetClusterer (len (quadNames), len (targetNames), hysteresis),
+             # Time of the last plan, for timed replans (see gcsPass)
+             'lastPlan':None }
+
+
+def assignTargets (fleet, names):
+    """
+    Function: assignTargets
+    Arguments:
+        fleet: fleet state
+        names: targets whose position changed
+    Purpose:
+        Updates the target groups with the new positions.
+        Returns the names of the quadcopters whose group changed.
+    """
+    changed = set ()
+    for name in names:
+        t = fleet['targetsByName'][name]
+        (old, new) = fleet['clusterer'].update (t['index'], (t['pos_x'], t['pos_y']))
+        if old != new:
+            changed.update (fleet['order'][c] for c in (old, new) if c >= 0)
+    for quadName in changed:
+        gcs = fleet['quads'][quadName]
+        members = fleet['clusterer'].members (fleet['order'].index (quadName))
+        gcs['targets'] = [fleet['targets'][i] for i in members]
+        gcs['reposition'] = True
+    return changed
+
+
+def quadOf (fleet, name):
+    # Name of the quadcopter that follows target name, None until it reports
+    cluster = fleet['clusterer'].assignment[fleet['targetsByName'][name]['index']]
+    return fleet['order'][cluster] if cluster >= 0 else None
+
+
+def calcCentroid (targets, posORway):
+    """
+    Function: calcCentroid
+    Arguments:
+        targets: List of 'Target' structs
+        posORway: Whether you are looking for centroid of positions ("pos") or of their next waypoints ("way")
+    Purpose:
+        Returns the center point of the current positions in all targets
+    Source:
+        http://stackoverflow.com/questions/23020659/fastest-way-to-calculate-the-centroid-of-a-set-of-coordinate-tuples-in-python-wi
+    """
+    if posORway == "pos":
+        points = [(t['pos_x'], t['pos_y']) for t in targets if t["comm"]]
+    elif posORway == "way":
+        points = [(t['dest_x'], t['dest_y']) for t in targets if t["comm"]]
+    x, y = zip (*points)
+    l = len (x)
+    return sum (x) / l, sum (y) / l
+
+
+def updateQuad (gcs, msg_data):
+    """
+    Function: updateQuad
+    Arguments:
+        gcs: GCS state
+        msg_data: decoded message from the quadcopter
+    Purpose:
+        Track the quadcopter's position and camera from its telemetry (tag 5)
+    """
+    if msg_data['tag'] == 5:
+        gcs['camera']['xGimbal_deg'] = float (tiltFromNadir (msg_data['xGimbal_deg'])) + gcs['gimbalOffset'][0]
+        gcs['camera']['yGimbal_deg'] = gcs['gimbalOffset'][1]
+        gcs['quad']["x"] = msg_data['pos_x']
+        gcs['quad']['y'] = msg_data['pos_y']
+        gcs['altitude'] = max (msg_data['pos_z'], 0.1)
+        gcs['position'] = (float(gcs['quad']["x"]), float(gcs['quad']["y"]))
+
+
+def updateTarget (gcs, name, msg_data, timestamp):
+    """
+    Function: updateTarget
+    Arguments:
+        gcs: GCS state
+        name: name of the target that sent the message
+        msg_data: decoded status message
+        timestamp: time the message was received
+    Purpose:
+        Store a target's reported position and destination, and filter the
+        report at its send time, as an adaptive rover's BroadcastGate does
+        (see deadreckon.py), so both predict the same position.
+        Returns False if the message is not from one of the GCS's targets.
+    """
+    t = gcs['targetsByName'].get (name)
+    if t is None:
+        return False
+
+    #! Should actually check tag to see what kind of message
+    t['pos_x'] = msg_data['pos_x']
+    t['pos_y'] = msg_data['pos_y']
+    t['dest_x'] = msg_data['dest_x']
+    t['dest_y'] = msg_data['dest_y']
+    t['comm'] = True
+    t['timestamp'] = timestamp
+    # Send time, to trace how old the data behind each plan is
+    t['sentAt'] = msg_data.get ('timestamp')
+
+    # Filter the report. Adaptive rovers also report their velocity
+    velocity = (msg_data.get('vel_x'), msg_data.get('vel_y'))
+    if None in velocity:
+        velocity = (nm.nan, nm.nan)
+    at = t['sentAt'] if t['sentAt'] is not None else timestamp
+    gcs['estimator'].update ([t['index']], [at], [(t['pos_x'], t['pos_y'])], [velocity])
+    return True
+
+
+def predictTargets (gcs, now):
+    """
+    Function: predictTargets
+    Arguments:
+        gcs: GCS state
+        now: current time
+    Purpose:
+        Replace every target's last reported position with the estimator's
+        prediction at time now, for all targets in one vectorized step
+    """
+    positions = gcs['estimator'].predict (now)
+    for t in gcs['targets']:
+        if t['comm']:
+            t['pos_x'] = float (positions[t['index'], 0])
+            t['pos_y'] = float (positions[t['index'], 1])
+
+
+def updateFootprint (gcs):
+    """
+    Function: updateFootprint
+    Arguments:
+        gcs: GCS state
+    Purpose:
+        Find the camera footprint, once there is a waypoint and a quadcopter position
+    """
+    gcs['footprint'] = None
+    if gcs['haveWaypoint'] == True and gcs['position'] is not None:
+        tpose = [float(gcs['groupCenter'][0]), float (gcs['groupCenter'][1])]
+        gcs['footprint'] = getGroundFootprint (gcs['position'], tpose, gcs['camera'], gcs['altitude'], gcs['fov'])
+    return gcs['footprint']
+
+
+def updateDistances (gcs):
+    """
+    Function: updateDistances
+    Arguments:
+        gcs: GCS state
+    Purpose:
+        Update every target's distance from the footprint, all targets at once.
+        Requests a reposition if any target is outside the camera view.
+    """
+    if gcs['footprint'] is None:
+        return
+    reporting = [t for t in gcs['targets'] if t['comm']]
+    if len (reporting) == 0:
+        return
+    points = [(t['pos_x'], t['pos_y']) for t in reporting]
+    distances = calcFootprintDistances (gcs['footprint'], points)
+    for i, t in enumerate (reporting):
+        t['distance'] = {'fromCenter' : float (distances['fromCenter'][i]),
+                         'fromFootprint' : float (distances['fromFootprint'][i]),
+                         'fromBoundary' : float (distances['fromBoundary'][i]),
+                         'fromFootprintRel' : float (distances['fromFootprintRel'][i]),
+        }
+        if t['distance']['fromFootprintRel'] + gcs['viewMargin'] > 0:
+            if gcs['verbose']:
+                print ("%s is outside camera view" % t['name'])
+            gcs['reposition'] = True
+        elif gcs['verbose']:
+            print ("%s is within camera view"  % t['name'])
+        if gcs['verbose']:
+            print ("------")
+
+
+def updateExtent (gcs):
+    """
+    Function: updateExtent
+    Arguments:
+        gcs: GCS state
+    Purpose:
+        Bring the group's hull up to date with the reporting targets and
+        measure the group: gcs['groupCenter'] and gcs['groupRadius'], the
+        circle around every target. Only targets that moved are checked
+        against the hull, which is rebuilt only when it changed.
+    """
+    extent = gcs['extent']
+    reporting = [t for t in gcs['targets'] if t['comm']]
+    indices = [t['index'] for t in reporting]
+
+    # Targets that left the group (several quadcopters)
+    left = extent.active.copy ()
+    left[indices] = False
+    for i in nm.flatnonzero (left):
+        extent.remove (i)
+    extent.updateMany (indices, [(t['pos_x'], t['pos_y']) for t in reporting])
+
+    if gcs['groupExtent'] == 'circle':
+        (x, y, radius) = extent.circle ()
+        gcs['groupCenter'] = (x, y)
+    else:
+        gcs['groupCenter'] = gcs['centroid']
+        radius = extent.farthest (gcs['centroid'])[1]
+    gcs['groupRadius'] = radius
+    return (gcs['groupCenter'], radius)
+
+
+def planCommands (gcs):
+    """
+    Function: planCommands
+    Arguments:
+        gcs: GCS state
+    Purpose:
+        Place the quadcopter at a stand-off distance behind the group of targets,
+        facing its center (see updateExtent), at the lowest altitude that keeps
+        the group in view, over a batch of candidate standoffs (see viewplan.py).
+        Returns the commands to send: one command frame with the waypoint, its
+        altitude and the ground point the camera aims at (see commands.py),
+        carrying as 'origin' the send time of the oldest target report behind it.
+    """
+    targets = gcs['targets']
+    quad = gcs['quad']
+
+    #Get centroid of targets' positions
+    centroid = calcCentroid (targets, "pos")
+    gcs['centroid'] = centroid
+
+    # Estimate centroid velocity
+    reporting = [t['index'] for t in targets if t['comm']]
+    gcs['centroidVelocity'] = tuple (nm.mean (gcs['estimator'].velocities (reporting), axis = 0))
+
+    # Get centroid of target's next waypoint positions
+    waypoint_centroid = calcCentroid (targets, "way")
+
+    (center, radius) = updateExtent (gcs)
+
+    # Align at stand-off distance
+    # 1: l = Waypoint - Centroid
+    l = nm.subtract (waypoint_centroid, centroid)
+    # 2: Reverse l
+    lrev = ( (-1) * l[0], (-1) * l[1] )
+    # 3: Get angle of lrev
+    theta = nm.arctan2 (lrev[1], lrev[0])
+    if theta < 0:
+        theta = theta * 2 * math.pi
+    # 4: Lowest view over standoffs from standoff-dist out, then closest to nadir
+    standoffs = gcs['standoff'] + nm.linspace (0, radius + gcs['frameMargin'], STANDOFF_CANDIDATES)
+    view = planView (radius + standoffs, radius, gcs['frameMargin'], gcs['fov'],
+        gcs['minAltitude'], gcs['maxAltitude'])
+    best = nm.lexsort ((view['tilt_deg'], view['altitude']))[0]
+    # 5: Go there in lrev dir
+    direction = rotatePoint ([0, 0], (1, 0), theta)
+    # Newpoint = Center + N, aiming the camera back toward the center
+    # The gimbal points offset from where it is told to
+    way = nm.add (nm.multiply (direction, radius + standoffs[best]), center)
+    aimDistance = view['altitude'][best] * math.tan (math.radians (view['tilt_deg'][best] - gcs['gimbalOffset'][0]))
+    aim = nm.add (nm.multiply (direction, radius + standoffs[best] - aimDistance), center)
+
+    # Set waypoint and point heading toward
+    gcs['haveWaypoint'] = True
+    if gcs['reposition'] == True or gcs['firstWaypoint'] == True:
+        quad['waypoint']['x'] = way[0]
+        quad['waypoint']['y'] = way[1]
+        quad['waypoint']['z'] = float (view['altitude'][best])
+        quad['target'] = {'x':aim[0], 'y':aim[1]}
+        gcs['view'] = { key:view[key][best].item () for key in view }
+        gcs['view']['standoff'] = float (standoffs[best])
+    quad['waypoint']['heading_x'] = center[0]
+    quad['waypoint']['heading_y'] = center[1]
+
+    # Oldest report behind this plan
+    sent = [t['sentAt'] for t in targets if t['comm'] and t.get ('sentAt') is not None]
+    gcs['origin'] = min (sent) if sent else None
+
+    gcs['firstWaypoint'] = False
+    gcs['reposition'] = False
+
+    # Waypoint and camera target for the quadcopter, in one frame
+    return [commandFrame (quad['waypoint'], quad['target'], gcs['origin'])]
+
+
+def linkName (msg, msg_data):
+    # Link a received message is counted on: its channel; a quadcopter's
+    # pongs (tag 1) carry a sequence of their own
+    link = channelName (msg, '')
+    if msg_data.get ('tag') == 1:
+        link += ' pong'
+    return link
+
+
+def gcsPass (fleet, inboxes, clock, predictPeriod = 0, links = None, profiler = None):
+    """
+    Function: gcsPass
+    Arguments:
+        fleet: fleet state (see newFleet); one quadcopter is a fleet of one
+        inboxes: where quadcopter telemetry and target status arrive: redis PubSub
+            objects, or anything with their get_message (e.g. streams.StreamReader,
+            shmbus.ShmSubscriber, messaging.Inbox), read until empty
+        clock: object with a time () method
+        predictPeriod: if > 0, replan at least this often, from the predicted targets
+        links: LinkMonitor of the received messages (optional)
+        profiler: Profiler timing each stage (optional)
+    Purpose:
+        One pass of the polling GCS loop, shared by follow_targets.py,
+        mission.py and replay_bus.py. Takes in everything waiting, regroups
+        the targets and replans every quadcopter whose group changed or moved.
+        Returns the (quadcopter name, command) pairs to send, in order.
+    """
+    if profiler is None:
+        profiler = QUIET
+
+    # Everything waiting since the last pass, routed by channel
+    quadReports = []
+    targetReports = []
+    for inbox in inboxes:
+        with profiler.span ('drain'):
+            msgs = drain (inbox)
+        for msg in msgs:
+            name = channelName (msg, QUAD_PREFIX)
+            if name in fleet['quads']:
+                reports = quadReports
+            else:
+                name = channelName (msg, TARGET_PREFIX)
+                reports = targetReports
+            if name is None:
+                continue
+            try:
+                with profiler.span ('decode'):
+                    msg_data = decodeMessage (msg)
+            except ValueError:
+                continue    # e.g. 'Boot', or a malformed record
+            if links is not None:
+                links.observe (linkName (msg, msg_data), msg_data, clock.time ())
+            reports.append ((name, msg_data))
+
+    # Update quadcopters' status and camera footprints
+    for (name, msg_data) in quadReports:
+        updateQuad (fleet['quads'][name], msg_data)
+    with profiler.span ('footprint'):
+        for gcs in fleet['quads'].values ():
+            updateFootprint (gcs)
+
+    # Update targets' status
+    reported = set ()
+    for (name, msg_data) in targetReports:
+        if updateTarget (fleet, name, msg_data, clock.time ()):
+            reported.add (name)
+
+    # Targets where the filter puts them now; on a timed replan every target moves
+    now = clock.time ()
+    with profiler.span ('predict'):
+        predictTargets (fleet, now)
+    if predictPeriod > 0 and fleet['lastPlan'] is not None and now - fleet['lastPlan'] >= predictPeriod:
+        reported = set (t['name'] for t in fleet['targets'] if t['comm'])
+
+    # Regroup, then replan every quadcopter whose group changed or moved
+    with profiler.span ('assign'):
+        replan = assignTargets (fleet, reported)
+        replan.update (quadOf (fleet, name) for name in reported)
+
+    outgoing = []
+    for quadName in fleet['order']:
+        gcs = fleet['quads'][quadName]
+        with profiler.span ('distances'):
+            updateDistances (gcs)
+        if quadName in replan and len (gcs['targets']) > 0:
+            with profiler.span ('plan'):
+                commands = planCommands (gcs)
+            if links is not None and gcs['origin'] is not None:
+                links.latency ('report->plan', clock.time () - gcs['origin'])
+            outgoing.extend ((quadName, command) for command in commands)
+    if replan:
+        fleet['lastPlan'] = now
+    return outgoing
@@ -0,0 +1,221 @@
+# Camera ground footprint calculations
+# Vectorized over NumPy arrays so one call computes any number of footprints
+
+# Import libraries
+import json
+import os
+import numpy as nm
+import math
+
+
+## WARNING: Hard-coded. Assumes MORSE default camera dimensions and focallen
+## Used when there is no camera profile (see loadCameraProfile)
+FOV_DEG = (768, 768)
+
+# Camera profile written by scripts/calibrate_camera.py
+DEFAULT_CAMERA_PROFILE = os.path.join('inData', 'camera.json')
+
+
+def loadCameraProfile(path = DEFAULT_CAMERA_PROFILE):
+    """
+    Function: loadCameraProfile
+    Arguments:
+        path: camera profile (JSON), see calibrate.fitCamera
+    Purpose:
+        Returns the profile as {'fov_deg':(x, y), 'gimbalOffset_deg':(x, y)}.
+        Without a profile at the default path, falls back to FOV_DEG and no offset.
+    """
+    if path == DEFAULT_CAMERA_PROFILE and not os.path.exists(path):
+        return {'fov_deg':FOV_DEG, 'gimbalOffset_deg':(0.0, 0.0)}
+    with open(path) as f:
+        profile = json.load(f)
+    profile['fov_deg'] = tuple(profile['fov_deg'])
+    profile['gimbalOffset_deg'] = tuple(profile.get('gimbalOffset_deg', (0.0, 0.0)))
+    return profile
+
+
+def halfAngles(fov = FOV_DEG):
+    # Half FoV in radians, as the footprint model sees it (tan is periodic)
+    return tuple(math.atan(abs(math.tan(math.radians(0.5 * f)))) for f in fov)
+
+
+def tiltFromNadir(tilt_deg):
+    """
+    Function: tiltFromNadir
+    Arguments:
+        tilt_deg: gimbal tilt as the copter reports it (xGimbal_deg), scalar or array
+    Purpose:
+        The PTU tilt is a depression below the horizon (see roboutils.point_camera);
+        the footprint model measures the tilt from nadir toward the heading.
+    """
+    return 90.0 - nm.abs(tilt_deg)
+
+
+def calcFieldOfView(camera):
+    """
+    Function: calcFieldOfView
+    Arguments:
+        camera: Camera object
+    Purpose:
+        Calculate the field of view (FoV), in degrees, for a camera
+        given the x and y sensor dimensions and the focal length
+    """
+    xView = 2 * math.atan(camera['xSensor_mm'] / (2 * camera['focallen_mm']))
+    yView = 2 * math.atan(camera['ySensor_mm'] / (2 * camera['focallen_mm']))
+    return (math.degrees(xView), math.degrees(yView))
+
+
+def rotatePoint(centerPoint, point, angle):
+    """Rotates a point around another centerPoint. Angle is in radians.
+    Rotation is counter-clockwise"""
+    # Source: https://gist.github.com/somada141/d81a05f172bb2df26a2c
+    temp_point = point[0]-centerPoint[0] , point[1]-centerPoint[1]
+    temp_point = ( temp_point[0]*math.cos(angle)-temp_point[1]*math.sin(angle) , temp_point[0]*math.sin(angle)+temp_point[1]*math.cos(angle))
+    temp_point = temp_point[0]+centerPoint[0] , temp_point[1]+centerPoint[1]
+    return temp_point
+
+
+def calcHeadings(positions, targets):
+    """
+    Function: calcHeadings
+    Arguments:
+        positions: (N, 2) array of camera ground positions
+        targets: (N, 2) array of points the camera faces
+    Purpose:
+        Footprint rotation for a camera at each position facing each target.
+        Same convention as getGroundFootprint: angle in [0, 2pi) minus pi/2.
+    """
+    i = nm.subtract(targets, positions)
+    theta = nm.arctan2(i[..., 1], i[..., 0])
+    theta = nm.where(theta < 0, theta + 2 * math.pi, theta)
+    return theta - (math.pi / 2)
+
+
+def calcGroundFootprintDimensions(xGimbal_deg, yGimbal_deg, altitudes, fov = FOV_DEG):
+    """
+    Function: calcGroundFootprintDimensions
+    Arguments:
+        xGimbal_deg: (N,) array of gimbal angles along the heading, in degrees
+        yGimbal_deg: (N,) array of gimbal angles across the heading, in degrees
+        altitudes: (N,) array of camera altitudes in meters
+        fov: (x, y) field of view in degrees
+    Purpose:
+        Calculate the ground footprint of an aerial camera, relative
+        to the camera position. Returns (front, behind, left, right) arrays.
+    """
+    xGimbal = nm.radians(nm.asarray(xGimbal_deg, dtype = float))
+    yGimbal = nm.radians(nm.asarray(yGimbal_deg, dtype = float))
+    altitudes = nm.asarray(altitudes, dtype = float)
+    xHalf = math.radians(0.5 * fov[0])
+    yHalf = math.radians(0.5 * fov[1])
+    distFront = altitudes * nm.tan(xGimbal + xHalf)
+    distBehind = altitudes * nm.tan(xGimbal - xHalf)
+    distLeft = altitudes * nm.tan(yGimbal - yHalf)
+    distRight = altitudes * nm.tan(yGimbal + yHalf)
+    return (distFront, distBehind, distLeft, distRight)
+
+
+def calcGroundFootprints(positions, headings, xGimbal_deg, yGimbal_deg, altitudes, fov = FOV_DEG):
+    """
+    Function: calcGroundFootprints
+    Arguments:
+        positions: (N, 2) array of camera ground positions
+        headings: (N,) array of footprint rotations in radians (see calcHeadings)
+        xGimbal_deg, yGimbal_deg: (N,) arrays of gimbal angles in degrees
+        altitudes: (N,) array of camera altitudes in meters
+        fov: (x, y) field of view in degrees
+    Purpose:
+        Returns an (N, 4, 2) array of footprint corners, ordered
+        lower left, upper left, upper right, lower right.
+        Scalar arguments are broadcast against the arrays.
+    """
+    positions = nm.asarray(positions, dtype = float).reshape(-1, 2)
+    headings, xGimbal_deg, yGimbal_deg, altitudes = nm.broadcast_arrays(
+        nm.asarray(headings, dtype = float).reshape(-1),
+        nm.asarray(xGimbal_deg, dtype = float).reshape(-1),
+        nm.asarray(yGimbal_deg, dtype = float).reshape(-1),
+        nm.asarray(altitudes, dtype = float).reshape(-1))
+
+    (distFront, distBehind, distLeft, distRight) = calcGroundFootprintDimensions(
+        xGimbal_deg, yGimbal_deg, altitudes, fov)
+
+    # Corner offsets before rotation, shape (N, 4, 2)
+    offsets = nm.empty((len(distFront), 4, 2))
+    offsets[:, 0, 0] = distLeft
+    offsets[:, 0, 1] = distBehind
+    offsets[:, 1, 0] = distLeft
+    offsets[:, 1, 1] = distFront
+    offsets[:, 2, 0] = distRight
+    offsets[:, 2, 1] = distFront
+    offsets[:, 3, 0] = distRight
+    offsets[:, 3, 1] = distBehind
+
+    # Rotate counter-clockwise about the camera position
+    cos = nm.cos(headings)[:, None]
+    sin = nm.sin(headings)[:, None]
+    corners = nm.empty_like(offsets)
+    corners[..., 0] = offsets[..., 0] * cos - offsets[..., 1] * sin
+    corners[..., 1] = offsets[..., 0] * sin + offsets[..., 1] * cos
+    return corners + positions[:, None, :]
+
+
+def getGroundFootprint(position, target, camera, altitude, fov = FOV_DEG):
+    """
+    Function: getGroundFootprint
+    Arguments:
+        position: ground (x, y) coordinates of camera
+        target: ground (x, y) coordinates the camera faces
+        camera: Camera object
+        altitude: Altitude of camera in meters
+        fov: (x, y) field of view in degrees
+    Purpose:
+        Single-footprint wrapper around calcGroundFootprints.
+        Returns a list of four (x, y) corner tuples.
+    """
+    theta = calcHeadings(position, target)
+    corners = calcGroundFootprints(position, theta, camera['xGimbal_deg'],
+        camera['yGimbal_deg'], altitude, fov)[0]
+    return [tuple(c) for c in corners.tolist()]
+
+
+def calcFootprintDistances(footprint, points):
+    """
+    Function: calcFootprintDistances
+    Arguments:
+        footprint: (..., 4, 2) array of convex footprint corners, in order
+        points: (..., M, 2) array of ground (x, y) points, e.g. target positions
+    Purpose:
+        Scores every point against the footprint in one pass, without Shapely.
+        Returns a dict of (..., M) arrays with the same fields the GCS scripts use:
+            fromCenter:       distance to the footprint centroid
+            fromFootprint:    distance to the footprint (0 if inside)
+            fromBoundary:     distance to the footprint edges
+            fromFootprintRel: signed boundary distance (negative if inside)
+    """
+    corners = nm.asarray(footprint, dtype = float)[..., None, :, :]    # (..., 1, 4, 2)
+    points = nm.asarray(points, dtype = float)[..., :, None, :]        # (..., M, 1, 2)
+
+    # Edges from each corner to the next
+    edges = nm.roll(corners, -1, axis = -2) - corners
+    rel = points - corners                                             # (..., M, 4, 2)
+
+    # Distance to each edge segment
+    lengths = nm.sum(edges * edges, axis = -1)
+    lengths = nm.where(lengths > 0, lengths, 1.0)
+    t = nm.clip(nm.sum(rel * edges, axis = -1) / lengths, 0.0, 1.0)
+    nearest = rel - t[..., None] * edges
+    fromBoundary = nm.sqrt(nm.min(nm.sum(nearest * nearest, axis = -1), axis = -1))
+
+    # Inside a convex polygon when on the same side of every edge
+    cross = edges[..., 0] * rel[..., 1] - edges[..., 1] * rel[..., 0]
+    inside = nm.all(cross >= 0, axis = -1) | nm.all(cross <= 0, axis = -1)
+
+    center = nm.mean(corners, axis = -2)                               # (..., 1, 2)
+    offset = points[..., 0, :] - center
+    fromCenter = nm.sqrt(nm.sum(offset * offset, axis = -1))
+
+    return {'fromCenter' : fromCenter,
+            'fromFootprint' : nm.where(inside, 0.0, fromBoundary),
+            'fromBoundary' : fromBoundary,
+            'fromFootprintRel' : nm.where(inside, -fromBoundary, fromBoundary),
+    }
@@ -0,0 +1,124 @@
+# Cached gimbal and camera state for a robot with a PTU-mounted video camera
+# Camera properties are parsed once. The gimbal rotation follows the commanded
+# pan and tilt, and is only read back from the simulator at a low rate.
+
+# Import libraries
+import math
+import re
+import threading
+import time
+
+
+# Rotation components (of the camera configuration) holding pan and tilt.
+# The copter reports the z component as xGimbal_deg and y as yGimbal_deg.
+PAN_AXIS = 1
+TILT_AXIS = 2
+
+
+def parseProperty(properties, name):
+    """
+    Function: parseProperty
+    Arguments:
+        properties: result of videocamera.get_properties ()
+        name: property name, e.g. 'cam_focal'
+    Purpose:
+        Returns a numeric camera property. MORSE reports each property as
+        [value, type, doc]; fall back to scraping its string form otherwise.
+    """
+    if isinstance(properties, dict) and name in properties:
+        value = properties[name]
+        if isinstance(value, (list, tuple)):
+            value = value[0]
+        return float(value)
+    found = re.findall('\'' + name + '\': \[([.0-9]*),', str(properties))[0]
+    return float(found)
+
+
+def parseRotation(configurations):
+    """
+    Function: parseRotation
+    Arguments:
+        configurations: result of videocamera.get_configurations ()
+    Purpose:
+        Returns the camera rotation as a list of three angles in radians
+    """
+    if isinstance(configurations, dict) and 'rotation' in configurations:
+        rotation = configurations['rotation']
+        while isinstance(rotation[0], (list, tuple)):
+            rotation = rotation[0]
+        return [float(a) for a in rotation[:3]]
+    rotation = re.findall('rotation[^]]*', str(configurations))[0]
+    rotation = rotation.replace('rotation\': [[', '')
+    return [float(a) for a in rotation.split(", ")[:3]]
+
+
+class Gimbal:
+    """
+    Class: Gimbal
+    Arguments:
+        robot: robot dictionary, with 'simu' and 'name'
+        verifyInterval: seconds between rotation read-backs from the simulator
+        clock: object with a time () method (default: robot['clock'] or time)
+    Purpose:
+        Keeps the camera's specs and rotation without a simulator request
+        per control step. Use setPanTilt to command the PTU and update to
+        refresh the rotation when a verification read is due. The copter's
+        command loop and telemetry thread share one Gimbal: every method
+        holds its lock.
+    """
+
+    def __init__(self, robot, verifyInterval = 1.0, clock = None):
+        self.robot = robot
+        self.verifyInterval = verifyInterval
+        self.clock = clock if clock is not None else robot.get('clock', time)
+        self.ptu = getattr(robot['simu'], robot['name']).PTU
+        self.lock = threading.RLock()
+
+        # Camera specs never change: parse them once
+        properties = self.ptu.videocamera.get_properties()
+        self.cam_height = parseProperty(properties, 'cam_height')
+        self.cam_width = parseProperty(properties, 'cam_width')
+        self.cam_focal = parseProperty(properties, 'cam_focal')
+
+        self.reads = 0
+        self.verify()
+
+    def verify(self):
+        # Read the actual rotation back from the simulator
+        with self.lock:
+            self.rotation = parseRotation(self.ptu.videocamera.get_configurations())
+            self.lastVerified = self.clock.time()
+            self.reads += 1
+            return list(self.rotation)
+
+    def update(self):
+        # Verify the rotation if the last read-back is too old
+        with self.lock:
+            if self.clock.time() - self.lastVerified >= self.verifyInterval:
+                self.verify()
+            return list(self.rotation)
+
+    def setPanTilt(self, pan, tilt):
+        # Command and record the new rotation together, so no reader sees one without the other
+        with self.lock:
+            self.ptu.set_pan_tilt(pan, tilt)
+            self.rotation[PAN_AXIS] = pan
+            self.rotation[TILT_AXIS] = tilt
+
+    def degrees(self):
+        # Gimbal angles as reported in the copter's camera info
+        with self.lock:
+            return (math.degrees(self.rotation[2]), math.degrees(self.rotation[1]))
+
+    def camera(self):
+        """
+        Function: camera
+        Purpose:
+            Returns the camera object the copter publishes (see follow.py)
+        """
+        (xGimbal_deg, yGimbal_deg) = self.degrees()
+        return {'xSensor_mm':self.cam_height,
+                'ySensor_mm':self.cam_width,
+                'focallen_mm':self.cam_focal,
+                'xGimbal_deg':xGimbal_deg,
+                'yGimbal_deg':yGimbal_deg}
@@ -0,0 +1,119 @@
+# Per-link message statistics
+# Every message carries its publisher's sequence number and send time
+# (see codec.py). A receiver feeds each one to a LinkMonitor, which keeps,
+# per link, the message age histogram and counts of lost, reordered and
+# duplicate messages, along with end-to-end latencies such as
+# rover report -> GCS plan -> copter actuation, and event counters.
+
+# Import libraries
+import atexit
+import sys
+from profiling import Stage
+
+
+class LinkStats:
+    """
+    Class: LinkStats
+    Arguments:
+        name: link name, e.g. the channel
+    Purpose:
+        Statistics of the messages of one publisher on one link.
+        A message with a sequence number below the highest seen is counted
+        as reordered and is no longer counted as lost.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.skewed = 0
+        self.highest = None
+        self.age = Stage(name)
+
+    def observe(self, seq, sent, now):
+        self.received += 1
+        if sent is not None:
+            age = now - sent
+            if age < 0:
+                # Sender's clock is ahead
+                self.skewed += 1
+                age = 0.0
+            self.age.record(age)
+        if seq is None:
+            return
+        if self.highest is None or seq > self.highest:
+            if self.highest is not None:
+                self.lost += seq - self.highest - 1
+            self.highest = seq
+        elif seq == self.highest:
+            self.duplicates += 1
+        else:
+            self.reordered += 1
+            self.lost = max(self.lost - 1, 0)
+
+
+class LinkMonitor:
+    """
+    Class: LinkMonitor
+    Arguments:
+        name: printed in the summary, e.g. the script
+    Purpose:
+        observe (link, msg_data, now) for every decoded message;
+        latency (name, seconds) for end-to-end latencies;
+        count (name, n) for events, e.g. coalesced commands
+    """
+
+    def __init__(self, name = 'links'):
+        self.name = name
+        self.links = {}
+        self.latencies = {}
+        self.counters = {}
+
+    def observe(self, link, msg_data, now):
+        stats = self.links.get(link)
+        if stats is None:
+            stats = self.links[link] = LinkStats(link)
+        stats.observe(msg_data.get('seq'), msg_data.get('timestamp'), now)
+        return stats
+
+    def latency(self, name, seconds):
+        stage = self.latencies.get(name)
+        if stage is None:
+            stage = self.latencies[name] = Stage(name)
+        stage.record(max(seconds, 0.0))
+
+    def count(self, name, n = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """
+        Function: summary
+        Purpose:
+            Returns a table of every link (received, lost, reordered,
+            duplicate messages and age percentiles), every latency and counter
+        """
+        lines = ["[{0}]".format(self.name),
+                 "{0:<24} {1:>8} {2:>6} {3:>6} {4:>6} {5:>10} {6:>10} {7:>10} {8:>10}".format(
+                     "link", "received", "lost", "reord", "dup", "age mean", "p50", "p99", "max (ms)")]
+        for stats in sorted(self.links.values(), key = lambda s: s.name):
+            age = stats.age
+            lines.append("{0:<24} {1:>8d} {2:>6d} {3:>6d} {4:>6d} {5:>10.2f} {6:>10.2f} {7:>10.2f} {8:>10.2f}".format(
+                stats.name, stats.received, stats.lost, stats.reordered, stats.duplicates,
+                1e3 * age.total / age.count if age.count else 0.0, 1e3 * age.percentile(50),
+                1e3 * age.percentile(99), 1e3 * age.max))
+        for stage in sorted(self.latencies.values(), key = lambda s: s.name):
+            lines.append("{0:<24} {1:>8d} {2:>6} {3:>6} {4:>6} {5:>10.2f} {6:>10.2f} {7:>10.2f} {8:>10.2f}".format(
+                stage.name, stage.count, "", "", "", 1e3 * stage.total / stage.count,
+                1e3 * stage.percentile(50), 1e3 * stage.percentile(99), 1e3 * stage.max))
+        for name in sorted(self.counters):
+            lines.append("{0:<24} {1:>8d}".format(name, self.counters[name]))
+        return "\n".join(lines)
+
+    def dump(self, out = None):
+        print(self.summary(), file = out if out is not None else sys.stderr)
+
+    def dumpOnExit(self):
+        # Print the summary when the process exits, if anything was received
+        atexit.register(lambda: self.dump() if self.links or self.latencies or self.counters else None)
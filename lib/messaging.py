@@ -0,0 +1,145 @@
+# Helpers for the Redis publisher/subscriber channels shared by robots and behaviors
+
+# Import libraries
+import collections
+
+# Channel names
+TARGET_PREFIX = 'Morse-Marisa-'
+QUAD_PREFIX = 'Morse-QCOORD-'
+# Broadcast to every quadcopter, for fleet-wide commands such as halt
+GCS_CHANNEL = 'GCS'
+
+# Telemetry transports: Redis pub/sub, Redis Streams (see streams.py) or shared memory (see shmbus.py)
+TRANSPORTS = ('pubsub', 'streams', 'shm')
+
+
+def commandChannel(quadName):
+    # Commands for one quadcopter only
+    return GCS_CHANNEL + '-' + quadName
+
+
+def groupChannel(group):
+    # Commands for every quadcopter in a group
+    return GCS_CHANNEL + '.' + group
+
+
+def commandChannels(quadName, groups = ()):
+    """
+    Function: commandChannels
+    Arguments:
+        quadName: name of the quadcopter
+        groups: names of the groups it belongs to
+    Purpose:
+        Returns the channels a quadcopter hears commands on: its own,
+        its groups' and the broadcast channel. Each quadcopter's
+        plans only go to its own channel, so adding quadcopters does
+        not add to the others' traffic.
+    """
+    return [commandChannel(quadName)] + [groupChannel(g) for g in groups] + [GCS_CHANNEL]
+
+
+
+def publisher(r, transport = 'pubsub', maxlen = None):
+    """
+    Function: publisher
+    Arguments:
+        r: redis connection
+        transport: one of TRANSPORTS
+        maxlen: streams only: entries kept per stream (default: streams.DEFAULT_MAXLEN)
+    Purpose:
+        Returns the publish (channel, data) function of the transport
+    """
+    if transport == 'streams':
+        from streams import StreamPublisher, DEFAULT_MAXLEN
+        return StreamPublisher(r, maxlen if maxlen is not None else DEFAULT_MAXLEN).publish
+    if transport == 'shm':
+        from shmbus import ShmPublisher
+        return ShmPublisher().publish
+    return r.publish
+
+
+def drain(pubsub, limit = None):
+    """
+    Function: drain
+    Arguments:
+        pubsub: redis PubSub object, or anything with its get_message, e.g. streams.StreamReader
+        limit: maximum number of messages to return (default: no limit)
+    Purpose:
+        Returns every message already waiting on the connection, without blocking.
+        Subscribe confirmations are skipped.
+    """
+    messages = []
+    while limit is None or len(messages) < limit:
+        msg = pubsub.get_message()
+        if msg is None:
+            break
+        if msg['type'] in ('message', 'pmessage'):
+            messages.append(msg)
+    return messages
+
+
+class Inbox:
+    """
+    Class: Inbox
+    Purpose:
+        Messages handed over within one process (mission.py, replay_bus.py),
+        read with the get_message of a redis PubSub object, e.g. by drain.
+        put (channel, data) queues a message.
+    """
+
+    def __init__(self):
+        self.messages = collections.deque()
+
+    def put(self, channel, data):
+        self.messages.append({'type':'message', 'channel':channel, 'data':data})
+
+    def get_message(self):
+        return self.messages.popleft() if self.messages else None
+
+
+def publishMany(r, messages):
+    """
+    Function: publishMany
+    Arguments:
+        r: redis connection
+        messages: (channel, data) pairs
+    Purpose:
+        Publishes every message in one pipelined write, one round trip
+        however many there are, in order.
+    """
+    pipe = r.pipeline(transaction = False)
+    for (channel, data) in messages:
+        pipe.publish(channel, data)
+    return pipe.execute()
+
+
+def subscribeTargets(r):
+    """
+    Function: subscribeTargets
+    Arguments:
+        r: redis connection
+    Purpose:
+        One pattern subscription that fans in the status of every target.
+        Use channelName to route the messages returned by drain.
+    """
+    pubsub = r.pubsub()
+    pubsub.psubscribe(TARGET_PREFIX + '*')
+    return pubsub
+
+
+def channelName(msg, prefix):
+    """
+    Function: channelName
+    Arguments:
+        msg: redis pubsub message
+        prefix: channel prefix, e.g. TARGET_PREFIX
+    Purpose:
+        Returns the robot name a message was published under,
+        or None if the channel does not start with prefix.
+    """
+    channel = msg['channel']
+    if isinstance(channel, bytes):
+        channel = channel.decode("utf-8")
+    if not channel.startswith(prefix):
+        return None
+    return channel[len(prefix):]
@@ -0,0 +1,202 @@
+# Single-process follow-targets missions for batch experiments
+# Runs the rovers, the quadcopters and the GCS of one mission against a
+# private simmorse world and a StepClock, with the control steps of the
+# scripts (vehicles.py, follow.gcsPass). Messages still pass through the
+# codec, over an in-memory bus owned by the mission, so message counts match
+# what Redis would carry, but missions share nothing and can run in parallel.
+
+# Import libraries
+import numpy as nm
+import simmorse
+from simclock import StepClock
+from codec import Encoder, decode
+from messaging import TARGET_PREFIX, QUAD_PREFIX, Inbox, commandChannel, drain
+from deadreckon import BroadcastGate
+from gimbal import Gimbal
+from telemetry import TelemetryGate, TelemetryPublisher
+from profiling import Profiler
+from linkstats import LinkMonitor
+from footprint import FOV_DEG, tiltFromNadir
+from coverage import calcFootprintTimeline, evaluate
+from roboutils import get_status, get_orientation, invalidate_pose
+from vehicles import DEFAULT_ALTITUDE, startRover, roverStep, sampleTelemetry, executeCommands
+from follow import newFleet, gcsPass
+
+# Control step of the copter and GCS, in simulated seconds
+STEP_S = 0.05
+
+
+def runMission(tracks, targetNames = ('susan', 'anton'), quadNames = ('godot',),
+               scene = 'field_exercise_1', broadcast = 'fixed', period = 0.5,
+               maxError = 1.0, heartbeat = 5.0, predict = 0.0, standoff = 2,
+               viewMargin = 4, groupExtent = 'circle', hysteresis = 5.0, codec = 'json', duration = 600.0, log = None,
+               camera = None, **gcsOptions):
+    """
+    Function: runMission
+    Arguments:
+        tracks: {robot: {'start', 'waypoints'}} of a round, e.g. TrajectoryStore.round ()
+        targetNames: rovers to run and follow
+        quadNames: quadcopters; the first must be in the scene
+        scene: simmorse scene
+        broadcast: 'fixed' (publish every period) or 'adaptive' (dead-reckoning gate, sampled every period)
+        period: seconds between rover status checks
+        maxError, heartbeat: adaptive broadcast parameters (see deadreckon.py)
+        predict: GCS timed replan period, 0 = only on reports (see follow_targets.py -p)
+        standoff, viewMargin, groupExtent: GCS controller parameters (see follow.newGCS)
+        camera: camera profile of the quadcopters, for the GCS and the ground truth
+            (see footprint.loadCameraProfile; default: FOV_DEG, no gimbal offset)
+        gcsOptions: other newGCS options, e.g. frameMargin
+        hysteresis: several quadcopters: target regrouping hysteresis (see follow.newFleet)
+        codec: wire encoding of all messages
+        duration: longest mission, in simulated seconds
+        log: buslog.LogWriter that records the mission's traffic (optional)
+    Purpose:
+        Runs one mission until every rover has reached its last waypoint.
+        With several quadcopters, the GCS splits the targets between them.
+        Returns the ground-truth timeline (inputs of coverage.evaluate)
+        and message counts.
+    """
+    if camera is None:
+        camera = {'fov_deg':FOV_DEG, 'gimbalOffset_deg':(0.0, 0.0)}
+    (fov, gimbalOffset) = (camera['fov_deg'], camera['gimbalOffset_deg'])
+    clock = StepClock()
+    simu = simmorse.Morse(scene, clock)
+    encoder = Encoder(codec, clock)
+    counts = {'status':{name:0 for name in targetNames}, 'telemetry':0, 'commands':0, 'bytes':0}
+
+    # Private bus: the GCS's inbox, and each quadcopter's
+    toGCS = Inbox()
+
+    def publish(channel, data):
+        counts['bytes'] += len(data)
+        if log is not None:
+            log.write(clock.time(), channel, data)
+
+    # Rovers, as robots/rover.py
+    rovers = []
+    for name in targetNames:
+        start = tracks[name]['start']
+        simu.add_robot(name, 'ATRV', start[0], start[1])
+        rover = {'name':name, 'destination':{'x':None, 'y':None}, 'simu':simu, 'clock':clock,
+                 'poseMaxAge':None, 'sample':0.0,
+                 'gate':BroadcastGate(maxError, heartbeat) if broadcast == 'adaptive' else None}
+        startRover(rover, tracks[name]['waypoints'])
+        rovers.append(rover)
+
+    # Quadcopters, as robots/copter.py. Any not in the scene start next to the first.
+    quads = {}
+    for (i, quadName) in enumerate(quadNames):
+        if quadName not in simu.robots:
+            first = simu.robots[quadNames[0]]
+            simu.add_robot(quadName, 'Quadrotor', first.x + 3 * i, first.y, first.z)
+        quad = {'name':quadName, 'destination':{'x':None, 'y':None}, 'simu':simu, 'clock':clock,
+                'poseMaxAge':None, 'altitude':DEFAULT_ALTITUDE, 'inbox':Inbox(),
+                'profiler':Profiler(quadName), 'links':LinkMonitor(quadName)}
+        quad['gimbal'] = Gimbal(quad, 1.0)
+        quad['camera'] = quad['gimbal'].camera()
+
+        def publishTelemetry(info, channel = QUAD_PREFIX + quadName):
+            data = encoder.encode(info)
+            counts['telemetry'] += 1
+            publish(channel, data)
+            toGCS.put(channel, data)
+        # At the copter's default rate and thresholds
+        quad['telemetry'] = TelemetryPublisher(lambda quad = quad: sampleTelemetry(quad), publishTelemetry,
+            gate = TelemetryGate(), clock = clock)
+        quads[quadName] = quad
+
+    # GCS, as follow_targets.py; one quadcopter is a fleet of one
+    fleet = newFleet(quadNames, list(targetNames), hysteresis,
+        standoff = standoff, viewMargin = viewMargin, groupExtent = groupExtent, fov = fov, gimbalOffset = gimbalOffset,
+        verbose = False, **gcsOptions)
+
+    # Ground truth, one row per control step, one column per quadcopter
+    timeline = {'times':[], 'positions':[], 'headingPoints':[], 'xGimbal_deg':[],
+                'altitudes':[], 'targets':[]}
+    while clock.time() < duration and not all(r['done'] for r in rovers):
+        now = clock.time()
+
+        # Rovers publish status every period
+        for rover in rovers:
+            if rover['done'] or now < rover['sample']:
+                continue
+            rover['sample'] = now + period
+            status = roverStep(rover, rover['gate'])
+            if status is None:
+                continue
+            data = encoder.encode(status)
+            counts['status'][rover['name']] += 1
+            publish(TARGET_PREFIX + rover['name'], data)
+            toGCS.put(TARGET_PREFIX + rover['name'], data)
+
+        # Quadcopters execute commands, and publish telemetry when due
+        for quad in quads.values():
+            invalidate_pose(quad)
+            executeCommands(quad, [decode(msg['data']) for msg in drain(quad['inbox'])])
+            quad['telemetry'].poll()
+
+        # GCS
+        for (quadName, command) in gcsPass(fleet, [toGCS], clock, predict):
+            data = encoder.encode(command, to = quadName)
+            counts['commands'] += 1
+            publish(commandChannel(quadName), data)
+            quads[quadName]['inbox'].put(commandChannel(quadName), data)
+
+        # Ground truth: the cameras' actual poses and the targets' actual positions
+        timeline['times'].append(now)
+        for key in ('positions', 'headingPoints', 'xGimbal_deg', 'altitudes'):
+            timeline[key].append([])
+        for quad in quads.values():
+            status = get_status(quad)
+            yaw = get_orientation(quad)['yaw']
+            timeline['positions'][-1].append((status['pos_x'], status['pos_y']))
+            timeline['headingPoints'][-1].append((status['pos_x'] + nm.cos(yaw), status['pos_y'] + nm.sin(yaw)))
+            timeline['xGimbal_deg'][-1].append(tiltFromNadir(quad['gimbal'].degrees()[0]) + gimbalOffset[0])
+            timeline['altitudes'][-1].append(max(status['pos_z'], 0.1))
+        timeline['targets'].append([(p['x'], p['y']) for p in
+            (simu.robots[r['name']].pose.get() for r in rovers)])
+
+        clock.sleep(STEP_S)
+
+    # (T, Q, 4, 2) footprints
+    T = len(timeline['times'])
+    Q = len(quads)
+    footprints = calcFootprintTimeline(nm.reshape(timeline['positions'], (T * Q, 2)),
+        nm.reshape(timeline['headingPoints'], (T * Q, 2)), nm.reshape(timeline['xGimbal_deg'], -1),
+        gimbalOffset[1], nm.reshape(timeline['altitudes'], -1), fov).reshape(T, Q, 4, 2)
+    return {'times':nm.array(timeline['times']), 'footprints':footprints,
+            'targets':nm.array(timeline['targets']).reshape(-1, len(targetNames), 2),
+            'duration':clock.time(), 'counts':counts,
+            'assignment':fleet['clusterer'].assignment.copy(), 'moves':fleet['clusterer'].moves}
+
+
+def summarize(result, targetNames):
+    """
+    Function: summarize
+    Arguments:
+        result: return value of runMission
+        targetNames: targets in the order given to runMission
+    Purpose:
+        Returns one row per target and one for the whole group ('*', all targets in view)
+    """
+    metrics = evaluate(result['times'], result['footprints'], result['targets'])
+    rows = []
+    for (i, name) in enumerate(list(targetNames) + ['*']):
+        if name == '*':
+            messages = sum(result['counts']['status'].values())
+        else:
+            messages = result['counts']['status'][name]
+        rows.append({'target':name,
+                     'timeInView':float(metrics['fractionInView'][i]),
+                     'acquire':float(metrics['acquire'][i]),
+                     'reacquisitions':int(metrics['reacquisitions'][i]),
+                     'meanReacquire':float(metrics['meanReacquire'][i]),
+                     'maxReacquire':float(metrics['maxReacquire'][i]),
+                     'longestGap':float(metrics['longestGap'][i]),
+                     'centering':float(metrics['centering'][i]),
+                     'statusMessages':messages,
+                     'telemetryMessages':result['counts']['telemetry'],
+                     'commandMessages':result['counts']['commands'],
+                     'bytes':result['counts']['bytes'],
+                     'duration':result['duration']})
+    return rows
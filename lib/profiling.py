@@ -0,0 +1,196 @@
+# Stage-level profiling for control loops
+# Named spans time each stage of a loop into a log-scale latency histogram,
+# and ticks count loop iterations and their period. Disabled, a span costs
+# one attribute check. Switch it at runtime with enable/disable or a signal
+# (see installSignals); the summary is printed on exit and on request.
+
+# Import libraries
+import atexit
+import math
+import signal
+import sys
+import time
+import numpy as nm
+
+# Histogram bins: BINS_PER_OCTAVE per doubling, from 1 us
+BINS_PER_OCTAVE = 4
+NBINS = 26 * BINS_PER_OCTAVE
+MIN_S = 1e-6
+
+
+def binOf(seconds):
+    if seconds <= MIN_S:
+        return 0
+    return min(int(math.log2(seconds / MIN_S) * BINS_PER_OCTAVE) + 1, NBINS - 1)
+
+
+def binEdge(i):
+    # Upper bound of bin i, in seconds
+    return MIN_S * 2 ** (i / BINS_PER_OCTAVE)
+
+
+class Stage:
+    """
+    Class: Stage
+    Arguments:
+        name: stage name
+    Purpose:
+        Latency statistics of one stage: count, total, max and histogram
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = nm.zeros(NBINS, dtype = nm.int64)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram[binOf(seconds)] += 1
+
+    def percentile(self, q):
+        # Upper bound of the bin holding the q-th percentile
+        if self.count == 0:
+            return 0.0
+        i = int(nm.searchsorted(nm.cumsum(self.histogram), q / 100 * self.count))
+        return min(binEdge(i), self.max)
+
+
+class Span:
+    # Context manager timing one stage; reused, so spans of one name do not nest
+    __slots__ = ('profiler', 'stage', 'start')
+
+    def __init__(self, profiler, stage):
+        self.profiler = profiler
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        if self.profiler.enabled:
+            self.start = self.profiler.timer()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self.stage.record(self.profiler.timer() - self.start)
+            self.start = None
+        return False
+
+
+class Profiler:
+    """
+    Class: Profiler
+    Arguments:
+        name: printed in the summary, e.g. the script
+        enabled: start recording right away
+        deadline: loop period in seconds counted as a missed deadline (optional)
+        timer: clock in seconds (default: time.perf_counter)
+    Purpose:
+        with profiler.span ('decode'): ...   times a stage
+        profiler.tick ()                    counts one loop iteration
+    """
+
+    def __init__(self, name = 'profile', enabled = False, deadline = None, timer = time.perf_counter):
+        self.name = name
+        self.enabled = enabled
+        self.deadline = deadline
+        self.timer = timer
+        self.stages = {}
+        self.spans = {}
+        self.reset()
+
+    def reset(self):
+        for stage in self.stages.values():
+            stage.__init__(stage.name)
+        self.loop = Stage('(loop)')
+        self.lastTick = None
+        self.missed = 0
+        self.started = self.timer()
+
+    def enable(self):
+        if not self.enabled:
+            self.lastTick = None
+            self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def span(self, name):
+        span = self.spans.get(name)
+        if span is None:
+            self.stages[name] = Stage(name)
+            span = self.spans[name] = Span(self, self.stages[name])
+        return span
+
+    def tick(self):
+        # One loop iteration: records the period since the last tick
+        if not self.enabled:
+            return
+        now = self.timer()
+        if self.lastTick is not None:
+            period = now - self.lastTick
+            self.loop.record(period)
+            if self.deadline is not None and period > self.deadline:
+                self.missed += 1
+        self.lastTick = now
+
+    def summary(self):
+        """
+        Function: summary
+        Purpose:
+            Returns a table of every stage: calls, mean, p50, p90, p99 and max
+            latency, and its share of the time the loop was profiled
+        """
+        elapsed = self.loop.total if self.loop.count > 0 else self.timer() - self.started
+        lines = ["[{0}] {1}".format(self.name, "enabled" if self.enabled else "disabled")]
+        if self.loop.count > 0:
+            line = "loop: {0} iterations, {1:.1f} Hz, period p50 {2:.3f} ms p99 {3:.3f} ms max {4:.3f} ms".format(
+                self.loop.count, self.loop.count / self.loop.total if self.loop.total > 0 else 0.0,
+                1e3 * self.loop.percentile(50), 1e3 * self.loop.percentile(99), 1e3 * self.loop.max)
+            if self.deadline is not None:
+                line += ", {0} over {1:.3f} ms".format(self.missed, 1e3 * self.deadline)
+            lines.append(line)
+        lines.append("{0:<14} {1:>9} {2:>10} {3:>10} {4:>10} {5:>10} {6:>10} {7:>6}".format(
+            "stage", "calls", "mean (us)", "p50", "p90", "p99", "max", "share"))
+        for stage in sorted(self.stages.values(), key = lambda s: -s.total):
+            if stage.count == 0:
+                continue
+            lines.append("{0:<14} {1:>9d} {2:>10.1f} {3:>10.1f} {4:>10.1f} {5:>10.1f} {6:>10.1f} {7:>5.1f}%".format(
+                stage.name, stage.count, 1e6 * stage.total / stage.count,
+                1e6 * stage.percentile(50), 1e6 * stage.percentile(90), 1e6 * stage.percentile(99),
+                1e6 * stage.max, 100 * stage.total / elapsed if elapsed > 0 else 0.0))
+        return "\n".join(lines)
+
+    def dump(self, out = None):
+        print(self.summary(), file = out if out is not None else sys.stderr)
+
+
+def installSignals(profiler, dumpOnExit = True):
+    """
+    Function: installSignals
+    Arguments:
+        profiler: Profiler
+        dumpOnExit: print the summary when the process exits, if anything was recorded
+    Purpose:
+        SIGUSR1 toggles recording, SIGUSR2 prints the summary, e.g.
+            kill -USR1 <pid>
+        With dumpOnExit, SIGTERM exits normally so the summary is printed.
+    """
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.toggle())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.dump())
+    if dumpOnExit:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        atexit.register(lambda: profiler.dump() if profiler.loop.count > 0 or
+            any(s.count > 0 for s in profiler.stages.values()) else None)
@@ -1,7 +1,7 @@
 
-import pymorse
 import robomath as rm
 import datetime
+import math
 import time
 
 def ping(robot):
@@ -12,13 +12,32 @@ def ping(robot):
     return ping
 
 
-def get_position(robot):
+def get_pose(robot):
+    # Pose snapshot shared by all readers within one control step.
+    # robot['poseMaxAge'] sets how long a snapshot is reused:
+    #   0 (default) - never, every call queries the simulator
+    #   None        - until invalidate_pose is called, e.g. once per tick
+    #   seconds     - until the snapshot is older than that
+    maxAge = robot.get('poseMaxAge', 0)
+    now = robot.get('clock', time).time()
+    snapshot = robot.get('poseSnapshot')
+    if snapshot is not None and maxAge != 0:
+        if maxAge is None or now - snapshot['time'] <= maxAge:
+            return snapshot['pose']
     pose = getattr(robot['simu'], robot['name']).pose.get()
+    robot['poseSnapshot'] = {'pose':pose, 'time':now}
+    return pose
+
+def invalidate_pose(robot):
+    robot['poseSnapshot'] = None
+
+def get_position(robot):
+    pose = get_pose(robot)
     pos = {'x':pose['x'], 'y':pose['y'], 'z':pose['z']}
     return pos
 
 def get_orientation(robot):
-    pose = getattr(robot['simu'], robot['name']).pose.get()
+    pose = get_pose(robot)
     orientation = {'pitch':pose['pitch'], 'roll':pose['pitch'], 'yaw':pose['yaw']}
     return orientation
 
@@ -51,11 +70,34 @@ def goto_target(robot, target, speed):
     #            'tolerance':0.5, 'speed':speed})
     getattr(robot['simu'], robot['name']).waypoint.setdest (target['x'], target['y'], 10, 0.1, speed)
 
+def goto_waypoint(robot, waypoint, heading_toward, altitude):
+    # Fly to the waypoint at altitude, facing heading_toward
+    theta = math.atan2(heading_toward[1] - waypoint[1], heading_toward[0] - waypoint[0])
+    if (theta < 0):
+        theta = theta + 2 * math.pi
+    dest = {'x':waypoint[0], 'y':waypoint[1], 'heading':theta}
+    getattr(robot['simu'], robot['name']).waypoint.goto(dest['x'], dest['y'], altitude, theta, 0.01)
+    robot['destination'] = dest
+
+def point_camera(robot, target, altitude, origin = None):
+    # Use spherical coordinates to tilt the camera's gimbal toward a ground point,
+    # seen from origin (default: where the robot is now), e.g. its destination
+    # Code adapted from Morse Simulator: http://www.openrobots.org/morse/doc/1.2/_modules/morse/actuators/ptu.html
+    pos = get_position(robot) if origin is None else origin
+    # Target position with respect to camera/gimbal
+    offset = (target[0] - pos['x'], target[1] - pos['y'], 0 - altitude)
+    distance = math.sqrt(offset[0] ** 2 + offset[1] ** 2 + offset[2] ** 2)
+    theta = math.asin(offset[2] / distance)
+    orientation = get_orientation(robot)
+    tilt = -theta + orientation['pitch']
+    robot['gimbal'].setPanTilt(0, tilt)
+
 def circle_target(robot, target, radius, speed_transit, speed_angular):
     halt(robot)
     # !! Does not yet take into account direction
     #   before starting circular motion. Might not
     #   actually circle target. 
+    invalidate_pose(robot)
     pos = get_position(robot)
     coords = rm.get_coords_in_radius(
             [target['x'], target['y']], 
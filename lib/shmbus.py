@@ -0,0 +1,290 @@
+# Shared-memory transport, for missions on one host
+# Each channel is a latest-value slot in shared memory (/dev/shm/menelaus.<channel>):
+# a sequence number, the record's length and the record itself. The publisher
+# overwrites the slot; readers map it and read the newest record directly,
+# with no Redis round trip. The slot is a seqlock: the sequence is odd while
+# a record is being written, so a reader retries until it reads the same
+# even sequence before and after the record.
+# Readers only ever see the newest record of a channel, which is all the GCS
+# uses of telemetry. Slots persist, like Redis keys, so a restarted publisher
+# carries on the same sequence and readers that have the slot mapped keep
+# reading it; remove them with remove () or rm /dev/shm/menelaus.*
+
+# Import libraries
+import atexit
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from codec import decode
+
+# Sequence number (odd while being written), record length
+SLOT = struct.Struct('<QI')
+CAPACITY = 1024
+PREFIX = 'menelaus.'
+
+
+def attach(name):
+    # Map an existing segment without handing it to this process's resource
+    # tracker, which would remove it when the process exits
+    try:
+        return shared_memory.SharedMemory(name, track = False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def remove(channel):
+    # Remove a channel's slot; readers that have it mapped keep their copy
+    try:
+        shm = attach(PREFIX + channel)
+    except FileNotFoundError:
+        return
+    shm.close()
+    if getattr(shm, '_track', True):
+        # unlink () also tells the resource tracker, which attach () did not
+        resource_tracker.register(shm._name, 'shared_memory')
+    shm.unlink()
+
+
+class Slot:
+    """
+    Class: Slot
+    Arguments:
+        channel: channel name, e.g. 'Morse-Marisa-susan'
+        create: create the slot if it does not exist (publishers)
+        capacity: largest record in bytes
+    Purpose:
+        write (data) replaces the record; read () returns (sequence, record)
+    """
+
+    def __init__(self, channel, create = False, capacity = CAPACITY):
+        name = PREFIX + channel
+        try:
+            self.shm = attach(name)
+        except FileNotFoundError:
+            if not create:
+                raise
+            self.shm = shared_memory.SharedMemory(name, create = True, size = SLOT.size + capacity)
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.buf = self.shm.buf
+        self.capacity = self.shm.size - SLOT.size
+        self.seq = SLOT.unpack_from(self.buf)[0]
+
+    def write(self, data):
+        n = len(data)
+        if n > self.capacity:
+            raise ValueError("{0} byte record does not fit a {1} byte slot".format(n, self.capacity))
+        # Odd while the record is inconsistent
+        seq = (self.seq | 1) + 1
+        SLOT.pack_into(self.buf, 0, seq - 1, n)
+        self.buf[SLOT.size:SLOT.size + n] = data
+        SLOT.pack_into(self.buf, 0, seq, n)
+        self.seq = seq
+        return seq
+
+    def read(self, parse = bytes, retries = 1000):
+        """
+        Function: read
+        Arguments:
+            parse: applied to a memoryview of the record inside the seqlock,
+                e.g. codec.decode, which unpacks binary records in place
+            retries: attempts while the record is being written
+        Purpose:
+            Returns (sequence, parse (record)), or (None, None) if the
+            record was always being written
+        """
+        for _ in range(retries):
+            (seq, n) = SLOT.unpack_from(self.buf)
+            if seq & 1:
+                continue
+            try:
+                value = parse(self.buf[SLOT.size:SLOT.size + n])
+            except Exception:
+                # A torn record; anything else is the caller's
+                if SLOT.unpack_from(self.buf)[0] == seq:
+                    raise
+                continue
+            if SLOT.unpack_from(self.buf)[0] == seq:
+                return (seq, value)
+        return (None, None)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+class ShmPublisher:
+    """
+    Class: ShmPublisher
+    Arguments:
+        capacity: largest record in bytes
+    Purpose:
+        publish (channel, data) overwrites the channel's slot, in place of r.publish
+    """
+
+    def __init__(self, capacity = CAPACITY):
+        self.capacity = capacity
+        self.slots = {}
+
+    def publish(self, channel, data):
+        slot = self.slots.get(channel)
+        if slot is None:
+            slot = self.slots[channel] = Slot(channel, create = True, capacity = self.capacity)
+        return slot.write(data)
+
+
+class ShmSubscriber:
+    """
+    Class: ShmSubscriber
+    Arguments:
+        channels: names of the channels to read
+    Purpose:
+        get_message () and listen () return the channels' new records one
+        at a time as pubsub messages ({'type':'message', 'channel', 'decoded', 'seq'}),
+        decoded in place by codec.decode (read them with codec.decodeMessage).
+        Records that do not decode are skipped.
+        Each call to messaging.drain sweeps every channel once, returning
+        the newest record of each channel that changed since it was first
+        mapped. Channels whose publisher has not started yet are picked up
+        when it does, from its first record.
+    """
+
+    def __init__(self, channels):
+        self.channels = list(channels)
+        self.slots = {}
+        self.seen = {}
+        # Channels whose slot did not exist yet when first checked
+        self.missing = set()
+        self.next = 0
+        # Counters
+        self.sweeps = 0
+        self.records = 0
+        self.overwritten = 0
+
+    def check(self, channel):
+        slot = self.slots.get(channel)
+        if slot is None:
+            try:
+                slot = self.slots[channel] = Slot(channel)
+            except FileNotFoundError:
+                self.missing.add(channel)
+                return None
+            if channel in self.missing:
+                # Created since this reader started: every record is new
+                self.seen[channel] = 0
+            else:
+                # New records only, as with a subscription: what is in the slot
+                # may have been left by an earlier run. An odd sequence is a
+                # record being written: the one before it is the last complete one.
+                self.seen[channel] = slot.seq & ~1
+        last = self.seen.get(channel, 0)
+        if SLOT.unpack_from(slot.buf)[0] == last:
+            # Unchanged: nothing to decode
+            return None
+        try:
+            (seq, msg_data) = slot.read(decode)
+        except ValueError:
+            # Not a message: skip it
+            (seq, msg_data) = (SLOT.unpack_from(slot.buf)[0], None)
+        if seq is None or seq <= last:
+            return None
+        # Records written since the last one read, that no reader will see
+        self.overwritten += max((seq - last) // 2 - 1, 0)
+        self.seen[channel] = seq
+        if msg_data is None:
+            return None
+        self.records += 1
+        return {'type':'message', 'channel':channel, 'decoded':msg_data, 'seq':seq}
+
+    def get_message(self):
+        while self.next < len(self.channels):
+            channel = self.channels[self.next]
+            self.next += 1
+            msg = self.check(channel)
+            if msg is not None:
+                return msg
+        # Swept every channel
+        self.next = 0
+        self.sweeps += 1
+        return None
+
+    def listen(self, interval = 0.001):
+        # Every new record as it arrives, polling every interval seconds
+        while True:
+            msg = self.get_message()
+            if msg is None:
+                time.sleep(interval)
+            else:
+                yield msg
+
+    def summary(self):
+        return "[shm] {0} sweeps of {1} channels, {2} records read, {3} overwritten before they were read".format(
+            self.sweeps, len(self.channels), self.records, self.overwritten)
+
+    def dump(self, out = None):
+        print(self.summary(), file = out if out is not None else sys.stderr)
+
+    def dumpOnExit(self):
+        atexit.register(lambda: self.dump() if self.sweeps > 0 else None)
+
+
+def benchmark(n = 100000, vehicles = 100):
+    """
+    Function: benchmark
+    Arguments:
+        n: number of records to publish and read
+        vehicles: number of channels
+    Purpose:
+        Prints the cost of publishing a record, and of sweeping every
+        channel for new records, through shared memory
+    """
+    from codec import Encoder, TAG_STATUS
+    channels = ['benchmark-{0}'.format(i) for i in range(vehicles)]
+    publisher = ShmPublisher()
+    subscriber = ShmSubscriber(channels)
+    status = {'tag':TAG_STATUS, 'pos_x':-48.25, 'pos_y':52.5, 'pos_z':0.08, 'dest_x':-32.0, 'dest_y':13.0}
+    print("{0:8} {1:>6} {2:>12} {3:>14} {4:>16}".format("codec", "bytes", "publish (us)", "read (us/rec)", "sweep (us/chan)"))
+    try:
+        for codec in ('json', 'binary'):
+            data = Encoder(codec).encode(status)
+            start = time.perf_counter()
+            for i in range(n):
+                publisher.publish(channels[i % vehicles], data)
+            publishTime = (time.perf_counter() - start) / n
+            # Every channel changed: read a record from each
+            rounds = max(n // vehicles, 1)
+            (readTime, read) = (0, 0)
+            for i in range(rounds):
+                for channel in channels:
+                    publisher.publish(channel, data)
+                start = time.perf_counter()
+                read += len(drainAll(subscriber))
+                readTime += time.perf_counter() - start
+            readTime = readTime / max(read, 1)
+            # Nothing changed: sweep for new records
+            start = time.perf_counter()
+            for i in range(rounds):
+                drainAll(subscriber)
+            sweepTime = (time.perf_counter() - start) / (rounds * vehicles)
+            print("{0:8} {1:6d} {2:12.2f} {3:14.2f} {4:16.3f}".format(codec, len(data),
+                publishTime * 1e6, readTime * 1e6, sweepTime * 1e6))
+    finally:
+        for slot in list(publisher.slots.values()) + list(subscriber.slots.values()):
+            slot.close()
+        for channel in channels:
+            remove(channel)
+
+
+def drainAll(subscriber):
+    messages = []
+    msg = subscriber.get_message()
+    while msg is not None:
+        messages.append(msg)
+        msg = subscriber.get_message()
+    return messages
+
+
+if __name__ == "__main__":
+    benchmark()
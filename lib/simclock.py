@@ -0,0 +1,63 @@
+# Scalable clock shared by the robot and behavior scripts
+# A scale of 1 runs in real time; a scale of 100 runs 100x faster than wall clock
+
+# Import libraries
+import asyncio
+import os
+import time
+
+DAY_S = 86400
+
+
+class Clock:
+    """
+    Class: Clock
+    Arguments:
+        scale: how many simulated seconds pass per wall-clock second
+        epoch: wall time at which simulated and wall time agree
+            (default: $MENELAUS_EPOCH, else the start of the UTC day)
+    Purpose:
+        Drop-in for time.time/time.sleep so that every script in a
+        headless mission agrees on how fast simulated time passes, and
+        on what time it is, so message timestamps compare across scripts.
+    """
+
+    def __init__(self, scale = 1.0, epoch = None):
+        self.scale = float(scale)
+        if epoch is None:
+            epoch = os.environ.get('MENELAUS_EPOCH')
+        if epoch is None:
+            epoch = time.time() // DAY_S * DAY_S
+        self.epoch = float(epoch)
+
+    def time(self):
+        # Simulated seconds since the epoch, on top of the epoch
+        return self.epoch + (time.time() - self.epoch) * self.scale
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.scale)
+
+    async def asleep(self, seconds):
+        # asyncio counterpart of sleep
+        await asyncio.sleep(seconds / self.scale)
+
+
+class StepClock:
+    """
+    Class: StepClock
+    Arguments:
+        start: initial time in seconds
+    Purpose:
+        Clock for missions that run in a single process (see mission.py).
+        Time only moves when the mission sleeps, so a mission runs as fast
+        as the CPU allows and the same inputs always give the same results.
+    """
+
+    def __init__(self, start = 0.0):
+        self.now = float(start)
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
@@ -0,0 +1,275 @@
+# Headless stand-in for pymorse
+# Exposes the same object surface the robot scripts use
+#   simu.<name>.pose.get ()
+#   simu.<name>.waypoint.setdest / goto / get_status / stop
+#   simu.<name>.motion.set_speed
+#   simu.<name>.PTU.set_pan_tilt
+#   simu.<name>.PTU.videocamera.get_properties / get_configurations
+# but replaces Blender with simple ATRV and quadrotor kinematics.
+# Robots are integrated lazily: each request advances the robot to the
+# current time of the shared Clock, so a mission can run at 100x wall clock.
+# As with pymorse, a script may make requests from several threads.
+
+# Import libraries
+import math
+import threading
+from simclock import Clock
+
+
+# Start poses copied from the scene scripts in menelaus/scenes
+SCENES = {
+    'field_exercise_1' : {
+        'django' : {'kind':'ATRV', 'x':6.0, 'y':6.0, 'z':0.0},
+        'susan'  : {'kind':'ATRV', 'x':-50.0, 'y':55.0, 'z':0.0},
+        'anton'  : {'kind':'ATRV', 'x':-60.0, 'y':45.0, 'z':0.0},
+        'godot'  : {'kind':'Quadrotor', 'x':-3.0, 'y':-3.0, 'z':0.3},
+    },
+    'field_exercise_2' : {
+        'django' : {'kind':'ATRV', 'x':-55.0, 'y':50.0, 'z':0.0},
+        'susan'  : {'kind':'ATRV', 'x':-50.0, 'y':55.0, 'z':0.0},
+        'anton'  : {'kind':'ATRV', 'x':-60.0, 'y':45.0, 'z':0.0},
+        'godot'  : {'kind':'Quadrotor', 'x':-3.0, 'y':-3.0, 'z':10.0},
+    },
+}
+
+# Integration step in simulated seconds
+STEP_S = 0.05
+
+
+class MorseServerError(Exception):
+    pass
+
+
+def wrapAngle(angle):
+    return math.atan2(math.sin(angle), math.cos(angle))
+
+
+class Pose:
+    def __init__(self, body):
+        self.body = body
+
+    def get(self):
+        self.body.advance()
+        return {'x':self.body.x, 'y':self.body.y, 'z':self.body.z,
+                'yaw':self.body.yaw, 'pitch':self.body.pitch, 'roll':self.body.roll,
+                'timestamp':self.body.clock.time()}
+
+    def get_properties(self):
+        return {'frequency': [60.0, 'float', 'Sensor update frequency']}
+
+
+class Motion:
+    def __init__(self, body):
+        self.body = body
+
+    def set_speed(self, v, w):
+        self.body.advance()
+        self.body.mode = 'motion'
+        self.body.speed = (float(v), float(w))
+
+
+class Waypoint:
+    def __init__(self, body):
+        self.body = body
+
+    def setdest(self, x, y, z, tolerance, speed):
+        # ATRV waypoint: z is ignored, speed is the cruise speed
+        self.body.advance()
+        self.body.mode = 'waypoint'
+        self.body.dest = (float(x), float(y), self.body.z, None)
+        self.body.tolerance = float(tolerance)
+        self.body.cruise = float(speed)
+        self.body.status = "Transit"
+
+    def goto(self, x, y, z, yaw, tolerance):
+        # RotorcraftWaypoint: full 3D position plus heading
+        self.body.advance()
+        self.body.mode = 'waypoint'
+        self.body.dest = (float(x), float(y), float(z), float(yaw))
+        self.body.tolerance = float(tolerance)
+        self.body.status = "Transit"
+
+    def stop(self):
+        self.body.advance()
+        self.body.mode = None
+        self.body.status = "Stop"
+
+    def get_status(self):
+        self.body.advance()
+        return self.body.status
+
+
+class VideoCamera:
+    def __init__(self, ptu):
+        self.ptu = ptu
+
+    def get_properties(self):
+        # Same layout as MORSE: name -> [value, type, doc]
+        return {'cam_width': [256, 'int', 'Width of the image'],
+                'cam_height': [256, 'int', 'Height of the image'],
+                'cam_focal': [35.0, 'float', 'Focal length of the camera']}
+
+    def get_configurations(self):
+        self.ptu.body.advance()
+        # The copter reads the tilt back from the third rotation component
+        return {'rotation': [[0.0, 0.0, self.ptu.tilt]],
+                'translation': [[0.05, 0.05, -0.5]]}
+
+
+class PTU:
+    def __init__(self, body, rate = 1.0):
+        self.body = body
+        self.rate = rate
+        self.pan = 0.0
+        self.tilt = 0.0
+        self.target = (0.0, 0.0)
+        self.videocamera = VideoCamera(self)
+
+    def set_pan_tilt(self, pan, tilt):
+        self.body.advance()
+        self.target = (float(pan), float(tilt))
+
+    def step(self, dt):
+        limit = self.rate * dt
+        self.pan += max(-limit, min(limit, self.target[0] - self.pan))
+        self.tilt += max(-limit, min(limit, self.target[1] - self.tilt))
+
+
+class Body:
+    """
+    Class: Body
+    Arguments:
+        name: robot name, as used in the scene
+        x, y, z: start position in meters
+        clock: Clock shared by the simulated world
+    Purpose:
+        Holds the state common to all simulated robots and
+        integrates it forward in fixed steps up to the clock's time.
+    """
+
+    def __init__(self, name, x, y, z, clock):
+        self.name = name
+        self.clock = clock
+        self.x, self.y, self.z = float(x), float(y), float(z)
+        self.yaw, self.pitch, self.roll = 0.0, 0.0, 0.0
+        self.mode = None
+        self.dest = None
+        self.tolerance = 0.5
+        self.cruise = 0.0
+        self.speed = (0.0, 0.0)
+        self.status = "Arrived"
+        self.last = clock.time()
+        self.lock = threading.RLock()
+        self.pose = Pose(self)
+        self.waypoint = Waypoint(self)
+        self.motion = Motion(self)
+
+    def advance(self):
+        with self.lock:
+            now = self.clock.time()
+            while self.last < now:
+                dt = min(STEP_S, now - self.last)
+                self.step(dt)
+                self.last += dt
+
+    def step(self, dt):
+        if self.mode == 'motion':
+            v, w = self.speed
+            self.yaw = wrapAngle(self.yaw + w * dt)
+            self.x += v * math.cos(self.yaw) * dt
+            self.y += v * math.sin(self.yaw) * dt
+
+
+class ATRV(Body):
+    # Skid-steer rover: turns toward the destination, then drives
+    MAX_TURN = 1.5
+
+    def step(self, dt):
+        if self.mode != 'waypoint':
+            return Body.step(self, dt)
+        dx, dy = self.dest[0] - self.x, self.dest[1] - self.y
+        distance = math.sqrt(dx ** 2 + dy ** 2)
+        if distance <= self.tolerance:
+            self.mode = None
+            self.status = "Arrived"
+            return
+        error = wrapAngle(math.atan2(dy, dx) - self.yaw)
+        turn = max(-self.MAX_TURN * dt, min(self.MAX_TURN * dt, error))
+        self.yaw = wrapAngle(self.yaw + turn)
+        # Slow down while facing away from the destination
+        travel = min(distance, self.cruise * max(0.0, math.cos(error)) * dt)
+        self.x += travel * math.cos(self.yaw)
+        self.y += travel * math.sin(self.yaw)
+
+
+class Quadrotor(Body):
+    # Holonomic point mass with bounded horizontal, vertical and yaw rates
+    MAX_SPEED = 3.0
+    MAX_CLIMB = 2.0
+    MAX_YAW = 1.0
+
+    def __init__(self, name, x, y, z, clock):
+        Body.__init__(self, name, x, y, z, clock)
+        self.PTU = PTU(self)
+
+    def step(self, dt):
+        self.PTU.step(dt)
+        if self.mode != 'waypoint':
+            return Body.step(self, dt)
+        dx, dy = self.dest[0] - self.x, self.dest[1] - self.y
+        dz = self.dest[2] - self.z
+        distance = math.sqrt(dx ** 2 + dy ** 2)
+        if distance > 0:
+            travel = min(distance, self.MAX_SPEED * dt)
+            self.x += travel * dx / distance
+            self.y += travel * dy / distance
+        self.z += max(-self.MAX_CLIMB * dt, min(self.MAX_CLIMB * dt, dz))
+        if self.dest[3] is not None:
+            error = wrapAngle(self.dest[3] - self.yaw)
+            self.yaw = wrapAngle(self.yaw + max(-self.MAX_YAW * dt, min(self.MAX_YAW * dt, error)))
+        if math.sqrt(distance ** 2 + dz ** 2) <= self.tolerance:
+            self.status = "Arrived"
+
+
+class Morse:
+    """
+    Class: Morse
+    Arguments:
+        scene: name of a scene in SCENES, or a dict of name -> {'kind', 'x', 'y', 'z'}
+        clock: Clock driving the simulation (default: real time)
+    Purpose:
+        Context manager with the same surface as pymorse.Morse.
+        Robots are attributes, e.g. simu.susan.pose.get ()
+    """
+
+    def __init__(self, scene = 'field_exercise_1', clock = None):
+        self.clock = clock if clock is not None else Clock()
+        if isinstance(scene, str):
+            if scene not in SCENES:
+                raise MorseServerError("Unknown scene '{0}'".format(scene))
+            scene = SCENES[scene]
+        self.robots = {}
+        for name, spec in scene.items():
+            self.add_robot(name, spec['kind'], spec['x'], spec['y'], spec.get('z', 0.0))
+
+    def add_robot(self, name, kind, x, y, z = 0.0):
+        kinds = {'ATRV':ATRV, 'Quadrotor':Quadrotor}
+        if kind not in kinds:
+            raise MorseServerError("Unknown robot type '{0}'".format(kind))
+        self.robots[name] = kinds[kind](name, x, y, z, self.clock)
+        return self.robots[name]
+
+    def __getattr__(self, name):
+        robots = self.__dict__.get('robots', {})
+        if name in robots:
+            return robots[name]
+        raise AttributeError(name)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,207 @@
+# Redis Streams transport
+# An alternative to pub/sub for telemetry: each robot appends its messages
+# to a capped stream named after its channel (XADD ... MAXLEN ~), and a
+# reader fetches every stream it follows in one XREAD, or XREADGROUP for a
+# consumer group, with COUNT entries per stream at most, optionally waiting
+# (BLOCK) for the first new entry instead of polling. Nothing is lost
+# to a slow reader until the stream is trimmed, a reader can start from any
+# offset, and how far behind it is stays visible in Redis (see
+# scripts/stream_status.py).
+# StreamReader has the get_message surface of a redis PubSub object,
+# so messaging.drain and the GCS loops read either transport.
+
+# Import libraries
+import atexit
+import os
+import socket
+import sys
+import time
+import redis
+
+# Entry field holding the encoded message
+FIELD = b'd'
+DEFAULT_MAXLEN = 1000
+DEFAULT_COUNT = 100
+
+
+class StreamPublisher:
+    """
+    Class: StreamPublisher
+    Arguments:
+        r: redis connection
+        maxlen: entries kept per stream, approximately
+    Purpose:
+        publish (channel, data) appends to the stream named channel,
+        in place of r.publish
+    """
+
+    def __init__(self, r, maxlen = DEFAULT_MAXLEN):
+        self.r = r
+        self.maxlen = maxlen
+
+    def publish(self, channel, data):
+        return self.r.xadd(channel, {FIELD:data}, maxlen = self.maxlen, approximate = True)
+
+
+class StreamReader:
+    """
+    Class: StreamReader
+    Arguments:
+        r: redis connection
+        streams: names of the streams to read
+        count: most entries per stream and read
+        offset: where to start: '$' for new entries only, '0' for the
+            oldest entry kept, or an entry id
+        group: read as a member of this consumer group (optional). Entries
+            are acknowledged when the next batch is read, after the loop has
+            handled them, so the group's pending list shows what is in hand.
+        consumer: name within the group (default: host and process id)
+        block: wait up to this many milliseconds for new entries when every
+            stream is caught up (optional: return at once)
+    Purpose:
+        get_message () and listen () return one entry at a time as a pubsub message
+        ({'type':'message', 'channel', 'data', 'id'}), reading the next
+        batch of every stream in one request when the last one is used up.
+    """
+
+    def __init__(self, r, streams, count = DEFAULT_COUNT, offset = '$', group = None, consumer = None, block = None):
+        self.r = r
+        self.streams = list(streams)
+        self.count = count
+        self.block = block
+        self.group = group
+        self.consumer = consumer if consumer is not None else '{0}-{1}'.format(socket.gethostname(), os.getpid())
+        self.buffer = []
+        self.position = 0
+        self.exhausted = False
+        self.unacked = {}
+        # Counters
+        self.reads = 0
+        self.entries = 0
+        self.fullBatches = 0
+
+        if group is not None:
+            for stream in self.streams:
+                try:
+                    self.r.xgroup_create(stream, group, id = offset, mkstream = True)
+                except redis.ResponseError as e:
+                    if 'BUSYGROUP' not in str(e):
+                        raise
+            self.ids = { stream:'>' for stream in self.streams }
+        elif offset == '$':
+            # A non-blocking XREAD from '$' never returns anything: pin it now
+            self.ids = self.lastIds()
+        else:
+            self.ids = { stream:offset for stream in self.streams }
+
+    def lastIds(self):
+        # Last entry id of every stream, in one request ('0-0' for a stream not created yet)
+        pipe = self.r.pipeline(transaction = False)
+        for stream in self.streams:
+            pipe.xinfo_stream(stream)
+        infos = pipe.execute(raise_on_error = False)
+        return { stream:('0-0' if isinstance(info, Exception) else info['last-generated-id'])
+                 for (stream, info) in zip(self.streams, infos) }
+
+    def fetch(self):
+        # One request: acknowledge the last batch, read the next
+        pipe = self.r.pipeline(transaction = False)
+        for (stream, ids) in self.unacked.items():
+            pipe.xack(stream, self.group, *ids)
+        if self.group is None:
+            pipe.xread(self.ids, count = self.count, block = self.block)
+        else:
+            pipe.xreadgroup(self.group, self.consumer, self.ids, count = self.count, block = self.block)
+        replies = pipe.execute()
+        self.unacked = {}
+        self.reads += 1
+
+        self.buffer = []
+        self.position = 0
+        full = False
+        for (stream, entries) in replies[-1] or []:
+            if isinstance(stream, bytes):
+                stream = stream.decode("utf-8")
+            for (entryId, fields) in entries:
+                self.buffer.append({'type':'message', 'channel':stream, 'data':fields[FIELD], 'id':entryId})
+            if self.group is None:
+                self.ids[stream] = entries[-1][0]
+            else:
+                self.unacked[stream] = [entryId for (entryId, fields) in entries]
+            full = full or len(entries) >= self.count
+        self.entries += len(self.buffer)
+        if full:
+            self.fullBatches += 1
+        # A short batch means every stream is caught up
+        self.exhausted = not full
+
+    def get_message(self):
+        if self.position == len(self.buffer):
+            if self.exhausted:
+                self.exhausted = False
+                return None
+            self.fetch()
+            if len(self.buffer) == 0:
+                self.exhausted = False
+                return None
+        msg = self.buffer[self.position]
+        self.position += 1
+        return msg
+
+    def listen(self, interval = 0.001):
+        # Every entry as it arrives, polling every interval seconds
+        while True:
+            msg = self.get_message()
+            if msg is None:
+                time.sleep(interval)
+            else:
+                yield msg
+
+    def lag(self):
+        """
+        Function: lag
+        Purpose:
+            Returns, per stream, how many entries have been added that this
+            reader has not read yet (None if Redis cannot tell)
+        """
+        pipe = self.r.pipeline(transaction = False)
+        for stream in self.streams:
+            if self.group is None:
+                pipe.xinfo_stream(stream)
+            else:
+                pipe.xinfo_groups(stream)
+        lags = {}
+        for (stream, info) in zip(self.streams, pipe.execute(raise_on_error = False)):
+            if isinstance(info, Exception):
+                lags[stream] = None
+            elif self.group is None:
+                lags[stream] = entriesAfter(self.r, stream, self.ids[stream], info)
+            else:
+                groups = [g for g in info if g['name'] in (self.group, self.group.encode())]
+                lags[stream] = groups[0].get('lag') if groups else None
+        return lags
+
+    def summary(self):
+        line = "[streams] {0} reads, {1} entries, {2} full batches of {3}".format(
+            self.reads, self.entries, self.fullBatches, self.count)
+        try:
+            behind = [n for n in self.lag().values() if n is not None]
+        except redis.RedisError:
+            return line
+        return line + "; {0} entries behind on {1} streams".format(sum(behind), len(self.streams))
+
+    def dump(self, out = None):
+        print(self.summary(), file = out if out is not None else sys.stderr)
+
+    def dumpOnExit(self):
+        atexit.register(lambda: self.dump() if self.reads > 0 else None)
+
+
+def entriesAfter(r, stream, entryId, info):
+    # Entries of a stream after entryId
+    if isinstance(entryId, bytes):
+        entryId = entryId.decode("utf-8")
+    last = info['last-generated-id']
+    if (last.decode("utf-8") if isinstance(last, bytes) else last) == entryId:
+        return 0
+    return len(r.xrange(stream, min = '(' + entryId))
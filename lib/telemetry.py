@@ -0,0 +1,118 @@
+# Rate-controlled copter telemetry
+# The copter publishes its position and camera state from a thread of its
+# own, so the command loop never waits on pose reads or Redis. Telemetry is
+# sampled at a fixed rate and only published when the position or a gimbal
+# angle has changed by more than a threshold, or the heartbeat is due.
+
+# Import libraries
+import math
+import threading
+import time
+
+
+class TelemetryGate:
+    """
+    Class: TelemetryGate
+    Arguments:
+        minDistance: publish when the position moved more than this, in meters
+        minAngle: publish when a gimbal angle changed more than this, in degrees
+        heartbeat: publish at least this often, in seconds
+    Purpose:
+        Decides when the copter publishes. Call check with the time and the
+        telemetry (pos_x, pos_y, pos_z, xGimbal_deg, yGimbal_deg) at every
+        sample; publish when it returns True.
+    """
+
+    def __init__(self, minDistance = 0.1, minAngle = 0.5, heartbeat = 1.0):
+        self.minDistance = minDistance
+        self.minAngle = minAngle
+        self.heartbeat = heartbeat
+        # What the GCS was last told
+        self.report = None
+        # Counters
+        self.samples = 0
+        self.publishes = 0
+
+    def check(self, t, info):
+        self.samples += 1
+        position = (info['pos_x'], info['pos_y'], info['pos_z'])
+        angles = (info['xGimbal_deg'], info['yGimbal_deg'])
+
+        publish = self.report is None or t - self.report['time'] >= self.heartbeat
+        if not publish:
+            publish = (math.dist(position, self.report['position']) > self.minDistance or
+                max(abs(a - b) for a, b in zip(angles, self.report['angles'])) > self.minAngle)
+
+        if publish:
+            self.report = {'time':t, 'position':position, 'angles':angles}
+            self.publishes += 1
+        return publish
+
+
+class TelemetryPublisher:
+    """
+    Class: TelemetryPublisher
+    Arguments:
+        sample: function returning the telemetry message to publish
+        publish: function publishing a telemetry message
+        rate: samples per second
+        gate: TelemetryGate (optional: publish every sample)
+        clock: object with time () and sleep () methods (default: time)
+    Purpose:
+        Samples and publishes telemetry in a background thread.
+        start () and stop () it around the command loop, or poll () it.
+    """
+
+    def __init__(self, sample, publish, rate = 10.0, gate = None, clock = None):
+        self.sample = sample
+        self.publish = publish
+        self.period = 1.0 / rate
+        self.gate = gate
+        self.clock = clock if clock is not None else time
+        self.stopping = threading.Event()
+        self.thread = None
+        self.due = None
+        self.samples = 0
+        self.publishes = 0
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target = self.run, name = 'telemetry', daemon = True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def poll(self):
+        """
+        Function: poll
+        Purpose:
+            Samples, and publishes if the gate lets it, when a sample is due.
+            Returns the seconds until the next one. run () calls it in the
+            background thread; a single-threaded loop (mission.py) calls it
+            every step instead of start ().
+        """
+        now = self.clock.time()
+        if self.due is None:
+            self.due = now
+        if now < self.due:
+            return self.due - now
+        info = self.sample()
+        self.samples += 1
+        now = self.clock.time()
+        if self.gate is None or self.gate.check(now, info):
+            self.publish(info)
+            self.publishes += 1
+        # Hold the rate; skip samples that are already late
+        self.due += self.period
+        if self.due < now:
+            self.due = now + self.period
+        return self.due - now
+
+    def run(self):
+        self.due = None
+        while not self.stopping.is_set():
+            self.clock.sleep(self.poll())
@@ -0,0 +1,189 @@
+# Binary store of the rovers' trajectories
+# Compiles the text rounds in inData (round*/<robot>.start and
+# round*/<robot>.waypoints) into one indexed file, read back by memory map:
+#   MAGIC, header length (uint64), JSON header, then 64-byte aligned arrays
+#     tracks:    one row per (round, robot): round, robot, start, first waypoint, count
+#     waypoints: (W, 2) every waypoint of every track, back to back
+# The header holds round and robot names, per-round metadata and the array layout.
+
+# Import libraries
+import glob
+import json
+import os
+import re
+import numpy as nm
+
+MAGIC = b'MNLSTRJ1'
+DEFAULT_STORE = os.path.join('inData', 'trajectories.traj')
+ALIGN = 64
+
+TRACK = nm.dtype([('round', '<i4'), ('robot', '<i4'), ('start', '<f8', (2,)),
+                  ('first', '<i8'), ('count', '<i8')])
+
+
+def roundKey(path):
+    # round2 before round10
+    match = re.search(r'(\d+)$', os.path.basename(path))
+    return (int(match.group(1)) if match else -1, os.path.basename(path))
+
+
+def readWaypoints(path):
+    # (N, 2) array from a text file of x,y lines
+    return nm.loadtxt(path, delimiter = ',', ndmin = 2)
+
+
+def readStart(path):
+    # (x, y) from a text file with one x,y line
+    return tuple(float(v) for v in nm.loadtxt(path, delimiter = ',', ndmin = 1)[:2])
+
+
+def readRound(roundDir):
+    """
+    Function: readRound
+    Arguments:
+        roundDir: directory with <robot>.start and <robot>.waypoints files
+    Purpose:
+        Parses one text round into {robot: {'start':(x, y), 'waypoints':(N, 2) array}}
+    """
+    tracks = {}
+    for path in sorted(glob.glob(os.path.join(roundDir, '*.waypoints'))):
+        name = os.path.basename(path)[:-len('.waypoints')]
+        waypoints = readWaypoints(path)
+        startPath = os.path.join(roundDir, name + '.start')
+        if os.path.exists(startPath):
+            start = readStart(startPath)
+        else:
+            # No start file: start at the first waypoint
+            start = tuple(float(v) for v in waypoints[0])
+        tracks[name] = {'start':start, 'waypoints':waypoints}
+    return tracks
+
+
+def compileStore(dataDir, path = None, pattern = 'round*'):
+    """
+    Function: compileStore
+    Arguments:
+        dataDir: directory of rounds, e.g. inData
+        path: output file (default: <dataDir>/trajectories.traj)
+        pattern: glob of round directories inside dataDir
+    Purpose:
+        Writes every round into one store file. Returns the output path.
+    """
+    if path is None:
+        path = os.path.join(dataDir, os.path.basename(DEFAULT_STORE))
+    roundDirs = sorted((d for d in glob.glob(os.path.join(dataDir, pattern)) if os.path.isdir(d)), key = roundKey)
+
+    rounds = []
+    robots = []
+    metadata = {}
+    tracks = []
+    waypoints = []
+    first = 0
+    for (r, roundDir) in enumerate(roundDirs):
+        name = os.path.basename(roundDir)
+        rounds.append(name)
+        roundTracks = readRound(roundDir)
+        metadata[name] = {'source':roundDir, 'robots':sorted(roundTracks)}
+        for robot in sorted(roundTracks):
+            if robot not in robots:
+                robots.append(robot)
+            track = roundTracks[robot]
+            tracks.append((r, robots.index(robot), track['start'], first, len(track['waypoints'])))
+            waypoints.append(track['waypoints'])
+            first += len(track['waypoints'])
+
+    arrays = {'tracks':nm.array(tracks, dtype = TRACK),
+              'waypoints':nm.concatenate(waypoints) if waypoints else nm.zeros((0, 2))}
+    writeArrays(path, arrays, {'rounds':rounds, 'robots':robots, 'metadata':metadata})
+    return path
+
+
+def toDtype(descr):
+    # Inverse of dtype.descr after a round trip through JSON
+    if len(descr) == 1 and descr[0][0] == '':
+        return nm.dtype(descr[0][1])
+    return nm.dtype([tuple(field[:2]) + tuple(tuple(shape) for shape in field[2:]) for field in descr])
+
+
+def writeArrays(path, arrays, header):
+    # Lay the arrays out after the header, each aligned for memory mapping
+    layout = {}
+    offset = 0
+    for (name, array) in arrays.items():
+        layout[name] = {'dtype':array.dtype.descr, 'shape':array.shape, 'offset':offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = dict(header, arrays = layout)
+    text = json.dumps(header).encode()
+    start = -(-(len(MAGIC) + 8 + len(text)) // ALIGN) * ALIGN
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(nm.uint64(start).tobytes())
+        f.write(text)
+        for (name, array) in arrays.items():
+            f.seek(start + layout[name]['offset'])
+            f.write(nm.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+
+
+class TrajectoryStore:
+    """
+    Class: TrajectoryStore
+    Arguments:
+        path: store written by compileStore
+    Purpose:
+        Read-only, memory-mapped access to every round. Waypoint arrays are
+        views into the file, so opening the store reads only its header.
+    """
+
+    def __init__(self, path = DEFAULT_STORE):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("Not a trajectory store: {0}".format(path))
+            start = int(nm.frombuffer(f.read(8), dtype = nm.uint64)[0])
+            header = json.loads(f.read(start - len(MAGIC) - 8).rstrip(b'\0').decode())
+        self.path = path
+        self.rounds = header['rounds']
+        self.robots = header['robots']
+        self.metadata = header['metadata']
+        self.arrays = {}
+        for (name, layout) in header['arrays'].items():
+            dtype = toDtype(layout['dtype'])
+            shape = tuple(layout['shape'])
+            if int(nm.prod(shape)) == 0:
+                self.arrays[name] = nm.zeros(shape, dtype = dtype)
+            else:
+                self.arrays[name] = nm.memmap(path, dtype = dtype, mode = 'r', offset = start + layout['offset'], shape = shape)
+        self.tracks = self.arrays['tracks']
+        self.waypointArray = self.arrays['waypoints']
+        self.index = {(self.rounds[t['round']], self.robots[t['robot']]):i for (i, t) in enumerate(self.tracks)}
+
+    def track(self, roundName, robot):
+        i = self.index.get((roundName, robot))
+        if i is None:
+            raise KeyError("No track for {0} in {1}".format(robot, roundName))
+        return self.tracks[i]
+
+    def start(self, roundName, robot):
+        return tuple(float(v) for v in self.track(roundName, robot)['start'])
+
+    def waypoints(self, roundName, robot):
+        # (N, 2) view into the file
+        track = self.track(roundName, robot)
+        return self.waypointArray[int(track['first']):int(track['first']) + int(track['count'])]
+
+    def starts(self, roundName):
+        return {robot:self.start(roundName, robot) for robot in self.metadata[roundName]['robots']}
+
+    def round(self, roundName, robots = None):
+        """
+        Function: round
+        Arguments:
+            roundName: e.g. 'round10'
+            robots: robots to return (default: all in the round)
+        Purpose:
+            Returns {robot: {'start':(x, y), 'waypoints':(N, 2) array}}, as readRound
+        """
+        if robots is None:
+            robots = self.metadata[roundName]['robots']
+        return {robot:{'start':self.start(roundName, robot), 'waypoints':self.waypoints(roundName, robot)}
+                for robot in robots}
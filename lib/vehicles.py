@@ -0,0 +1,158 @@
+# Control steps of the rover and the quadcopter
+# robots/rover.py and robots/copter.py run these against MORSE or simmorse,
+# over Redis; mission.py runs the very same steps in one process, so batch
+# experiments exercise the code of a real mission.
+
+# Import libraries
+from codec import TAG_CAMERA
+from commands import coalesce
+from roboutils import get_status, invalidate_pose, goto_target, goto_waypoint, point_camera, halt
+
+
+# Define interface message command codes
+class Command:
+    # Completely stops and exits current mode
+    halt = -1
+    # Exit robot
+    terminate = 0
+    # Ping robot
+    ping = 1
+    # Will enter mode where it listens for waypoints
+    modeWaypoints = 2
+    # A specific waypoint to follow
+    waypoint = 3
+    # Will center camera on point
+    cameraTarget = 4
+
+# Altitude until the GCS commands one (tag 3 'z')
+DEFAULT_ALTITUDE = 30
+
+
+def startRover(robot, waypoints):
+    """
+    Function: startRover
+    Arguments:
+        robot: rover
+        waypoints: (x, y) waypoints to drive through, or None to stand still
+    Purpose:
+        Sets off toward the first waypoint; roverStep takes it from there
+    """
+    robot['waypoints'] = waypoints
+    robot['next'] = 0
+    robot['done'] = waypoints is not None and len(waypoints) == 0
+    if waypoints is not None and not robot['done']:
+        goto_target(robot, {'x':waypoints[0][0], 'y':waypoints[0][1]}, 2.0)
+
+
+def roverStep(robot, gate = None):
+    """
+    Function: roverStep
+    Arguments:
+        robot: rover, set off with startRover
+        gate: deadreckon.BroadcastGate, for adaptive broadcasts (optional: publish every step)
+    Purpose:
+        One control step of the rover: moves on to the next waypoint once
+        the last is reached. Returns the status to publish, or None when
+        the gate holds it back. Sets robot['done'] after the last waypoint.
+    """
+    # New control step: the first pose reader queries the simulator
+    invalidate_pose(robot)
+    waypoints = robot['waypoints']
+    if waypoints is not None and getattr(robot['simu'], robot['name']).waypoint.get_status() != "Transit":
+        robot['next'] += 1
+        if robot['next'] >= len(waypoints):
+            robot['done'] = True
+            return None
+        w = waypoints[robot['next']]
+        goto_target(robot, {'x':w[0], 'y':w[1]}, 2.0)
+
+    status = get_status(robot)
+    if waypoints is None:
+        # Standing still
+        status['dest_x'] = status['pos_x']
+        status['dest_y'] = status['pos_y']
+
+    # Fixed broadcast: always. Adaptive broadcast: only when the GCS's
+    # dead-reckoned position has drifted, or the heartbeat is due.
+    if gate is not None:
+        now = robot['clock'].time()
+        if not gate.check(now, status['pos_x'], status['pos_y']):
+            return None
+        status['vel_x'] = gate.velocity[0]
+        status['vel_y'] = gate.velocity[1]
+        # Stamped with the time the gate predicted for, as the GCS filters it
+        status['timestamp'] = now
+    return status
+
+
+def sampleTelemetry(robot):
+    """
+    Function: sampleTelemetry
+    Arguments:
+        robot: quadcopter
+    Purpose:
+        Returns the telemetry message: position and camera state
+        (the sample of its telemetry.TelemetryPublisher)
+    """
+    with robot['profiler'].span('telemetry'):
+        pose = getattr(robot['simu'], robot['name']).pose.get()
+        robot['gimbal'].update()
+    info = dict(robot['camera'])
+    (info['xGimbal_deg'], info['yGimbal_deg']) = robot['gimbal'].degrees()
+    info['tag'] = TAG_CAMERA
+    info['pos_x'] = pose['x']
+    info['pos_y'] = pose['y']
+    info['pos_z'] = pose['z']
+    return info
+
+
+def actuated(robot, msg_data):
+    # Latency from the GCS plan, and from the target reports behind it, to actuation
+    now = robot['clock'].time()
+    if msg_data.get('timestamp') is not None:
+        robot['links'].latency('plan->actuate', now - msg_data['timestamp'])
+    if msg_data.get('origin') is not None:
+        robot['links'].latency('report->actuate', now - msg_data['origin'])
+
+
+def executeCommands(robot, commands):
+    """
+    Function: executeCommands
+    Arguments:
+        robot: quadcopter
+        commands: decoded commands received since the last control step, oldest first
+    Purpose:
+        One control step of the quadcopter: only the newest waypoint and
+        camera target are actuated (see commands.coalesce). Returns the
+        tag of a halt or terminate command, after halting, else None.
+    """
+    profiler = robot['profiler']
+    (waypointMsg, targetMsg, others, dropped) = coalesce(commands)
+    robot['links'].count('coalesced waypoints', dropped['waypoint'])
+    robot['links'].count('coalesced camera targets', dropped['target'])
+
+    for msg_data in others:
+        if msg_data.get('tag') in (Command.halt, Command.terminate):
+            halt(robot)
+            return msg_data['tag']
+
+    if waypointMsg is not None:
+        if waypointMsg.get('z') is not None:
+            robot['altitude'] = waypointMsg['z']
+        # Set waypoint, heading toward targets
+        with profiler.span('goto'):
+            goto_waypoint(robot, (waypointMsg['x'], waypointMsg['y']),
+                (waypointMsg['heading_x'], waypointMsg['heading_y']), robot['altitude'])
+        actuated(robot, waypointMsg)
+
+    if targetMsg is not None:
+        # Rotate camera
+        with profiler.span('gimbal'):
+            robot['gimbal'].update()
+        (robot['camera']['xGimbal_deg'], robot['camera']['yGimbal_deg']) = robot['gimbal'].degrees()
+        # Aim from the waypoint, where the GCS planned the view
+        origin = robot['destination'] if robot['destination']['x'] is not None else None
+        with profiler.span('camera'):
+            point_camera(robot, (targetMsg['x'], targetMsg['y']), robot['altitude'], origin)
+        actuated(robot, targetMsg)
+    return None
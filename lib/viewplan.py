@@ -0,0 +1,79 @@
+# Altitude and gimbal planner
+# Solves, in closed form, for the lowest altitude and the gimbal tilt that
+# keep a group of targets (its enclosing circle, see extent.py) inside the
+# camera footprint with a margin, for any number of candidate camera
+# positions at once. Uses the footprint model of footprint.py: tilt is
+# measured from nadir toward the heading, and the footprint spans
+# altitude * tan(tilt -/+ half FoV) along the heading and
+# altitude * tan(+/- half FoV) across it.
+
+# Import libraries
+import math
+import numpy as nm
+from footprint import FOV_DEG, halfAngles
+
+# Gimbal limit, in degrees from nadir
+MAX_TILT_DEG = 60.0
+
+
+def planView(distances, radius, margin, fov = FOV_DEG, minAltitude = 10.0,
+             maxAltitude = 120.0, maxTilt_deg = MAX_TILT_DEG):
+    """
+    Function: planView
+    Arguments:
+        distances: (N,) candidate ground distances from the camera to the group's center,
+            along the heading
+        radius: radius of the group's enclosing circle
+        margin: meters to keep between every target and the footprint edge
+        fov: (x, y) field of view in degrees
+        minAltitude, maxAltitude: altitude limits in meters
+        maxTilt_deg: gimbal limit, in degrees from nadir
+    Purpose:
+        With the group spanning F0 = d - r - margin to F1 = d + r + margin
+        along the heading and r + margin across it, the lowest altitude is
+        the largest of the altitudes that
+            fit the width:                  (r + margin) / tan(half y FoV)
+            let a nadir view reach F0:      -F0 / tan(half x FoV)
+            let the tilt limit reach F1:    F1 / tan(maxTilt + half x FoV)
+            see F0..F1 within the x FoV:    larger root of
+                tan(FoV) h^2 - (F1 - F0) h + tan(FoV) F0 F1 = 0
+        and the tilt centers the group in the view, within its limits.
+        Returns a dict of (N,) arrays:
+            altitude:   meters, clipped to the limits
+            tilt_deg:   gimbal tilt from nadir
+            aim:        ground distance from the camera to the center of the view
+            feasible:   False where the group does not fit below maxAltitude
+    """
+    distances = nm.asarray(distances, dtype = float)
+    (xHalf, yHalf) = halfAngles(fov)
+    # The quadratic needs the whole x FoV below 90 degrees
+    xHalf = min(xHalf, math.radians(44.9))
+    maxTilt = min(math.radians(maxTilt_deg), math.radians(89.9) - xHalf)
+
+    near = distances - radius - margin
+    far = distances + radius + margin
+    width = radius + margin
+
+    fitWidth = width / math.tan(yHalf)
+    reachNear = nm.maximum(-near, 0.0) / math.tan(xHalf)
+    reachFar = far / math.tan(maxTilt + xHalf)
+    k = math.tan(2 * xHalf)
+    discriminant = (far - near) ** 2 - 4 * k ** 2 * near * far
+    fitLength = nm.where(discriminant >= 0,
+        ((far - near) + nm.sqrt(nm.maximum(discriminant, 0.0))) / (2 * k), 0.0)
+
+    altitude = nm.full(distances.shape, max(fitWidth, minAltitude))
+    for bound in (reachNear, reachFar, fitLength):
+        altitude = nm.maximum(altitude, bound)
+    feasible = altitude <= maxAltitude
+    altitude = nm.minimum(altitude, maxAltitude)
+
+    # Center the group in the view, within the tilts that keep it in view
+    toNear = nm.arctan(near / altitude)
+    toFar = nm.arctan(far / altitude)
+    low = nm.maximum(toFar - xHalf, 0.0)
+    high = nm.minimum(toNear + xHalf, maxTilt)
+    tilt = nm.minimum(nm.maximum(0.5 * (toNear + toFar), low), high)
+
+    return {'altitude':altitude, 'tilt_deg':nm.degrees(tilt),
+            'aim':altitude * nm.tan(tilt), 'feasible':feasible}
@@ -12,40 +12,26 @@
 #		MotionVW - can move given velocity vector (simulate motion control)
 
 # Import libraries
-import pymorse
 import argparse
-import time
 import numpy as nm
-import json
 import redis
 import math
-import re
-from roboutils import *
+from simclock import Clock
+from codec import Encoder, decode, addressOf, CODECS
+from gimbal import Gimbal
+from messaging import commandChannels, channelName, drain, publisher, TRANSPORTS
+from profiling import Profiler, installSignals
+from telemetry import TelemetryGate, TelemetryPublisher
+from linkstats import LinkMonitor
+from vehicles import Command, DEFAULT_ALTITUDE, sampleTelemetry, executeCommands
 
 # Import interfaces
-from roboutils import get_status
+from roboutils import invalidate_pose
 
 # Import behaviors
 from roboutils import ping
-from roboutils import goto_target
-from roboutils import return_home
 from roboutils import halt
 
-# Define interface message command codes
-class Command:
-	# Completely stops and exits current mode
-	halt = -1
-	# Exit robot
-	terminate = 0
-	# Ping robot
-	ping = 1
-	# Will enter mode where it listens for waypoints
-	modeWaypoints = 2
-	# A specific waypoint to follow
-	waypoint = 3
-	# Will center camera on point
-	cameraTarget = 4
-
 def systems_check(robot):
 
 	# Very that robot is available
@@ -115,115 +101,67 @@ def rotatePoint(centerPoint,point,angle):
 	temp_point = temp_point[0]+centerPoint[0] , temp_point[1]+centerPoint[1]
 	return temp_point
 
-def pong (redis, commStr):
+def addressed_here (robot, msg):
+	# Checked before decoding: unaddressed, or for this quadcopter or one of its groups
+	to = addressOf (msg['data'])
+	if (to is None or to in robot['addresses']):
+		return True
+	robot['links'].count ('misaddressed')
+	return False
+
+def decode_command (robot, msg):
+	# Decoded command, or None for anything that is not a message (counted)
+	try:
+		with robot['profiler'].span ('decode'):
+			return decode (msg['data'])
+	except ValueError:
+		robot['links'].count ('undecodable')
+		return None
+
+def pong (publish, commStr, encoder):
 	reply = { 'tag':1 }
-	reply_json = json.dumps (reply, separators = (',', ':'))
-	redis.publish (commStr, reply_json)
+	publish (commStr, encoder.encode (reply))
 
 def receiveWaypoints(robot, delta, redis, connStr, comm):
 
-	halt = False
+	# Telemetry runs on its own schedule while waypoints are followed
+	robot['telemetry'].start ()
+	try:
+		return commandLoop (robot, comm)
+	finally:
+		robot['telemetry'].stop ()
+		print ("[+] Robot {0}: published {1} of {2} telemetry samples".format (robot['name'],
+			robot['telemetry'].publishes, robot['telemetry'].samples))
+
+def commandLoop (robot, comm):
+	# Follows waypoints until halted or terminated; returns that command
+
+	profiler = robot['profiler']
 
 	# While there are still targets and the quadcopter has not been told to stop
-	while (halt == False):
-		msg = comm.get_message ()
-		if msg:
-			if (msg['type'] == 'message'):
-				msg_data = json.loads (msg['data'].decode("utf-8"))
-				if (msg_data['tag'] == -1): # Halt tag
-					halt (robot)
-					halt = True
-				#elif (msg_data['tag'] == 4):
-					# Start recording
-#					getattr(robot['simu'], robot['name']).PTU.videocamera.capture (10000)
-				elif (msg_data['tag'] == 3): # A Waypoint msg
-					# Get own position
-					status = get_status(robot);
-
-					waypoint = (msg_data['x'], msg_data['y'])
-					heading_toward = (msg_data['heading_x'], msg_data['heading_y'])
-
-					# Get heading toward targets
-					w = [waypoint[0], waypoint[1]]
-					n = [heading_toward[0], heading_toward[1]]
-					p = [status['pos_x'], status['pos_y']]
-					l = nm.subtract (n, w)
-					theta = nm.arctan2 (l[1], l[0])
-					if (theta < 0):
-						theta = theta + 2 * math.pi
-
-					# Set waypoint
-					dest = {'x':waypoint[0], 'y':waypoint[1], 'heading':theta}
-
-					getattr(robot['simu'], robot['name']).waypoint.goto(dest['x'], dest['y'], 30, theta, 0.01)
-					robot['destination'] = dest
-
-					# Calculate distance to destination
-					#distance = nm.sqrt(((dest['x'] - status['pos_x']) ** 2 ) + ((dest['y'] - status['pos_y']) ** 2 ))
-					# Modify speed based on target distance from destination
-					# Commented out because the waypoint navigation does this automatically
-					#if (distance > delta + 1):
-					#	speed = min (speed * (distance / (delta + distance) ) + 0.1, robot['MAX_SPEED'])
-					#elif (distance < delta + 1):
-					#	speed = (speed * ( (delta - distance) / (delta + distance) ) )
-
-				elif (msg_data['tag'] == 4): # A camera target tag
-					# Rotate camera
-					current = getattr(robot['simu'], robot['name']).PTU.videocamera.get_configurations()
-					rotation = re.findall ('rotation[^]]*', str (current))[0]
-					rotation = rotation.replace ('rotation\': [[', '')
-					rotation = rotation.split (", ")
-					x_angle = float (rotation[0])
-					y_angle = float (rotation[1])
-					z_angle = float (rotation[2])
-					robot['camera']['xGimbal_deg'] = math.degrees (z_angle)
-					robot['camera']['yGimbal_deg'] = math.degrees (y_angle)
-
-					# FIX?????
-					#robot['camera']['xGimbal_deg'] = (-1) * robot['camera']['xGimbal_deg']
-					#robot['camera']['yGimbal_deg'] = 0
-
-					# Use spherical coordinates to tilt the camera's gimbal
-					# Code adapted from Morse Simulator: http://www.openrobots.org/morse/doc/1.2/_modules/morse/actuators/ptu.html
-
-					# Get own position
-					status = get_status(robot);
-					# Calc target position with respect to camera/gimbal
-					target = ( msg_data['x'] - status['pos_x'], msg_data['y'] - status['pos_y'], 0 - 30 )
-					distance = nm.sqrt (target[0] ** 2 + target[1] ** 2 + target[2] ** 2)
-					theta = math.asin (target[2] / distance)
-					phi = math.atan2 (target[1], target[0])
-
-					parent_pan = getattr(robot['simu'], robot['name']).pose.get()['yaw']
-					parent_tilt = getattr(robot['simu'], robot['name']).pose.get()['pitch']
-
-					pan = 0.1 * phi - parent_pan
-					tilt = -theta + parent_tilt
-
-					getattr(robot['simu'], robot['name']).PTU.set_pan_tilt(0, tilt)
-
-		# Publish info
-		status = get_status(robot);
-		current = getattr(robot['simu'], robot['name']).PTU.videocamera.get_configurations()
-		rotation = re.findall ('rotation[^]]*', str (current))[0]
-		rotation = rotation.replace ('rotation\': [[', '')
-		rotation = rotation.split (", ")
-		x_angle = float (rotation[0])
-		y_angle = float (rotation[1])
-		z_angle = float (rotation[2])
-		robot['camera']['xGimbal_deg'] = math.degrees (z_angle)
-		robot['camera']['yGimbal_deg'] = math.degrees (y_angle)
-
-		info = robot['camera']
-		info['tag'] = 5
-		info['pos_x'] = status['pos_x']
-		info['pos_y'] = status['pos_y']
-		info['pos_z'] = status['pos_z']
-		info_json = json.dumps (info, separators = (',', ':'))
-		print (info['pos_x'], info['pos_y'])
-		redis.publish (connStr, info_json)
-		time.sleep(0.01)
-	return 0
+	while (True):
+		profiler.tick ()
+		# New control step: the first pose reader queries the simulator
+		invalidate_pose (robot)
+		# Everything waiting; only the newest waypoint and camera target count
+		with profiler.span ('poll'):
+			msgs = drain (comm)
+		commands = []
+		for msg in msgs:
+			if not addressed_here (robot, msg):
+				continue
+			msg_data = decode_command (robot, msg)
+			if (msg_data is None):
+				continue
+			robot['links'].observe (channelName (msg, ''), msg_data, robot['clock'].time ())
+			commands.append (msg_data)
+		# Newest waypoint and camera target; stop on halt or terminate
+		stop = executeCommands (robot, commands)
+		if (stop is not None):
+			return stop
+
+		with profiler.span ('sleep'):
+			robot['clock'].sleep(0.01)
 
 
 def main ():
@@ -231,8 +169,35 @@ def main ():
 	parser = argparse.ArgumentParser()
 	parser.add_argument("-n", "--name", help = "name of robot in MORSE environment")
 	parser.add_argument("-s", "--maxSpeed", help = "max speed of QCOORD", default = 3)
+	parser.add_argument("-c", "--codec", help = "wire encoding of telemetry messages", choices = CODECS, default = 'json')
+	parser.add_argument("-g", "--gimbalVerify", help = "seconds between gimbal rotation read-backs", default = 1.0)
+	parser.add_argument("--sim", help = "run headless against the named simmorse scene instead of MORSE")
+	parser.add_argument("--timescale", help = "simulated seconds per wall-clock second (headless only)", default = 1)
+	parser.add_argument("--start", help = "x,y start position, for a quadcopter not in the scene (headless only)")
+	parser.add_argument("-G", "--groups", help = "comma-separated groups whose commands this quadcopter follows")
+	parser.add_argument("-t", "--telemetryRate", help = "telemetry samples per second", type = float, default = 10)
+	parser.add_argument("--minDistance", help = "publish telemetry when the position moved more than this (m)", type = float, default = 0.1)
+	parser.add_argument("--minAngle", help = "publish telemetry when a gimbal angle changed more than this (deg)", type = float, default = 0.5)
+	parser.add_argument("--heartbeat", help = "publish telemetry at least this often (s)", type = float, default = 1.0)
+	parser.add_argument("-v", "--verbose", help = "print telemetry as it is published", action = 'store_true')
+	parser.add_argument("--transport", help = "publish telemetry over Redis pub/sub, to a capped Redis stream or to a shared-memory slot (same host)", choices = TRANSPORTS, default = 'pubsub')
+	parser.add_argument("--maxlen", help = "streams: entries kept in the stream", type = int)
+	parser.add_argument("--profile", help = "time each stage of the control loop from the start (toggle with SIGUSR1, print with SIGUSR2; printed on exit)", action = 'store_true')
 	args = parser.parse_args()
 
+	# Select simulator backend
+	if (args.sim is not None):
+		import simmorse as pymorse
+		clock = Clock (args.timescale)
+		morse = pymorse.Morse (args.sim, clock)
+		if (args.start is not None):
+			start = [float (v) for v in args.start.split (',')]
+			morse.add_robot (args.name, 'Quadrotor', start[0], start[1], 0.3)
+	else:
+		import pymorse
+		clock = Clock ()
+		morse = pymorse.Morse ()
+
 	# A robot is a dictionary of info
 	# Will fail if args not set => implicit argument verification
 	robot = {}
@@ -240,67 +205,72 @@ def main ():
 	# Init message passing interface (via Redis)
 	r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
 	p = r.pubsub ()
-	# Subscribe to messages from GCS
-	GCSconnStr = 'GCS'
-	p.subscribe (GCSconnStr)
+	# Subscribe to commands for this quadcopter, its groups and the whole fleet
+	groups = args.groups.split (",") if args.groups else []
+	p.subscribe (*commandChannels (args.name, groups))
 	# Publish to own channel
 	connStr = 'Morse-QCOORD-' + args.name
 	r.publish (connStr, 'Boot')
 
-	with pymorse.Morse() as simu:
+	with morse as simu:
 
 		# Init robot
 		robot = { 'name':args.name,
 		 'simu':simu,
+		 'clock':clock,
+		 'encoder':Encoder (args.codec, clock),
+		 # Pongs are sequenced apart from telemetry, so neither looks lossy
+		 'replies':Encoder (args.codec, clock),
+		 'publish':publisher (r, args.transport, args.maxlen),
+		 # Share one pose query per control step
+		 'poseMaxAge':None,
 		 # Traits
 		 'MAX_SPEED': float (args.maxSpeed),
+		 'altitude': DEFAULT_ALTITUDE,
+		 'profiler': Profiler ('copter ' + args.name, args.profile),
+		 'links': LinkMonitor ('copter ' + args.name + ' links'),
+		 'addresses': set ([args.name] + groups),
 		'destination' : {'x':None, 'y':None} }
+		installSignals (robot['profiler'])
+		robot['links'].dumpOnExit ()
 
-		# Get camera specs
-		properties = getattr(robot['simu'], robot['name']).PTU.videocamera.get_properties ()
-		properties = str (properties)
-		cam_height = re.findall ('\'cam_height\': \[[0-9]*,', properties)[0]
-		cam_height = float (cam_height.replace ('\'cam_height\': [', "").replace (',', "") )
-		cam_width = re.findall ('\'cam_width\': \[[0-9]*,', properties)[0]
-		cam_width = float (cam_width.replace ('\'cam_width\': [', "").replace (',', ""))
-		cam_focallen = re.findall ('\'cam_focal\': \[[.0-9]*,', properties)[0]
-		cam_focallen = float (cam_focallen.replace ('\'cam_focal\': [', "").replace (',', "") )
-
-		current = getattr(robot['simu'], robot['name']).PTU.videocamera.get_configurations()
-		rotation = re.findall ('rotation[^]]*', str (current))[0]
-		rotation = rotation.replace ('rotation\': [[', '')
-		rotation = rotation.split (", ")
-		x_angle = float (rotation[0])
-		y_angle = float (rotation[1])
-		z_angle = float (rotation[2])
-
-		camera = {'xSensor_mm':cam_height,
-			'ySensor_mm':cam_width,
-			'focallen_mm':cam_focallen,
-			'xGimbal_deg':math.degrees (z_angle),
-			'yGimbal_deg':math.degrees (y_angle)}
+		# Get camera specs and gimbal rotation, parsed once
+		robot['gimbal'] = Gimbal (robot, float (args.gimbalVerify))
+		camera = robot['gimbal'].camera ()
 		robot['camera'] = camera
 		#print (camera)
 
 		# Ensure expected robot configuraton
 		systems_check (robot)
 
+		# Telemetry publisher, started in waypoint mode
+		def publish_telemetry (info):
+			if (args.verbose):
+				print (info['pos_x'], info['pos_y'], info['pos_z'])
+			with robot['profiler'].span ('publish'):
+				robot['publish'] (connStr, robot['encoder'].encode (info))
+		robot['telemetry'] = TelemetryPublisher (lambda: sampleTelemetry (robot), publish_telemetry,
+			args.telemetryRate, TelemetryGate (args.minDistance, args.minAngle, args.heartbeat), clock)
+
 		# Listen for messages
 		read = False
 		for msg in p.listen ():
-			if (msg['type'] == 'message'):
-				msg_data = json.loads (msg['data'].decode("utf-8"))
-				if (msg_data['tag'] == Command.ping):
-					pong (r, connStr)
-				elif (msg_data['tag'] == Command.modeWaypoints):
-					pong (r, connStr)
-					receiveWaypoints (robot, 1, r, connStr, p)
-				elif (msg_data['tag'] == Command.halt):
+			if (msg['type'] == 'message' and addressed_here (robot, msg)):
+				msg_data = decode_command (robot, msg)
+				if (msg_data is None):
+					continue
+				if (msg_data.get ('tag') == Command.ping):
+					pong (robot['publish'], connStr, robot['replies'])
+				elif (msg_data.get ('tag') == Command.modeWaypoints):
+					pong (robot['publish'], connStr, robot['replies'])
+					if (receiveWaypoints (robot, 1, r, connStr, p) == Command.terminate):
+						break
+				elif (msg_data.get ('tag') == Command.halt):
 					halt (robot)
-				elif (msg_data['tag'] == Command.terminate):
+				elif (msg_data.get ('tag') == Command.terminate):
 					halt (robot)
 					break
-				time.sleep (0.001)
+				clock.sleep (0.001)
 
 if __name__ == "__main__":
 	main ()
@@ -11,23 +11,20 @@
 #	   MotionVW - can move given velocity vector (simulate motion control)
 
 # Import libraries
-import pymorse
 import argparse
-import datetime
-import time
-import json
 import redis
+from simclock import Clock
+from codec import Encoder, CODECS
+from messaging import TRANSPORTS, publisher
+from deadreckon import BroadcastGate
+from trajectories import TrajectoryStore, DEFAULT_STORE, readWaypoints, readStart
+from vehicles import startRover, roverStep
 
 # Import interfaces
 from roboutils import get_status
 
 # Import behaviors
 from roboutils import ping
-from roboutils import goto_target
-from roboutils import circle_target
-from roboutils import return_home
-from roboutils import circular_sweep
-from roboutils import halt
 
 
 
@@ -71,16 +68,42 @@ def main ():
 	parser = argparse.ArgumentParser()
 	parser.add_argument("-n", "--name", help = "variable name of robot in MORSE simulator")
 	parser.add_argument("-w", "--waypoints", help = "file containing waypoints")
+	parser.add_argument("-r", "--round", help = "take waypoints (and, headless, the start position) from this round of the trajectory store")
+	parser.add_argument("--store", help = "trajectory store (see compile_trajectories.py)", default = DEFAULT_STORE)
 	parser.add_argument("-v", "--verbose", help = "print robot info to stdout", action='store_true')
+	parser.add_argument("-c", "--codec", help = "wire encoding of status messages", choices = CODECS, default = 'json')
+	parser.add_argument("-b", "--broadcast", help = "fixed-rate or dead-reckoning-gated status broadcast", choices = ['fixed', 'adaptive'], default = 'fixed')
+	parser.add_argument("--maxError", help = "adaptive: publish when the GCS's prediction is off by more than this (m)", type = float, default = 1.0)
+	parser.add_argument("--heartbeat", help = "adaptive: publish at least this often (s)", type = float, default = 5.0)
+	parser.add_argument("--sample", help = "adaptive: seconds between pose checks", type = float, default = 0.1)
+	parser.add_argument("--transport", help = "publish status over Redis pub/sub, to a capped Redis stream or to a shared-memory slot (same host)", choices = TRANSPORTS, default = 'pubsub')
+	parser.add_argument("--maxlen", help = "streams: entries kept in the stream", type = int)
+	parser.add_argument("--sim", help = "run headless against the named simmorse scene instead of MORSE")
+	parser.add_argument("--timescale", help = "simulated seconds per wall-clock second (headless only)", default = 1)
+	parser.add_argument("--start", help = "file containing start position (headless only)")
 	args = parser.parse_args()
 
+	# Select simulator backend
+	if (args.sim is not None):
+		import simmorse as pymorse
+		clock = Clock (args.timescale)
+	else:
+		import pymorse
+		clock = Clock ()
+
 	# Read waypoints
-	if (args.waypoints is not None):
-		with open (args.waypoints) as f:
-			waypoints = f.readlines ()
-		waypoints = [x.strip () for x in waypoints]
-		waypoints = [(float (x.split(',')[0]), float (x.split(',')[1])) for x in waypoints]
-		print (waypoints)
+	start = None
+	waypoints = None
+	if (args.round is not None):
+		store = TrajectoryStore (args.store)
+		waypoints = store.waypoints (args.round, args.name)
+		start = store.start (args.round, args.name)
+	elif (args.waypoints is not None):
+		waypoints = readWaypoints (args.waypoints)
+	if (waypoints is not None):
+		print (waypoints.tolist ())
+	if (args.start is not None):
+		start = readStart (args.start)
 
 	# A robot is a dictionary of info
 	# Will fail if args not set => implicit argument verification
@@ -91,40 +114,51 @@ def main ():
 	p = r.pubsub ()
 
 	channelString = 'Morse-Marisa-' + args.name
+	encoder = Encoder (args.codec, clock)
+	publish = publisher (r, args.transport, args.maxlen)
+
+	# Broadcast policy
+	if (args.broadcast == 'adaptive'):
+		gate = BroadcastGate (args.maxError, args.heartbeat)
+		transitPeriod = args.sample
+		idlePeriod = args.sample
+	else:
+		gate = None
+		transitPeriod = 0.5
+		idlePeriod = 1
 	#r.publish (channelString, 'Boot')
 	r.set ('foo', 'bazz')
 
-	with pymorse.Morse() as simu:
+	if (args.sim is not None):
+		morse = pymorse.Morse (args.sim, clock)
+		if (start is not None):
+			morse.add_robot (args.name, 'ATRV', start[0], start[1])
+	else:
+		morse = pymorse.Morse ()
+
+	with morse as simu:
 
 		try:
 			# Init robot using args and a Null destination
-			robot = { 'name':args.name, 'destination':{'x':None, 'y':None}, 'simu':simu }
+			robot = { 'name':args.name, 'destination':{'x':None, 'y':None}, 'simu':simu, 'clock':clock,
+				# Share one pose query per control step
+				'poseMaxAge':None }
 
 			systems_check(robot, simu)
 			print (str(get_status(robot)))
 
-			if (args.waypoints):
-				for w in waypoints:
-					goto_target (robot, {'x':w[0], 'y':w[1]}, 2.0)
-					while (getattr (simu, robot['name']).waypoint.get_status() == "Transit"):
-						status_json = json.dumps (get_status (robot), separators = (',', ':'))
-						if (args.verbose):
-							print (str (get_status (robot)))
-
-						r.publish (channelString, status_json)
-						time.sleep(0.5)
-					#r.publish (channelString, "Arrived!")
-					#halt(robot)
-			else:
-				while (True == True):
-						status = get_status(robot)
-						status["dest_x"] = status["pos_x"]
-						status["dest_y"] = status["pos_y"]
-						print(str(status))
-
-						status_json = json.dumps (status, separators = (',', ':'))
-						r.publish (channelString, status_json)
-						time.sleep(1)
+			# Drive through the waypoints, or stand still and keep reporting
+			startRover (robot, waypoints)
+			period = transitPeriod if waypoints is not None else idlePeriod
+			while (not robot['done']):
+				status = roverStep (robot, gate)
+				if (status is not None):
+					if (args.verbose or waypoints is None):
+						print (str (status))
+					publish (channelString, encoder.encode (status))
+				clock.sleep (period)
+			if (gate is not None):
+				print ("[+] Robot {0}: published {1} of {2} status checks".format(robot['name'], gate.publishes, gate.samples))
 		except pymorse.MorseServerError as mse:
 			print('Oops! An error occured!')
 			print(mse)
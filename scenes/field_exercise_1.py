@@ -21,11 +21,22 @@
 #       actuators: WIP
 
 from morse.builder import *
+import os
+import sys
+
+# Rover start positions: the defaults below, or a round of the trajectory store
+# e.g. MENELAUS_ROUND=round10 morse run scenes/<scene>.py
+starts = {}
+if os.environ.get ('MENELAUS_ROUND'):
+    sys.path.append (os.path.join (os.getcwd (), 'lib'))
+    from trajectories import TrajectoryStore, DEFAULT_STORE
+    starts = TrajectoryStore (os.environ.get ('MENELAUS_STORE', DEFAULT_STORE)).starts (os.environ['MENELAUS_ROUND'])
 
 
 # Initialize DJANGO
 django = ATRV ()
-django.translate (x = 6, y = 6 )
+(x, y) = starts.get ('django', (6, 6))
+django.translate (x = x, y = y)
 django.properties (Object = True, Graspable = False, Label = "DJANGO")
 keyboard = Keyboard ()
 keyboard.properties (Speed = 2.0)
@@ -47,7 +58,8 @@ motion_django.add_interface ('socket')
 
 # Initialize SUSAN
 susan = ATRV ()
-susan.translate (x = -50, y = 55)
+(x, y) = starts.get ('susan', (-50, 55))
+susan.translate (x = x, y = y)
 susan.properties (Object = True, Graspable = False, Label = "SUSAN")
 pose_susan = Pose ()
 pose_susan.name = "pose"
@@ -66,7 +78,8 @@ motion_susan.add_interface ('socket')
 
 # Initialize ANTON
 anton = ATRV ()
-anton.translate (x = -60, y = 45)
+(x, y) = starts.get ('anton', (-60, 45))
+anton.translate (x = x, y = y)
 anton.properties (Object = True, Graspable = False, Label = "ANTON")
 pose_anton = Pose ()
 pose_anton.name = "pose"
@@ -0,0 +1,30 @@
+# Script : Calibrate_Camera
+# Fits the camera's field of view (and optionally gimbal offset) to measured
+# footprints and writes the camera profile the GCS scripts load
+
+# Import libraries
+import argparse
+from footprint import DEFAULT_CAMERA_PROFILE
+from calibrate import readObservations, fitCamera, saveCameraProfile
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("-i", "--input", help = "CSV of measured footprints (see calibrate.readObservations)", default = "inData/camera_observations.csv")
+	parser.add_argument ("-o", "--output", help = "camera profile", default = DEFAULT_CAMERA_PROFILE)
+	parser.add_argument ("--offset", help = "also fit a gimbal offset", action = 'store_true')
+	args = parser.parse_args ()
+
+	observations = readObservations (args.input)
+	profile = fitCamera (observations, args.offset)
+	saveCameraProfile (profile, args.output)
+	print ("[+] FoV {0:.2f} x {1:.2f} deg, gimbal offset {2:.2f}, {3:.2f} deg, rms {4:.3f} m over {5} observations".format (
+		profile['fov_deg'][0], profile['fov_deg'][1], profile['gimbalOffset_deg'][0], profile['gimbalOffset_deg'][1],
+		profile['rms'], profile['observations']))
+	print ("[+] Wrote {0}".format (args.output))
+
+
+if __name__ == "__main__":
+	main ()
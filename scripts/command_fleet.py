@@ -0,0 +1,43 @@
+# Script : Command_Fleet
+# Sends a halt or terminate command to one quadcopter, a group of them or the whole fleet
+
+# Import libraries
+import argparse
+import redis
+from simclock import Clock
+from codec import Encoder, CODECS
+from messaging import GCS_CHANNEL, commandChannel, groupChannel
+
+COMMANDS = { 'halt':-1, 'terminate':0 }
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("command", help = "halt: stop and leave waypoint mode; terminate: also exit", choices = COMMANDS.keys ())
+	parser.add_argument ("-q", "--quadcopter", help = "name of quadcopter")
+	parser.add_argument ("-g", "--group", help = "name of a group of quadcopters (see copter.py --groups)")
+	parser.add_argument ("-c", "--codec", help = "wire encoding of the command", choices = CODECS, default = 'json')
+	parser.add_argument ("--timescale", help = "simulated seconds per wall-clock second (headless missions)", default = 1)
+	args = parser.parse_args ()
+
+	if (args.quadcopter is not None and args.group is not None):
+		print ("[-] Give a quadcopter or a group, not both")
+		exit (-1)
+
+	# Addressed to one quadcopter or group; the whole fleet otherwise
+	if (args.quadcopter is not None):
+		(channel, to) = (commandChannel (args.quadcopter), args.quadcopter)
+	elif (args.group is not None):
+		(channel, to) = (groupChannel (args.group), args.group)
+	else:
+		(channel, to) = (GCS_CHANNEL, None)
+
+	r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
+	heard = r.publish (channel, Encoder (args.codec, Clock (args.timescale)).encode ({ 'tag':COMMANDS[args.command] }, to = to))
+	print ("[+] Sent {0} on {1} to {2} subscriber(s)".format (args.command, channel, heard))
+
+
+if __name__ == "__main__":
+	main ()
@@ -0,0 +1,25 @@
+# Script : Compile_Trajectories
+# Compiles the text rounds in inData into one memory-mapped trajectory store
+
+# Import libraries
+import argparse
+from trajectories import compileStore, TrajectoryStore
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("-d", "--data", help = "directory of rounds", default = "inData")
+	parser.add_argument ("-o", "--output", help = "store file (default: <data>/trajectories.traj)")
+	parser.add_argument ("-p", "--pattern", help = "glob of round directories", default = "round*")
+	args = parser.parse_args ()
+
+	path = compileStore (args.data, args.output, args.pattern)
+	store = TrajectoryStore (path)
+	print ("[+] Compiled {0} rounds, {1} tracks, {2} waypoints into {3}".format (
+		len (store.rounds), len (store.tracks), len (store.waypointArray), path))
+
+
+if __name__ == "__main__":
+	main ()
@@ -0,0 +1,43 @@
+# Script : Coverage_Report
+# Scores a recorded mission (see record_bus.py): time in view,
+# reacquisition and centering per target and for the whole group
+
+# Import libraries
+import argparse
+from buslog import LogReader
+from footprint import DEFAULT_CAMERA_PROFILE, loadCameraProfile
+from coverage import loadTimeline, evaluate
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("-i", "--input", help = "log file", required = True)
+	parser.add_argument ("-q", "--quadcopter", help = "Name of quadcopter", required = True)
+	parser.add_argument ("-t", "--targets", help = "Comma-separated list of target names", required = True)
+	parser.add_argument ("--camera", help = "camera profile (see calibrate_camera.py)", default = DEFAULT_CAMERA_PROFILE)
+	args = parser.parse_args ()
+
+	targetNames = args.targets.split (",")
+	profile = loadCameraProfile (args.camera)
+	with LogReader (args.input) as log:
+		(times, footprints, targets) = loadTimeline (log.records (), args.quadcopter, targetNames,
+			profile['fov_deg'], profile['gimbalOffset_deg'])
+	if len (times) < 2:
+		print ("[-] No quadcopter telemetry in log")
+		exit (-1)
+	metrics = evaluate (times, footprints, targets)
+
+	print ("Mission: {0:.1f} s, {1} samples".format (times[-1] - times[0], len (times)))
+	print ("{0:<10} {1:>8} {2:>7} {3:>8} {4:>6} {5:>9} {6:>9} {7:>9}".format (
+		"target", "in view", "%", "acquire", "lost", "mean reacq", "longest", "centering"))
+	for (i, name) in enumerate (targetNames + ['(group)']):
+		print ("{0:<10} {1:>7.1f}s {2:>6.1f}% {3:>7.1f}s {4:>6d} {5:>9.1f}s {6:>8.1f}s {7:>8.1f}m".format (
+			name, metrics['timeInView'][i], 100 * metrics['fractionInView'][i], metrics['acquire'][i],
+			metrics['reacquisitions'][i], metrics['meanReacquire'][i], metrics['longestGap'][i],
+			metrics['centering'][i]))
+
+
+if __name__ == "__main__":
+	main ()
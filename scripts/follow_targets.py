@@ -2,411 +2,260 @@
 # Implements coordination between a quadcopter and a group of UGVs
 
 # Import libraries
-import pymorse
-import numpy as nm
-import math
 import argparse
-import datetime
-import time
-import ast
-import re
-import json
+import asyncio
 import redis
-from shapely import geometry
-from shapely.geometry import Polygon, Point
-
-
-def getTargetByName (targets, name):
-	for t in targets:
-		if t['name'] == name:
-			return t
-
-	return None
-
-def calcCentroid (targets, posORway):
+import redis.asyncio as aioredis
+from simclock import Clock
+from codec import Encoder, decode, CODECS
+from messaging import TRANSPORTS, publishMany, channelName, commandChannel, TARGET_PREFIX, QUAD_PREFIX
+from footprint import DEFAULT_CAMERA_PROFILE, loadCameraProfile
+from profiling import Profiler, installSignals
+from linkstats import LinkMonitor
+from streams import StreamReader, DEFAULT_COUNT
+from shmbus import ShmSubscriber
+from follow import newGCS, newFleet, gcsPass, linkName, updateQuad, updateTarget, predictTargets, updateFootprint, updateDistances, planCommands
+
+
+def openReader (r, names, telemetry):
+	# Stream or shared-memory reader in place of a subscription; its statistics are printed on exit
+	options = dict (telemetry)
+	if options.pop ('transport') == 'shm':
+		reader = ShmSubscriber (names)
+	else:
+		reader = StreamReader (r, names, **options)
+	reader.dumpOnExit ()
+	return reader
+
+
+def runFleet (fleet, clock, encoder, predictPeriod, profiler, links, telemetry = None):
 	"""
-	Function: calcCentroid
+	Function: runFleet
 	Arguments:
-		targets: List of 'Target' structs
-		posORway: Whether you are looking for centroid of positions ("pos") or of their next waypoints ("way")
+		fleet: fleet state (see follow.newFleet)
+		clock: Clock
+		encoder: Encoder for commands
+		predictPeriod: if > 0, replan at least this often, from the predicted targets
+		profiler: Profiler timing each stage of the loop
+		links: LinkMonitor of the received messages
+		telemetry: transport to read telemetry from instead of pub/sub
+			(optional): {'transport':'streams'} with StreamReader options,
+			or {'transport':'shm'}
 	Purpose:
-	    Returns the center point of the current positions in all targets
-	Source:
-	    http://stackoverflow.com/questions/23020659/fastest-way-to-calculate-the-centroid-of-a-set-of-coordinate-tuples-in-python-wi
-	"""
-	if posORway == "pos":
-		points = [(t['pos_x'], t['pos_y']) for t in targets if t["comm"]]
-	elif posORway == "way":
-		points = [(t['dest_x'], t['dest_y']) for t in targets if t["comm"]]
-	x, y = zip (*points)
-	l = len (x)
-	return sum (x) / l, sum (y) / l
-
-def calcFootprintCentroid(points):
-	points = [(p[0], p[1]) for p in points]
-	x, y = zip(*points)
-	l = len(x)
-	return sum(x) / l, sum(y) / l
-
-
-def calcFieldOfView (camera):
+		Polling GCS loop for one or several quadcopters: runs follow.gcsPass
+		every 1 ms, or after each blocking stream read. Targets are split into
+		one group per quadcopter as they report, and each quadcopter follows
+		its group with the single-quadcopter logic, on its own command channel.
 	"""
-	Function: calcFieldOfView
-	Arguments:
-	    camera: Camera object
-	Purpose:
-	    Calculate the field of view (FoV) for a camera
-	    given the x and y sensor dimensions and the focal length
-	"""
-	xView = (2 * math.atan (camera['xSensor_mm'] / (2 * camera['focallen_mm'])))
-	yView = (2 * math.atan (camera['ySensor_mm'] / (2 * camera['focallen_mm'])))
-	return (xView, yView)
 
-def calcGroundFootprintDimensions (camera, altitude):
-	"""
-	Function: calcGroundFootprintDimension
-	Arguments:
-	    camera: Camera object
-	    altitude_m: Altitude of camera in meters
-	Purpose:
-	    Calculate the ground footprint of an aerial camera,
-	    such as one mounted on an aerial vehicle.
-	    Finds distances relative to the camera position, but not the actual position
-	"""
+	# A blocking stream read paces the loop itself
+	blocking = telemetry is not None and telemetry.get ('block') is not None
 
-	#FoV = calcFieldOfView (camera)
-	## WARNING: Hard-coded. Assumes MORSE default camera dimensions and focallen
-	FoV = [768, 768]
+	# One encoder per command channel, so each quadcopter sees its own sequence
+	encoders = { quadName:Encoder (encoder.codec, clock) for quadName in fleet['order'] }
 
-	distFront = altitude * (math.tan(nm.radians (camera['xGimbal_deg'] + 0.5 * FoV[0])))
-	distBehind = altitude * (math.tan(nm.radians (camera['xGimbal_deg'] - 0.5 * FoV[0])))
-	distLeft = altitude * (math.tan(nm.radians (camera['yGimbal_deg'] - 0.5 * FoV[1])))
-	distRight = altitude * (math.tan(nm.radians (camera['yGimbal_deg'] + 0.5 * FoV[1])))
-	return (distFront, distBehind, distLeft, distRight)
+	# Init message passing interface (via Redis)
+	r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
 
-def calcGroundFootprint (camera, altitude, position):
-	"""
-	Function: calcGroundFootprint
-	Arguments:
-	    camera: Camera object
-	    altitude_m: Altitude of camera in meters
-	    position: ground (x, y) coordinates of camera
-	"""
-	(distFront, distBehind, distLeft, distRight) = calcGroundFootprintDimensions (camera, altitude)
-	posLowerLeft = (position[0] + distLeft, position[1] + distBehind)
-	posLowerRight = (position[0] + distRight, position[1] + distBehind)
-	posUpperLeft = (position[0] + distLeft, position[1] + distFront)
-	posUpperRight = (position[0] + distRight, position[1] + distFront)
-	return (posLowerLeft, posUpperLeft, posUpperRight, posLowerRight)
+	# Hear every quadcopter and target on one connection: two pattern
+	# subscriptions, or one reader over all their streams (one XREAD per pass)
+	if telemetry is None:
+		p = r.pubsub ()
+		p.psubscribe (QUAD_PREFIX + '*', TARGET_PREFIX + '*')
+	else:
+		p = openReader (r, [fleet['quads'][quadName]['quad']['connStr'] for quadName in fleet['order']] +
+			[t['connStr'] for t in fleet['targets']], telemetry)
 
+	# Ping quadcopters
+	for quadName in fleet['order']:
+		r.publish (commandChannel (quadName), encoders[quadName].encode ({ 'tag':1 }, to = quadName))
 
-def getMaxMinFromPosition (targets, position):
-	"""
-	Function: getMaxMinFromPosition
-	Arguments:
-		targets: List of 'Target' structs
-		position: A len-2 list whose first value is x coord and whose second is y coord.
-	Purpose:
-		Returns the closest and furthest target name and distances
-	"""
+	# Tell quadcopters to start listening for waypoints
+	for quadName in fleet['order']:
+		r.publish (commandChannel (quadName), encoders[quadName].encode ({ 'tag':2 }, to = quadName))
 
-	closestTarget = None
-	farthestTarget = None
+	# Main Loop
+	while (len (fleet['targets']) > 0):  # As long as targets remain
 
-	count = 0
-	for t in targets:
-		if t["comm"] is False:
-			continue
-		distance = nm.sqrt(((position[0] - t['pos_x']) ** 2 ) + ((position[1] - t['pos_y']) ** 2 ))
-		if count == 0:
-			farthestTarget = { 'name':t['name'], 'value':distance }
-			closestTarget = { 'name':t['name'], 'value':distance }
-		else:
-			if distance > farthestTarget['value']:
-				farthestTarget =  { 'name':t['name'], 'value':distance }
-			if distance < closestTarget['value']:
-				closestTarget = { 'name':t['name'], 'value':distance }
+		profiler.tick ()
 
-	return { 'farthest':farthestTarget, 'closest':closestTarget }
+		# Every quadcopter's commands go out in one write
+		commands = gcsPass (fleet, [p], clock, predictPeriod, links, profiler)
+		if commands:
+			with profiler.span ('publish'):
+				publishMany (r, [(commandChannel (quadName), encoders[quadName].encode (command, to = quadName))
+					for (quadName, command) in commands])
 
-def rotatePoint(centerPoint,point,angle):
-	"""Rotates a point around another centerPoint. Angle is in degrees.
-	Rotation is counter-clockwise"""
-	# Source: https://gist.github.com/somada141/d81a05f172bb2df26a2c
-	angle = angle
-	temp_point = point[0]-centerPoint[0] , point[1]-centerPoint[1]
-	temp_point = ( temp_point[0]*math.cos(angle)-temp_point[1]*math.sin(angle) , temp_point[0]*math.sin(angle)+temp_point[1]*math.cos(angle))
-	temp_point = temp_point[0]+centerPoint[0] , temp_point[1]+centerPoint[1]
-	return temp_point
+		# Delay, unless the read already waited for new entries
+		if blocking:
+			continue
+		with profiler.span ('sleep'):
+			clock.sleep (.001)
 
 
-def getGroundFootprint (position, target, camera, altitude):
-        # Calculate angle
-        i = nm.subtract (target, position)
-        theta = nm.arctan2(i[1], i[0])
-        if (theta < 0):
-                theta = theta + 2 * math.pi
-        theta = theta - (math.pi / 2)
+async def runAsync (gcs, clock, encoder, replanInterval, predictPeriod, profiler, links):
+	"""
+	Function: runAsync
+	Arguments:
+		gcs: GCS state
+		clock: Clock
+		encoder: Encoder for commands
+		replanInterval: minimum time between replans, in (simulated) seconds
+		predictPeriod: if > 0, replan at least this often, from the predicted targets
+		profiler: Profiler timing each stage; a loop iteration is one plan
+		links: LinkMonitor of the received messages
+	Purpose:
+		Event-driven GCS loop. Listeners wake only when a message arrives,
+		and the planner wakes only when a target reported since the last plan
+		and the replan deadline has passed. Nothing polls.
+	"""
 
-        footprint =  calcGroundFootprint (camera, altitude, position)
-        footprint = [rotatePoint (position, footprint[0], theta),
-                     rotatePoint (position, footprint[1], theta),
-                     rotatePoint (position, footprint[2], theta),
-                     rotatePoint (position, footprint[3], theta)]
-        return footprint
+	r = aioredis.Redis (host = 'localhost', port = 6379, db = 0)
+	# Commands go to this quadcopter's own channel
+	quadName = gcs['quad']['name']
+	GCSconnStr = commandChannel (quadName)
 
+	# Subscribe to quadcopter, ping it, then to all targets
+	p = r.pubsub ()
+	await p.subscribe (gcs['quad']['connStr'])
+	await r.publish (GCSconnStr, encoder.encode ({ 'tag':1 }, to = quadName))
+	tp = r.pubsub ()
+	await tp.psubscribe (TARGET_PREFIX + '*')
 
+	# Tell quadcopter to start listening for waypoints
+	await r.publish (GCSconnStr, encoder.encode ({ 'tag':2 }, to = quadName))
 
-def main ():
+	replan = asyncio.Event ()
 
-	reposition = False
+	async def quadListener ():
+		async for msg in p.listen ():
+			if msg['type'] == 'message':
+				try:
+					with profiler.span ('decode'):
+						msg_data = decode (msg['data'])
+				except ValueError:
+					continue    # e.g. 'Boot'
+				links.observe (linkName (msg, msg_data), msg_data, clock.time ())
+				updateQuad (gcs, msg_data)
+
+	async def targetListener ():
+		async for msg in tp.listen ():
+			if msg['type'] != 'pmessage':
+				continue
+			try:
+				with profiler.span ('decode'):
+					msg_data = decode (msg['data'])
+			except ValueError:
+				continue    # e.g. 'Boot'
+			name = channelName (msg, TARGET_PREFIX)
+			links.observe (TARGET_PREFIX + name, msg_data, clock.time ())
+			if updateTarget (gcs, name, msg_data, clock.time ()):
+				replan.set ()
+
+	async def planner ():
+		lastPlan = None
+		while True:
+			if predictPeriod > 0 and lastPlan is not None:
+				# Wake on a report or when the prediction deadline passes
+				try:
+					await asyncio.wait_for (replan.wait (), predictPeriod / clock.scale)
+				except asyncio.TimeoutError:
+					pass
+			else:
+				await replan.wait ()
+			# Hold off until the replan deadline
+			if lastPlan is not None:
+				remaining = replanInterval - (clock.time () - lastPlan)
+				if remaining > 0:
+					await clock.asleep (remaining)
+			replan.clear ()
+			lastPlan = clock.time ()
+			profiler.tick ()
+
+			with profiler.span ('footprint'):
+				updateFootprint (gcs)
+			with profiler.span ('predict'):
+				predictTargets (gcs, lastPlan)
+			with profiler.span ('distances'):
+				updateDistances (gcs)
+			with profiler.span ('plan'):
+				commands = planCommands (gcs)
+			if gcs['origin'] is not None:
+				links.latency ('report->plan', clock.time () - gcs['origin'])
+			with profiler.span ('publish'):
+				pipe = r.pipeline (transaction = False)
+				for command in commands:
+					pipe.publish (GCSconnStr, encoder.encode (command, to = quadName))
+				await pipe.execute ()
+
+	try:
+		await asyncio.gather (quadListener (), targetListener (), planner ())
+	finally:
+		await p.aclose ()
+		await tp.aclose ()
+		await r.aclose ()
 
-	# Initialize null robots
-	quadcopter = {}
-	targets = []
+
+def main ():
 
 	# Parse arguments
 	parser = argparse.ArgumentParser ()
-	parser.add_argument ("-q", "--quadcopter", help = "Name of quadcopter")
+	parser.add_argument ("-q", "--quadcopter", help = "Name of quadcopter, or comma-separated names to split the targets between")
 	parser.add_argument ("-t", "--targets", help = "Comma-separated list of target names")
+	parser.add_argument ("-c", "--codec", help = "wire encoding of commands", choices = CODECS, default = 'json')
+	parser.add_argument ("--timescale", help = "simulated seconds per wall-clock second (headless missions)", default = 1)
+	parser.add_argument ("-a", "--asyncio", help = "run the event-driven GCS instead of the polling loop", action = 'store_true')
+	parser.add_argument ("--replanInterval", help = "minimum seconds between replans (asyncio only)", type = float, default = 0)
+	parser.add_argument ("-p", "--predict", help = "also replan every PREDICT seconds from the targets' predicted positions (0 = only on reports)", type = float, default = 0)
+	parser.add_argument ("-e", "--groupExtent", help = "measure the group from its enclosing circle or its centroid", choices = ('circle', 'centroid'), default = 'circle')
+	parser.add_argument ("--camera", help = "camera profile (see calibrate_camera.py)", default = DEFAULT_CAMERA_PROFILE)
+	parser.add_argument ("--profile", help = "time each stage of the GCS loop from the start (toggle with SIGUSR1, print with SIGUSR2; printed on exit)", action = 'store_true')
+	parser.add_argument ("--transport", help = "read telemetry over Redis pub/sub, from Redis Streams or from shared memory (polling loop only)", choices = TRANSPORTS, default = 'pubsub')
+	parser.add_argument ("--count", help = "streams: most entries read per stream and request", type = int, default = DEFAULT_COUNT)
+	parser.add_argument ("--offset", help = "streams: start from new entries ($), the oldest kept (0) or an entry id", default = '$')
+	parser.add_argument ("--group", help = "streams: read as a member of this consumer group")
+	parser.add_argument ("--block", help = "streams: wait up to BLOCK ms for new entries in each pass's read instead of polling every 1 ms", type = int)
+	parser.add_argument ("--hysteresis", help = "several quadcopters: meters a target must be nearer another group before it moves", type = float, default = 5.0)
 	args = parser.parse_args ()
 
+	clock = Clock (args.timescale)
+	encoder = Encoder (args.codec, clock)
+	profile = loadCameraProfile (args.camera)
+	profiler = Profiler ('follow_targets', args.profile)
+	installSignals (profiler)
+	links = LinkMonitor ('follow_targets links')
+	links.dumpOnExit ()
+	options = {'groupExtent':args.groupExtent, 'fov':profile['fov_deg'], 'gimbalOffset':profile['gimbalOffset_deg']}
+	telemetry = None
+	if (args.transport != 'pubsub'):
+		if args.asyncio:
+			print ("[-] {0} transport needs the polling loop".format (args.transport))
+			exit (-1)
+		telemetry = {'transport':args.transport}
+		if (args.transport == 'streams'):
+			telemetry.update ({'count':args.count, 'offset':args.offset, 'group':args.group, 'block':args.block})
+
 	# Must have a quadcopter
 	if (args.quadcopter is None):
 		print ("[-] No targets specified")
 		exit (-1)
 
-	# Init message passing interface (via Redis)
-	r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
-	p = r.pubsub ()
-	GCSconnStr = 'GCS'
-
-	quadName = args.quadcopter
-	targetNames = args.targets.split (",")
-
-	quadConnStr = 'Morse-QCOORD-' + quadName
-	p.subscribe (quadConnStr)
-
-	# Init quadcopter
-	quad = { 'name':quadName, 'connStr':quadConnStr, 'waypoint':{}, 'x':0, 'y':0}
-
-	# Init targets
-	for name in targetNames:
-		targetConnStr = 'Morse-Marisa-' + name
-		target = {'name':name, 'connStr':targetConnStr, 'comm':False}
-		target["distance"] = None
-		targets.append (target)
-
-	# Subscribe to quadcopter
-	quadConnStr = 'Morse-QCOORD-' + quadName
-	p.subscribe (quadConnStr)
-
-	# Ping quadcopter
-	ping = { 'tag':1 }
-	ping_json = json.dumps (ping)
-	r.publish (GCSconnStr, ping_json)
-	msg = p.listen ()  # Will block until message recieved from quadcopter
-
-	# Subscribe to each target
-	for t in targets:
-		t['pubsub'] = r.pubsub ()
-		t['pubsub'].subscribe (t['connStr'])
-
-	# Tell quadcopter to start listening for waypoints
-	quadModeSet = { 'tag':2 }
-	quadModeSet_json = json.dumps (quadModeSet)
-	r.publish (GCSconnStr, quadModeSet_json)
-
-	# Setup camera
-	# ASSUMES the constant altitude of 30m
-	camera = { 'xSensor_mm': 255,
-		   'ySensor_mm': 255,
-		   'focallen_mm': 93.0909,
-		   'xGimbal_deg': 0,
-		   'yGimbal_deg': 0,
-	}
-	altitude = 30
-
-	# Control logic
-	haveWaypoint = False
-	firstWaypoint = True
-	haveTargetPose = False
-
-	position = None
-
-	# Main Loop
-	nComm = 0
-	nTargets = len(targets)
-	while (nTargets > 0):  # As long as targets remain
-
-		# Control flags
-		newWaypoint = False
-
-		# World Model
-		centroidPrev = None
-		centroidPrevTimestamp = None
-		centroidSpeed_s = None
-
-		# Update quadcopter status
-		msg = p.get_message ()
-		if msg:
-			if msg['type'] == 'message':
-				msg_data = json.loads(msg['data'].decode("utf-8"))
-				if msg_data['tag'] == 5:
-					camera['xGimbal_deg'] = abs(msg_data['xGimbal_deg'])
-					camera['yGimbal_deg'] = 0
-					quad["x"] = msg_data['pos_x']
-					quad['y'] = msg_data['pos_y']
-					position = (float(quad["x"]), float(quad["y"]))
-
-		# Find camera footprint
-		if haveWaypoint == True and position is not None:
-
-			tpose = [float(centroid[0]), float (centroid[1])]
-
-			footprint = getGroundFootprint (position, tpose, camera, altitude)
-			footprint_poly = geometry.Polygon([[p[0], p[1]] for p in footprint])
-			footprint_centroid = calcFootprintCentroid(footprint)
-
-		for t in targets:
-			# Update targets' status
-			msg = t['pubsub'].get_message ()
-
-			if msg:
-				# Time of received
-				timestamp = time.time ()
-
-				if (msg['type'] == 'message'):
-					#! Should actually check tag to see what kind of message
-
-					# Has received a new waypoint
-					newWaypoint = True
-
-					msg_data = json.loads (msg['data'].decode("utf-8"))
-
-					t['pos_x'] = msg_data['pos_x']
-					t['pos_y'] = msg_data['pos_y']
-					t['dest_x'] = msg_data['dest_x']
-					t['dest_y'] = msg_data['dest_y']
-					t['comm'] = True
-
-			try:
-			    # Update distance from footprint information
-			    if haveWaypoint == True:
-				    distFromCenter =  nm.sqrt(((footprint_centroid[0] - t['pos_x']) ** 2) + \
-							      ((footprint_centroid[1] - t['pos_y']) ** 2))
-				    distFromBoundary = footprint_poly.boundary.distance( geometry.Point([t['pos_x'], t['pos_y']]))
-				    distFromFootprint = footprint_poly.distance( geometry.Point([t['pos_x'], t['pos_y']]))
-				    distFromFootprintRel = distFromBoundary if distFromFootprint != 0 else \
-					    distFromBoundary * (-1)
-				    t['distance'] = {'fromCenter' : distFromCenter,
-						     'fromFootprint' : distFromFootprint,
-						     'fromBoundary' : distFromBoundary,
-						     'fromFootprintRel' : distFromFootprintRel,
-				    }
-				    #print ("------")
-				    #print (footprint)
-				    #print ("POS",  position)
-				    #print ("TPOS", tpose)
-				    #print ("X-deg", camera['xGimbal_deg'])
-				    if t['distance']['fromFootprintRel'] + 4 > 0:
-					    print ("%s is outside camera view" % t['name'])
-					    reposition = True
-				    #
-				    else:
-					    print ("%s is within camera view"  % t['name'])
-				    print ("------")
-			except:
-			    continue
-
-		if newWaypoint:
-
-			#Get centroid of targets' positions
-			centroid = calcCentroid (targets, "pos")
-
-			#print ("centroid", centroid)
-
-
-			# Get centroid of target's next waypoint positions
-			waypoint_centroid = calcCentroid (targets, "way")
-
-			targetsMaxMin = getMaxMinFromPosition (targets, centroid)
-			furthestTarget = targetsMaxMin['farthest']
-
-			# Align at stand-off distance
-			# 1: l = Waypoint - Centroid
-			l = nm.subtract (waypoint_centroid, centroid)
-			# 2: Reverse l
-			lrev = ( (-1) * l[0], (-1) * l[1] )
-			# 3: Get angle of lrev
-			theta = nm.arctan2 (lrev[1], lrev[0])
-			if theta < 0:
-				theta = theta * 2 * math.pi
-			# 4: Go standoff-dist in lrev dir
-			Nstraight = (2 + furthestTarget['value'], 0)
-			N = rotatePoint ([0, 0], Nstraight, theta)
-			# Newpoint = Centroid + N
-			way = nm.add (N, centroid)
-
-
-			# Set waypoint and point heading toward
-			haveWaypoint = True
-			if reposition == True or firstWaypoint == True:
-				print("hi")
-				quad['waypoint']['x'] = way[0]
-				quad['waypoint']['y'] = way[1]
-			else:
-				quad['waypoint']['x'] = quad['waypoint']['x']
-				quad['waypoint']['y'] = quad['waypoint']['y']
-			quad['waypoint']['heading_x'] = centroid[0]
-			quad['waypoint']['heading_y'] = centroid[1]
-
-
-			#print (quad['waypoint'])
-			# Send waypoint to quadcopter
-			msgSend = quad['waypoint']
-			msgSend['tag'] = 3
-			msgSend_json = json.dumps (msgSend)
-			r.publish (GCSconnStr, msgSend_json)
-
-			firstWaypoint = False
-			reposition = False
-
-
-			# Set targets' centroid as camera target
-			quad['target'] = {}
-			quad['target']['x'] = quad['waypoint']['x']  #centroid[0]
-			quad['target']['y'] = quad['waypoint']['y']  #centroid[1]
-
-			# Send camera target to quadcopter
-			msgSend = quad['target']
-			msgSend['tag'] = 4
-			msgSend_json = json.dumps (msgSend)
-			r.publish (GCSconnStr, msgSend_json)
-
-			# Estimate centroid speed
-			if centroidPrev is not None:
-				# Calc distance between centroids
-				dist_m = ( ( centroidPrev[0] - centroid[0] ) ** 2 + ( centroidPrev[1] - centroid[1] ) ** 2 ) ** (0.5)
-				# Calc time difference
-				time_s = timestamp - centroidPrevTimestamp
-				# Calc speed
-				centroidSpeed_s = dist_m / time_s
-
-			# Set current centroid as previous centroid
-			centroidPrev = centroid
-			centroidPrevTimestamp = timestamp
-
-
-		# Reset control flags
-		newWaypoint = False
-
-		# Delay
-		time.sleep (.001)
+	quadNames = args.quadcopter.split (",")
+	if len (quadNames) > 1 and args.asyncio:
+		print ("[-] Several quadcopters need the polling loop")
+		exit (-1)
 
+	try:
+		if args.asyncio:
+			gcs = newGCS (args.quadcopter, args.targets.split (","), **options)
+			asyncio.run (runAsync (gcs, clock, encoder, args.replanInterval, args.predict, profiler, links))
+		else:
+			# One quadcopter is a fleet of one
+			fleet = newFleet (quadNames, args.targets.split (","), args.hysteresis, **options)
+			runFleet (fleet, clock, encoder, args.predict, profiler, links, telemetry)
+	except KeyboardInterrupt:
+		pass
 
 
 if __name__ == "__main__":
 	main ()
-
-
@@ -1,7 +1,6 @@
 # Script : Hold_Position
 
 # Import libraries
-import pymorse
 import numpy as nm
 import math
 import argparse
@@ -11,94 +10,10 @@ import ast
 import re
 import json
 import redis
-from shapely import geometry
-from shapely.geometry import Polygon, Point
-
-
-
-
-
-def rotatePoint(centerPoint,point,angle):
-	angle = angle
-	temp_point = point[0]-centerPoint[0] , point[1]-centerPoint[1]
-	temp_point = ( temp_point[0]*math.cos(angle)-temp_point[1]*math.sin(angle) , temp_point[0]*math.sin(angle)+temp_point[1]*math.cos(angle))
-	temp_point = temp_point[0]+centerPoint[0] , temp_point[1]+centerPoint[1]
-	return temp_point
-
-def calcCentroid(points):
-	points = [(p[0], p[1]) for p in points]
-	x, y = zip(*points)
-	l = len(x)
-	return sum(x) / l, sum(y) / l
-
-
-def calcFieldOfView (camera):
-	"""
-	Function: calcFieldOfView
-	Arguments:
-	    camera: Camera object
-	Purpose:
-	    Calculate the field of view (FoV) for a camera 
-	    given the x and y sensor dimensions and the focal length
-	"""
-	xView = (2 * math.atan (camera['xSensor_mm'] / (2 * camera['focallen_mm'])))
-	yView = (2 * math.atan (camera['ySensor_mm'] / (2 * camera['focallen_mm'])))
-	return (math.degrees(xView), math.degrees(yView))
-
-def calcGroundFootprintDimensions (camera, altitude):
-	"""
-	Function: calcGroundFootprintDimension
-	Arguments:
-	    camera: Camera object
-	    altitude_m: Altitude of camera in meters
-	Purpose: 
-	    Calculate the ground footprint of an aerial camera, 
-	    such as one mounted on an aerial vehicle. 
-	    Finds distances relative to the camera position, but not the actual position
-	"""
-	FoV = calcFieldOfView (camera)
-	FoV = [768, 768]
-	print ("FoV", FoV)
-	distFront = altitude * (math.tan(nm.radians (camera['xGimbal_deg'] + 0.5 * FoV[0])))
-	distBehind = altitude * (math.tan(nm.radians (camera['xGimbal_deg'] - 0.5 * FoV[0])))
-	distLeft = altitude * (math.tan(nm.radians (camera['yGimbal_deg'] - 0.5 * FoV[1])))
-	distRight = altitude * (math.tan(nm.radians (camera['yGimbal_deg'] + 0.5 * FoV[1])))
-	return (distFront, distBehind, distLeft, distRight)
-
-def calcGroundFootprint (camera, altitude, position):
-	"""
-	Function: calcGroundFootprint
-	Arguments: 
-	    camera: Camera object
-	    altitude_m: Altitude of camera in meters
-	    position: ground (x, y) coordinates of camera
-	"""
-	(distFront, distBehind, distLeft, distRight) = calcGroundFootprintDimensions (camera, altitude)
-	print (distFront, distBehind, distLeft, distRight)
-	print ("Height", abs (distFront - distBehind), "  Width", abs(distLeft - distRight))
-	posLowerLeft = (position[0] + distLeft, position[1] + distBehind)
-	posLowerRight = (position[0] + distRight, position[1] + distBehind)
-	posUpperLeft = (position[0] + distLeft, position[1] + distFront)
-	posUpperRight = (position[0] + distRight, position[1] + distFront)
-	return (posLowerLeft, posUpperLeft, posUpperRight, posLowerRight)
-
-def getGroundFootprint (position, target, camera, altitude):
-	# Calculate angle
-	i = nm.subtract (target, position)
-	theta = nm.arctan2(i[1], i[0])
-	if (theta < 0):
-		theta = theta + 2 * math.pi
-	theta = theta - (math.pi / 2)
-	print (theta)
-
-	footprint =  calcGroundFootprint (camera, altitude, position)
-	footprint = [rotatePoint (position, footprint[0], theta),
-	             rotatePoint (position, footprint[1], theta),
-	             rotatePoint (position, footprint[2], theta),
-	             rotatePoint (position, footprint[3], theta)]
-	print(footprint)
-	return footprint
-
+from footprint import DEFAULT_CAMERA_PROFILE, loadCameraProfile, tiltFromNadir, getGroundFootprint, calcFootprintDistances
+from codec import Encoder, decode, CODECS
+from messaging import drain, subscribeTargets, commandChannel, channelName, TARGET_PREFIX
+from estimator import TargetEstimator
 
 
 def getTargetByName (targets, name):
@@ -121,9 +36,13 @@ def main ():
 	parser.add_argument ("-a", "--xheading",   help = "x coordinate of heading")
 	parser.add_argument ("-b", "--yheading",   help = "x coordinate of heading")
 	parser.add_argument ("-t", "--targets",    help = "list of comma-separated target names")
+	parser.add_argument ("-c", "--codec",      help = "wire encoding of commands", choices = CODECS, default = 'json')
+	parser.add_argument ("--camera",     help = "camera profile (see calibrate_camera.py)", default = DEFAULT_CAMERA_PROFILE)
 
 	args = parser.parse_args ()
 
+	profile = loadCameraProfile (args.camera)
+
 	# Must have a robot
 	if (args.quadcopter is None):
 		print ("[-] No quadcopter specified")
@@ -140,9 +59,10 @@ def main ():
 	# Init message passing interface (via Redis)
 	r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
 	p = r.pubsub ()
-	GCSconnStr = 'GCS'
+	encoder = Encoder (args.codec)
 	
 	quadName = args.quadcopter
+	GCSconnStr = commandChannel (quadName)
 	targetNames = args.targets.split (",")
 	
 	quadConnStr = 'Morse-QCOORD-' + quadName
@@ -152,15 +72,16 @@ def main ():
 	quad = { 'name':quadName, 'connStr':quadConnStr, 'waypoint':{}, 'altitude': 30  }
 
 	# Init targets
-	for name in targetNames:
+	for index, name in enumerate (targetNames):
 		targetConnStr = 'Morse-Marisa-' + name
-		target = {'name':name, 'connStr':targetConnStr}
+		target = {'name':name, 'connStr':targetConnStr, 'index':index}
 		targets.append (target)
+	estimator = TargetEstimator (len (targets))
 
-	# Subscribe to each target
+	# Subscribe to all targets with a single pattern subscription
+	targetsByName = { t['name']:t for t in targets }
+	tp = subscribeTargets (r)
 	for t in targets:
-		t['pubsub'] = r.pubsub ()
-		t['pubsub'].subscribe (t['connStr'])
 		t['pos_x'] = None
 		t['pos_y'] = None
 		t['dest_x'] = None
@@ -180,14 +101,12 @@ def main ():
 	
 	# Ping quadcopter
 	ping = { 'tag':1 }
-	ping_json = json.dumps (ping)
-	r.publish (GCSconnStr, ping_json)
+	r.publish (GCSconnStr, encoder.encode (ping, to = quadName))
 	msg = p.listen ()  # Will block until message recieved from quadcopter
 
 	# Tell quadcopter to start listening for waypoints
 	quadModeSet = { 'tag':2 }
-	quadModeSet_json = json.dumps (quadModeSet)
-	r.publish (GCSconnStr, quadModeSet_json)
+	r.publish (GCSconnStr, encoder.encode (quadModeSet, to = quadName))
 
 	interval = 10
 	counter  = 0
@@ -199,24 +118,32 @@ def main ():
 		msg = p.get_message ()
 		if msg:
 			if msg['type'] == 'message':
-				msg_data = json.loads(msg['data'].decode("utf-8"))
+				msg_data = decode (msg['data'])
 				if msg_data['tag'] == 5:
-					camera['xGimbal_deg'] = msg_data['xGimbal_deg']
-					camera['yGimbal_deg'] = msg_data['yGimbal_deg']
+					camera['xGimbal_deg'] = tiltFromNadir (msg_data['xGimbal_deg']) + profile['gimbalOffset_deg'][0]
+					camera['yGimbal_deg'] = msg_data['yGimbal_deg'] + profile['gimbalOffset_deg'][1]
+					quad['altitude'] = max (msg_data['pos_z'], 0.1)
 		
-		# Update target status
-		for t in targets:
-			msg = t['pubsub'].get_message ()
-			if msg:
-				# Time of received
-				timestamp = time.time ()
-
-				if (msg['type'] == 'message'):
-					msg_data = json.loads (msg['data'].decode("utf-8"))
-					t['pos_x'] = msg_data['pos_x']
-					t['pos_y'] = msg_data['pos_y']
-					t['dest_x'] = msg_data['dest_x']
-					t['dest_y'] = msg_data['dest_y']
+		# Update target status from everything waiting since the last pass
+		for msg in drain (tp):
+			if (msg['type'] != 'pmessage'):
+				continue
+			t = targetsByName.get (channelName (msg, TARGET_PREFIX))
+			if t is None:
+				continue
+
+			# Time of received
+			timestamp = time.time ()
+
+			msg_data = decode (msg['data'])
+			t['pos_x'] = msg_data['pos_x']
+			t['pos_y'] = msg_data['pos_y']
+			t['dest_x'] = msg_data['dest_x']
+			t['dest_y'] = msg_data['dest_y']
+			velocity = (msg_data.get('vel_x'), msg_data.get('vel_y'))
+			if None in velocity:
+				velocity = (nm.nan, nm.nan)
+			estimator.update ([t['index']], [timestamp], [(t['pos_x'], t['pos_y'])], [velocity])
 
 		# Set waypoint and point heading toward
 		quad['waypoint']['x'] = float(args.xcoord)
@@ -241,14 +168,12 @@ def main ():
 		# Send waypoint to quadcopter
 		msgSend = quad['waypoint']
 		msgSend['tag'] = 3
-		msgSend_json = json.dumps (msgSend)
-		r.publish (GCSconnStr, msgSend_json)
+		r.publish (GCSconnStr, encoder.encode (msgSend, to = quadName))
 
 		# Send camera target to quadcopter
 		msgSend = quad['target']
 		msgSend['tag'] = 4
-		msgSend_json = json.dumps (msgSend)
-		r.publish (GCSconnStr, msgSend_json)
+		r.publish (GCSconnStr, encoder.encode (msgSend, to = quadName))
 
 		if (counter % interval == 0):
 
@@ -259,35 +184,24 @@ def main ():
 			position = (float(args.xcoord), float(args.ycoord))
 			tpose = [quad["waypoint"]["heading_x"], quad["waypoint"]["heading_y"]]
 			print (position, tpose, "X-deg", camera['xGimbal_deg'], "Y-deg", camera['yGimbal_deg'])
-			footprint = getGroundFootprint (position, tpose, camera, quad['altitude'])
-			footprint_poly = geometry.Polygon([[p[0], p[1]] for p in footprint])
+			footprint = getGroundFootprint (position, tpose, camera, quad['altitude'], profile['fov_deg'])
 			print ("---")
-			# Calc centroid of footprint
-			footprint_centroid = calcCentroid(footprint)
-
-			#print (footprint)
-			#print (footprint_centroid)
-
-
-			distances = []
-			# Distance between point and each target
-			for t in targets:
-				if t['pos_x'] is not None:
-					distances.append( { 'target' : t['name'],
-					    'distFromCenter'      : nm.sqrt(((footprint_centroid[0] - t['pos_x']) ** 2) + \
-							                    ((footprint_centroid[1] - t['pos_y']) ** 2)),
-					    'distFromBoundary'    : footprint_poly.boundary.distance( geometry.Point([t['pos_x'], t['pos_y']])),
-					    'distFromFootprint'   : footprint_poly.distance( geometry.Point([t['pos_x'], t['pos_y']])),
-					})  
-					distances[len(distances) - 1]['distFromFootprintRel'] = \
-					    distances[len(distances) - 1]['distFromBoundary'] if distances[len(distances) - 1]['distFromFootprint'] != 0 \
-					    else distances[len(distances) - 1]['distFromBoundary'] * (-1)
-
-			for d in distances:
-				if d["distFromFootprintRel"] > 0:
-					print ("%s is outside camera view" % d["target"])
-				else:
-					print ("%s is within camera view"  % d["target"])
+
+			# Distance between footprint and each target's estimated position, all at once
+			reporting = [t for t in targets if t['pos_x'] is not None]
+			if len (reporting) > 0:
+				points = estimator.predict (time.time (), [t['index'] for t in reporting])
+				distances = calcFootprintDistances (footprint, points)
+				for i, t in enumerate (reporting):
+					t['distance'] = {'fromCenter' : float (distances['fromCenter'][i]),
+							 'fromFootprint' : float (distances['fromFootprint'][i]),
+							 'fromBoundary' : float (distances['fromBoundary'][i]),
+							 'fromFootprintRel' : float (distances['fromFootprintRel'][i]),
+					}
+					if t['distance']['fromFootprintRel'] > 0:
+						print ("%s is outside camera view" % t['name'])
+					else:
+						print ("%s is within camera view"  % t['name'])
 
 		counter = counter + 1
 
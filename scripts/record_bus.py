@@ -0,0 +1,49 @@
+# Script : Record_Bus
+# Records every target, quadcopter and GCS message to a bus log (see buslog.py)
+
+# Import libraries
+import argparse
+import signal
+import sys
+import redis
+from simclock import Clock
+from buslog import LogWriter, PATTERNS
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("-o", "--output", help = "log file (appended to if it exists)", required = True)
+	parser.add_argument ("--timescale", help = "simulated seconds per wall-clock second (headless missions)", default = 1)
+	parser.add_argument ("--flush", help = "seconds between flushes to disk", type = float, default = 1.0)
+	args = parser.parse_args ()
+
+	clock = Clock (args.timescale)
+
+	# Stop cleanly on kill as on Ctrl-C, so the log is flushed
+	signal.signal (signal.SIGTERM, lambda signum, frame: sys.exit (0))
+
+	# Init message passing interface (via Redis)
+	r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
+	p = r.pubsub ()
+	p.psubscribe (*PATTERNS)
+
+	with LogWriter (args.output) as log:
+		lastFlush = clock.time ()
+		try:
+			for msg in p.listen ():
+				if msg['type'] != 'pmessage':
+					continue
+				now = clock.time ()
+				log.write (now, msg['channel'], msg['data'])
+				if now - lastFlush >= args.flush:
+					log.flush ()
+					lastFlush = now
+		except (KeyboardInterrupt, SystemExit):
+			pass
+		print ("[+] Recorded {0} messages to {1}".format (log.count, args.output))
+
+
+if __name__ == "__main__":
+	main ()
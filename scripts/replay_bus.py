@@ -0,0 +1,103 @@
+# Script : Replay_Bus
+# Replays a bus log (see buslog.py), either re-published to Redis
+# or fed straight into the GCS loop of follow_targets.py
+
+# Import libraries
+import argparse
+import redis
+from buslog import LogReader, replay
+from simclock import StepClock
+from messaging import TARGET_PREFIX, QUAD_PREFIX, GCS_CHANNEL, Inbox, commandChannel
+from footprint import DEFAULT_CAMERA_PROFILE, loadCameraProfile
+from follow import newFleet, gcsPass
+
+
+def runGCS (records, fleet, predictPeriod, tick = 0.001):
+	"""
+	Function: runGCS
+	Arguments:
+		records: iterable of (time, channel, data)
+		fleet: fleet state (see follow.newFleet)
+		predictPeriod: if > 0, replan at least this often, from the predicted targets
+		tick: period of the polling loop being replayed, in seconds
+	Purpose:
+		Runs the polling GCS loop of follow_targets.py (follow.gcsPass) over
+		recorded traffic, one pass per tick that has messages, using the
+		recorded times as the clock. The quadcopters' telemetry is replayed as
+		recorded, so it does not react to the new commands. Returns the
+		commands the GCS would have sent, as (time, quadcopter, command).
+	"""
+	commands = []
+	clock = StepClock ()
+	inbox = Inbox ()
+
+	def gcsPassAt (t):
+		clock.now = t
+		commands.extend ((t, quadName, command) for (quadName, command) in gcsPass (fleet, [inbox], clock, predictPeriod))
+
+	passStart = None
+	for (t, channel, data) in records:
+		if not channel.startswith ((QUAD_PREFIX, TARGET_PREFIX)):
+			continue
+		# Everything within one tick is handled in the same pass
+		if passStart is not None and t - passStart >= tick:
+			gcsPassAt (passStart)
+			passStart = None
+		if passStart is None:
+			passStart = t
+		inbox.put (channel, data)
+	if passStart is not None:
+		gcsPassAt (passStart)
+	return commands
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("-i", "--input", help = "log file", required = True)
+	parser.add_argument ("-s", "--speed", help = "replay speed: 1 = real time, 10 = ten times faster, 0 = as fast as possible", type = float, default = 1)
+	parser.add_argument ("--start", help = "skip records before this many seconds into the log", type = float)
+	parser.add_argument ("--end", help = "stop this many seconds into the log", type = float)
+	parser.add_argument ("-g", "--gcs", help = "feed the GCS logic directly instead of publishing", action = 'store_true')
+	parser.add_argument ("-q", "--quadcopter", help = "GCS only: name of quadcopter, or comma-separated names")
+	parser.add_argument ("-t", "--targets", help = "GCS only: comma-separated list of target names")
+	parser.add_argument ("-p", "--predict", help = "GCS only: timed replan period (0 = only on reports)", type = float, default = 0)
+	parser.add_argument ("--camera", help = "GCS only: camera profile (see calibrate_camera.py)", default = DEFAULT_CAMERA_PROFILE)
+	parser.add_argument ("-v", "--verbose", help = "GCS only: print in-view checks and commands", action = 'store_true')
+	args = parser.parse_args ()
+
+	with LogReader (args.input) as log:
+		if len (log) == 0:
+			print ("[-] Empty log")
+			return
+		origin = float (log.times[0])
+		start = None if args.start is None else origin + args.start
+		end = None if args.end is None else origin + args.end
+		records = log.records (start, end)
+
+		if args.gcs:
+			# Replay into the GCS logic, as fast as possible
+			if args.quadcopter is None or args.targets is None:
+				print ("[-] --gcs needs a quadcopter and targets")
+				exit (-1)
+			profile = loadCameraProfile (args.camera)
+			quadNames = args.quadcopter.split (",")
+			fleet = newFleet (quadNames, args.targets.split (","), fov = profile['fov_deg'],
+				gimbalOffset = profile['gimbalOffset_deg'], verbose = args.verbose)
+			commands = runGCS (records, fleet, args.predict)
+			if args.verbose:
+				for (t, quadName, command) in commands:
+					print ("{0:.3f} {1} {2}".format (t - origin, quadName, command))
+			channels = set ([GCS_CHANNEL] + [commandChannel (quadName) for quadName in quadNames])
+			recorded = sum (1 for (t, channel, data) in log.records (start, end) if channel in channels)
+			print ("[+] GCS planned {0} commands (recorded: {1})".format (len (commands), recorded))
+		else:
+			# Re-publish to Redis
+			r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
+			count = replay (records, r.publish, args.speed)
+			print ("[+] Replayed {0} messages".format (count))
+
+
+if __name__ == "__main__":
+	main ()
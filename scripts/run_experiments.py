@@ -0,0 +1,116 @@
+# Script : Run_Experiments
+# Runs a grid of headless follow-targets missions on every core
+# and collects coverage and message counts into one results table
+
+# Import libraries
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import sys
+from mission import runMission, summarize
+from trajectories import TrajectoryStore, DEFAULT_STORE
+from footprint import DEFAULT_CAMERA_PROFILE, loadCameraProfile
+
+
+def parseList (text, kind = float):
+	return [kind (v) for v in text.split (",")]
+
+
+def parseBroadcast (text):
+	"""
+	Function: parseBroadcast
+	Arguments:
+		text: comma-separated policies, e.g. "fixed:0.5,fixed:1,adaptive:1.0"
+	Purpose:
+		Returns (broadcast, value) pairs. The value of a fixed policy is its
+		period in seconds, the value of an adaptive policy is its maxError in meters.
+	"""
+	policies = []
+	for item in text.split (","):
+		(broadcast, value) = item.split (":")
+		if broadcast not in ('fixed', 'adaptive'):
+			raise argparse.ArgumentTypeError ("Unknown broadcast policy '{0}'".format (broadcast))
+		policies.append ((broadcast, float (value)))
+	return policies
+
+
+def runOne (experiment):
+	# Worker: one mission, returns its rows of the results table
+	params = dict (experiment)
+	store = TrajectoryStore (params.pop ('store'))
+	roundName = params.pop ('round')
+	targetNames = params.pop ('targets')
+	(broadcast, value) = params.pop ('policy')
+	if broadcast == 'adaptive':
+		params.update (broadcast = broadcast, maxError = value, period = 0.1)
+	else:
+		params.update (broadcast = broadcast, period = value)
+	result = runMission (store.round (roundName, targetNames), targetNames, **params)
+	rows = []
+	for row in summarize (result, targetNames):
+		row.update (round = roundName, broadcast = broadcast, policyValue = value,
+			predict = params['predict'], standoff = params['standoff'], viewMargin = params['viewMargin'],
+			groupExtent = params['groupExtent'])
+		rows.append (row)
+	return rows
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("--store", help = "trajectory store (see compile_trajectories.py)", default = DEFAULT_STORE)
+	parser.add_argument ("-r", "--rounds", help = "comma-separated round names (default: all)")
+	parser.add_argument ("-t", "--targets", help = "comma-separated target names", default = "susan,anton")
+	parser.add_argument ("-b", "--broadcast", help = "comma-separated policies: fixed:PERIOD or adaptive:MAXERROR", type = parseBroadcast, default = "fixed:0.5")
+	parser.add_argument ("-p", "--predict", help = "comma-separated GCS timed replan periods (0 = only on reports)", type = parseList, default = "0")
+	parser.add_argument ("-s", "--standoff", help = "comma-separated standoff distances", type = parseList, default = "2")
+	parser.add_argument ("-m", "--viewMargin", help = "comma-separated view margins", type = parseList, default = "4")
+	parser.add_argument ("-e", "--groupExtent", help = "comma-separated group measures: circle, centroid (see follow.newGCS)", default = "circle")
+	parser.add_argument ("-c", "--codec", help = "wire encoding of all messages", default = "json")
+	parser.add_argument ("--camera", help = "camera profile (see calibrate_camera.py)", default = DEFAULT_CAMERA_PROFILE)
+	parser.add_argument ("--duration", help = "longest mission, in simulated seconds", type = float, default = 600)
+	parser.add_argument ("-j", "--jobs", help = "worker processes (default: one per core)", type = int, default = os.cpu_count ())
+	parser.add_argument ("-o", "--output", help = "results CSV (default: stdout)")
+	args = parser.parse_args ()
+
+	if not os.path.exists (args.store):
+		print ("[-] No trajectory store at {0}, run scripts/compile_trajectories.py first".format (args.store))
+		exit (-1)
+	if args.rounds is None:
+		rounds = TrajectoryStore (args.store).rounds
+	else:
+		rounds = args.rounds.split (",")
+	targetNames = tuple (args.targets.split (","))
+	camera = loadCameraProfile (args.camera)
+
+	# Every combination is one mission
+	grid = [{'store':args.store, 'round':roundName, 'targets':targetNames, 'policy':policy, 'predict':predict,
+			'standoff':standoff, 'viewMargin':viewMargin, 'groupExtent':groupExtent, 'codec':args.codec, 'duration':args.duration, 'camera':camera}
+		for (roundName, policy, predict, standoff, viewMargin, groupExtent) in itertools.product (
+			rounds, args.broadcast, args.predict, args.standoff, args.viewMargin, args.groupExtent.split (","))]
+	print ("[+] Running {0} missions on {1} workers".format (len (grid), args.jobs), file = sys.stderr)
+
+	# Each mission has its own world, clock and bus, so they run in any order
+	rows = []
+	with multiprocessing.Pool (args.jobs) as pool:
+		for (done, missionRows) in enumerate (pool.imap_unordered (runOne, grid)):
+			rows.extend (missionRows)
+			print ("[+] {0}/{1} missions".format (done + 1, len (grid)), file = sys.stderr)
+
+	columns = ['round', 'broadcast', 'policyValue', 'predict', 'standoff', 'viewMargin', 'groupExtent', 'target',
+		'timeInView', 'acquire', 'reacquisitions', 'meanReacquire', 'maxReacquire', 'longestGap', 'centering',
+		'statusMessages', 'telemetryMessages', 'commandMessages', 'bytes', 'duration']
+	rows.sort (key = lambda row: tuple (str (row[c]) for c in columns[:8]))
+	out = open (args.output, "w", newline = "") if args.output else sys.stdout
+	writer = csv.DictWriter (out, fieldnames = columns)
+	writer.writeheader ()
+	writer.writerows (rows)
+	if args.output:
+		out.close ()
+
+
+if __name__ == "__main__":
+	main ()
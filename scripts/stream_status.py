@@ -0,0 +1,58 @@
+# Script : Stream_Status
+# Shows how far the readers of the telemetry streams are behind (see streams.py)
+
+# Import libraries
+import argparse
+import time
+import redis
+from messaging import TARGET_PREFIX, QUAD_PREFIX
+
+
+def entryAge (entryId, now):
+	# Seconds since an entry was added, from the milliseconds in its id
+	if isinstance (entryId, bytes):
+		entryId = entryId.decode ("utf-8")
+	return now - int (entryId.split ('-')[0]) / 1000.0
+
+
+def main ():
+
+	# Parse arguments
+	parser = argparse.ArgumentParser ()
+	parser.add_argument ("-p", "--pattern", help = "streams to show (default: every target and quadcopter)", action = 'append')
+	parser.add_argument ("-w", "--watch", help = "repeat every WATCH seconds", type = float)
+	args = parser.parse_args ()
+	patterns = args.pattern if args.pattern else [TARGET_PREFIX + '*', QUAD_PREFIX + '*']
+
+	r = redis.StrictRedis (host = 'localhost', port = 6379, db = 0)
+
+	while (True):
+		names = sorted (set (name for pattern in patterns for name in r.scan_iter (match = pattern, _type = 'stream')))
+
+		# Every stream's info and groups in one round trip
+		pipe = r.pipeline (transaction = False)
+		for name in names:
+			pipe.xinfo_stream (name)
+			pipe.xinfo_groups (name)
+		replies = pipe.execute ()
+		(now, micros) = r.time ()
+		now = now + micros / 1e6
+
+		print ("{0:<28} {1:>8} {2:>10} {3:>10}  {4}".format ("stream", "length", "added", "last (s)", "groups: pending / lag"))
+		for (i, name) in enumerate (names):
+			(info, groups) = (replies[2 * i], replies[2 * i + 1])
+			last = info.get ('last-generated-id')
+			age = entryAge (last, now) if last is not None and info['length'] > 0 else float ('nan')
+			groupText = ", ".join ("{0} {1} / {2}".format (g['name'].decode ("utf-8"), g['pending'], g.get ('lag'))
+				for g in groups)
+			print ("{0:<28} {1:>8} {2:>10} {3:>10.2f}  {4}".format (name.decode ("utf-8"), info['length'],
+				info.get ('entries-added', ''), age, groupText))
+
+		if args.watch is None:
+			break
+		print ()
+		time.sleep (args.watch)
+
+
+if __name__ == "__main__":
+	main ()
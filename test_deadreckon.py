@@ -0,0 +1,48 @@
+# Checks that an adaptive rover's broadcast gate predicts the rover where
+# the GCS does, so --maxError bounds the error of the GCS's prediction.
+# Run with: PYTHONPATH=$PWD/lib python3 -m pytest test_deadreckon.py
+import math
+from simclock import StepClock
+from codec import Encoder, decode
+from deadreckon import BroadcastGate
+from follow import newGCS, updateTarget, predictTargets
+
+
+def track(t):
+    # A rover driving east at 2 m/s, turning north after 10 s, stopping after 20 s
+    if t < 10:
+        return (2.0 * t, 0.0)
+    if t < 20:
+        return (20.0 + 1.5 * math.sin((t - 10) / 2), 2.0 * (t - 10))
+    return (20.0 + 1.5 * math.sin(5), 20.0)
+
+
+def run(codec, latency):
+    clock = StepClock()
+    encoder = Encoder(codec, clock)
+    gate = BroadcastGate(maxError = 1.0, heartbeat = 5.0)
+    gcs = newGCS('godot', ['susan'], verbose = False)
+    target = gcs['targetsByName']['susan']
+    errors = []
+    while clock.time() < 30:
+        t = clock.time()
+        (x, y) = track(t)
+        if gate.check(t, x, y):
+            status = {'pos_x':x, 'pos_y':y, 'pos_z':0.0, 'dest_x':None, 'dest_y':None,
+                      'vel_x':gate.velocity[0], 'vel_y':gate.velocity[1], 'timestamp':t}
+            # Received late: the GCS filters the report at its send time
+            updateTarget(gcs, 'susan', decode(encoder.encode(status)), t + latency)
+        predictTargets(gcs, t)
+        (px, py) = gate.predicted(t)
+        assert math.isclose(target['pos_x'], px, abs_tol = 1e-9)
+        assert math.isclose(target['pos_y'], py, abs_tol = 1e-9)
+        errors.append(math.hypot(target['pos_x'] - x, target['pos_y'] - y))
+        clock.sleep(0.1)
+    return (gate, errors)
+
+
+def test_gcs_predicts_as_gate():
+    for codec in ('json', 'binary'):
+        (gate, errors) = run(codec, 0.05)
+        assert gate.publishes < gate.samples
+        assert max(errors) <= gate.maxError
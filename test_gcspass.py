@@ -0,0 +1,22 @@
+# Checks that one pass of the polling GCS (follow.gcsPass) skips messages
+# that do not decode, and still plans from the rest.
+# Run with: PYTHONPATH=$PWD/lib python3 -m pytest test_gcspass.py
+from simclock import StepClock
+from codec import Encoder, TAG_STATUS
+from messaging import Inbox, TARGET_PREFIX, QUAD_PREFIX
+from follow import newFleet, gcsPass
+
+
+def test_skips_undecodable_messages():
+    clock = StepClock(10.0)
+    encoder = Encoder('binary', clock)
+    fleet = newFleet(['godot'], ['susan'], verbose = False)
+    inbox = Inbox()
+    for data in (b'Boot', bytes([0xA5, 99]) + b'x' * 20, bytes([0xA5, TAG_STATUS]) + b'x' * 5):
+        inbox.put(QUAD_PREFIX + 'godot', data)
+        inbox.put(TARGET_PREFIX + 'susan', data)
+    inbox.put(TARGET_PREFIX + 'susan', encoder.encode({'tag':TAG_STATUS, 'pos_x':1.0, 'pos_y':2.0,
+        'pos_z':0.0, 'dest_x':5.0, 'dest_y':2.0}))
+    commands = gcsPass(fleet, [inbox], clock)
+    assert [quadName for (quadName, command) in commands] == ['godot']
+    assert fleet['targetsByName']['susan']['comm']
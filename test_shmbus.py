@@ -0,0 +1,50 @@
+# Checks the shared-memory transport's reader against slots it should skip
+# or pick up. Needs /dev/shm.
+# Run with: PYTHONPATH=$PWD/lib python3 -m pytest test_shmbus.py
+import os
+from codec import Encoder, TAG_STATUS
+from messaging import drain
+from shmbus import ShmPublisher, ShmSubscriber, remove
+
+STATUS = {'tag':TAG_STATUS, 'pos_x':1.0, 'pos_y':2.0, 'pos_z':0.0, 'dest_x':None, 'dest_y':None}
+
+
+def channel(name):
+    # Unique per run, so a left-over slot cannot interfere
+    return 'test-{0}-{1}'.format(os.getpid(), name)
+
+
+def test_skips_malformed_records():
+    name = channel('malformed')
+    publisher = ShmPublisher()
+    subscriber = ShmSubscriber([name])
+    try:
+        publisher.publish(name, b'Boot')
+        drain(subscriber)
+        for data in (bytes([0xA5, 99]) + b'x' * 20, bytes([0xA5, TAG_STATUS]) + b'x' * 5):
+            publisher.publish(name, data)
+            assert drain(subscriber) == []
+        publisher.publish(name, Encoder('binary').encode(STATUS))
+        msgs = drain(subscriber)
+        assert [m['decoded']['pos_y'] for m in msgs] == [2.0]
+    finally:
+        remove(name)
+
+
+def test_picks_up_late_publisher():
+    (early, late) = (channel('early'), channel('late'))
+    publisher = ShmPublisher()
+    encoder = Encoder('binary')
+    try:
+        # A slot left from before the reader started is stale
+        publisher.publish(early, encoder.encode(STATUS))
+        subscriber = ShmSubscriber([early, late])
+        assert drain(subscriber) == []
+        # A publisher that starts after the reader: its first record counts
+        publisher.publish(late, encoder.encode(STATUS))
+        msgs = drain(subscriber)
+        assert [m['channel'] for m in msgs] == [late]
+        assert subscriber.overwritten == 0
+    finally:
+        remove(early)
+        remove(late)